@@ -16,9 +16,14 @@ if config.config_file_name is not None:
 
 # add your model's MetaData object here
 # for 'autogenerate' support
+from app.core.config import settings
 from app.core.database import Base
 from app.domain.models import *  # noqa: F401, F403
 
+# URL берётся из настроек приложения (DATABASE_URL), чтобы миграции
+# применялись к той же БД, что использует приложение (SQLite или PostgreSQL)
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,31 @@
+"""Add distribution strategy to sources
+
+Revision ID: 002_source_strategy
+Revises: 001_initial
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_source_strategy'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Стратегия выбора оператора для источника
+    with op.batch_alter_table('sources') as batch_op:
+        batch_op.add_column(
+            sa.Column('distribution_strategy', sa.String(), nullable=False, server_default='weighted_random')
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sources') as batch_op:
+        batch_op.drop_column('distribution_strategy')
@@ -0,0 +1,35 @@
+"""Add indexes for list filters and keyset pagination
+
+Revision ID: 003_list_indexes
+Revises: 002_source_strategy
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_list_indexes'
+down_revision: Union[str, None] = '002_source_strategy'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Фильтры списка обращений + порядок по id для keyset-пагинации
+    op.create_index('ix_contacts_status_id', 'contacts', ['status', 'id'], unique=False)
+    op.create_index('ix_contacts_source_id_id', 'contacts', ['source_id', 'id'], unique=False)
+    op.create_index('ix_contacts_operator_id_id', 'contacts', ['operator_id', 'id'], unique=False)
+    op.create_index('ix_contacts_created_at', 'contacts', ['created_at'], unique=False)
+    op.create_index(op.f('ix_leads_created_at'), 'leads', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_leads_created_at'), table_name='leads')
+    op.drop_index('ix_contacts_created_at', table_name='contacts')
+    op.drop_index('ix_contacts_operator_id_id', table_name='contacts')
+    op.drop_index('ix_contacts_source_id_id', table_name='contacts')
+    op.drop_index('ix_contacts_status_id', table_name='contacts')
@@ -0,0 +1,46 @@
+"""Add incrementally maintained distribution_stats summary
+
+Revision ID: 004_distribution_stats
+Revises: 003_list_indexes
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_distribution_stats'
+down_revision: Union[str, None] = '003_list_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'distribution_stats',
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('operator_id', sa.Integer(), nullable=False),
+        sa.Column('contacts_count', sa.Integer(), nullable=False),
+        sa.Column('active_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('source_id', 'operator_id')
+    )
+    # Заполняем сводку по уже существующим обращениям
+    op.execute(
+        """
+        INSERT INTO distribution_stats (source_id, operator_id, contacts_count, active_count)
+        SELECT source_id,
+               COALESCE(operator_id, 0),
+               COUNT(*),
+               SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END)
+        FROM contacts
+        GROUP BY source_id, COALESCE(operator_id, 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('distribution_stats')
@@ -0,0 +1,45 @@
+"""Add hourly and daily distribution rollups
+
+Revision ID: 005_distribution_rollups
+Revises: 004_distribution_stats
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_distribution_rollups'
+down_revision: Union[str, None] = '004_distribution_stats'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Сводки заполняет фоновый агрегатор начиная с нулевой отметки,
+    # поэтому уже существующие обращения будут учтены при первом проходе
+    for table_name in ('distribution_stats_hourly', 'distribution_stats_daily'):
+        op.create_table(
+            table_name,
+            sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('source_id', sa.Integer(), nullable=False),
+            sa.Column('operator_id', sa.Integer(), nullable=False),
+            sa.Column('contacts_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('bucket_start', 'source_id', 'operator_id')
+        )
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('last_contact_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_watermarks')
+    op.drop_table('distribution_stats_daily')
+    op.drop_table('distribution_stats_hourly')
@@ -0,0 +1,45 @@
+"""Add composite and partial indexes for hot queries
+
+Revision ID: 006_hot_query_indexes
+Revises: 005_distribution_rollups
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_hot_query_indexes'
+down_revision: Union[str, None] = '005_distribution_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Нагрузка операторов: только активные обращения
+    op.create_index(
+        'ix_contacts_active_operator',
+        'contacts',
+        ['operator_id'],
+        unique=False,
+        sqlite_where=sa.text("status = 'active'"),
+        postgresql_where=sa.text("status = 'active'")
+    )
+    # Обращения лида
+    op.create_index('ix_contacts_lead_id', 'contacts', ['lead_id'], unique=False)
+    # Операторы источника (uq_operator_source начинается с operator_id)
+    op.create_index(
+        'ix_operator_source_weights_source_operator',
+        'operator_source_weights',
+        ['source_id', 'operator_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_operator_source_weights_source_operator', table_name='operator_source_weights')
+    op.drop_index('ix_contacts_lead_id', table_name='contacts')
+    op.drop_index('ix_contacts_active_operator', table_name='contacts')
@@ -0,0 +1,37 @@
+"""Add denormalized active load to operators
+
+Revision ID: 007_operator_active_load
+Revises: 006_hot_query_indexes
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_operator_active_load'
+down_revision: Union[str, None] = '006_hot_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Активные обращения оператора - занимаются и освобождаются в транзакциях назначения
+    with op.batch_alter_table('operators') as batch_op:
+        batch_op.add_column(
+            sa.Column('active_load', sa.Integer(), nullable=False, server_default='0')
+        )
+    # Начальное значение - число активных обращений оператора
+    op.execute(
+        "UPDATE operators SET active_load = ("
+        "SELECT count(*) FROM contacts "
+        "WHERE contacts.operator_id = operators.id AND contacts.status = 'active')"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('operators') as batch_op:
+        batch_op.drop_column('active_load')
@@ -0,0 +1,45 @@
+"""Track distribution rollups by settled hour instead of contact id
+
+Revision ID: 008_rollup_time_watermark
+Revises: 007_operator_active_load
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_rollup_time_watermark'
+down_revision: Union[str, None] = '007_operator_active_load'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _clear_rollups() -> None:
+    # Сводки и отметка очищаются - фоновый агрегатор пересчитает их заново
+    op.execute("DELETE FROM rollup_watermarks")
+    op.execute("DELETE FROM distribution_stats_daily")
+    op.execute("DELETE FROM distribution_stats_hourly")
+
+
+def upgrade() -> None:
+    # Отметка по id обращения пропускала обращения, зафиксированные позже
+    # обращений с большими id; теперь отметка - первый неокончательный час
+    _clear_rollups()
+    with op.batch_alter_table('rollup_watermarks') as batch_op:
+        batch_op.drop_column('last_contact_id')
+        batch_op.add_column(
+            sa.Column('settled_until', sa.DateTime(timezone=True), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    _clear_rollups()
+    with op.batch_alter_table('rollup_watermarks') as batch_op:
+        batch_op.drop_column('settled_until')
+        batch_op.add_column(
+            sa.Column('last_contact_id', sa.Integer(), nullable=False)
+        )
@@ -1,21 +1,48 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, get_read_session_factory
+from app.api.export import ExportFormat, export_response
+from app.api.fieldsets import Fieldset, fieldset_params
+from app.api.pagination import PageParams, page_params, paginate, split_page
+from app.api.responses import json_response
 from app.api.schemas import (
     ContactCreate, ContactResponse, ContactWithDetails, LeadWithContacts,
-    DistributionStats
+    DistributionStats, ContactBatchResult, ContactTicket, ContactUpdate,
+    ContactBulkClose, ContactBulkReassign, ContactBulkResult
 )
 from app.infrastructure.repositories import (
-    LeadRepository, ContactRepository, SourceRepository
+    ContactRepository, SourceRepository, OperatorRepository,
+    DistributionRollupRepository, CONTACT_EXPORT_COLUMNS, CONTACT_FIELDS, CONTACT_RELATIONS
 )
-from app.services.distribution_service import DistributionService
+from app.services.contact_ingestion import ContactIngestionService, IncomingContact
+from app.services.contact_lifecycle import ContactLifecycleService
+from app.services.stats_rollup import Granularity, as_utc, bucket_start
+from app.services.write_behind import write_behind
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
+# Параметры fields и include чтения обращений
+contact_fieldset = fieldset_params(CONTACT_FIELDS, tuple(CONTACT_RELATIONS))
 
-@router.post("", response_model=ContactWithDetails, status_code=status.HTTP_201_CREATED)
+
+@router.post(
+    "",
+    response_model=ContactWithDetails,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": ContactTicket,
+            "description": "Обращение принято в очередь отложенной записи"
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Очередь отложенной записи заполнена"},
+    }
+)
 async def create_contact(
     contact_data: ContactCreate,
     db: AsyncSession = Depends(get_db)
@@ -27,7 +54,28 @@ async def create_contact(
     1. Найдёт или создаст лида по предоставленным данным
     2. Выберет оператора с учётом весов и лимитов
     3. Создаст обращение
+    
+    В режиме отложенной записи (CONTACT_WRITE_BEHIND) обращение только
+    ставится в очередь: ответ 202 с номером заявки, состояние которой
+    доступно по GET /contacts/tickets/{ticket_id}.
     """
+    if settings.CONTACT_WRITE_BEHIND and write_behind.is_running:
+        try:
+            ticket = write_behind.submit(IncomingContact(**contact_data.model_dump()))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Очередь обращений заполнена, повторите запрос позже",
+                headers={"Retry-After": "1"}
+            )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=ContactTicket.model_validate(ticket).model_dump(),
+            headers={
+                "Location": f"{settings.API_V1_PREFIX}/contacts/tickets/{ticket.ticket_id}"
+            }
+        )
+    
     # Проверяем существование источника
     source_repo = SourceRepository(db)
     source = await source_repo.get_by_id(contact_data.source_id)
@@ -37,64 +85,292 @@ async def create_contact(
             detail="Источник не найден"
         )
     
-    # Находим или создаём лида
-    lead_repo = LeadRepository(db)
-    lead = await lead_repo.find_or_create(
-        external_id=contact_data.lead_external_id,
-        phone=contact_data.lead_phone,
-        email=contact_data.lead_email,
-        name=contact_data.lead_name
+    # Находим или создаём лида, выбираем оператора и создаём обращение
+    # в одной транзакции; ответ строится из уже загруженных объектов
+    service = ContactIngestionService(db)
+    contact = await service.register(
+        IncomingContact(**contact_data.model_dump()),
+        source
     )
+    return contact
+
+
+@router.post(
+    "/batch",
+    response_model=List[ContactBatchResult],
+    status_code=status.HTTP_201_CREATED
+)
+async def create_contacts_batch(
+    contacts_data: List[ContactCreate],
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Зарегистрировать пакет обращений одной транзакцией.
     
-    # Выбираем оператора
-    distribution_service = DistributionService(db)
-    operator = await distribution_service.select_operator(contact_data.source_id)
+    Лиды определяются пакетно, операторы назначаются с соблюдением
+    лимитов в пределах всего пакета. Для каждого элемента возвращается
+    созданное обращение или текст ошибки.
+    """
+    if len(contacts_data) > settings.CONTACT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Размер пакета не должен превышать {settings.CONTACT_BATCH_MAX_SIZE}"
+        )
     
-    # Создаём обращение
-    contact_repo = ContactRepository(db)
-    contact = await contact_repo.create(
-        lead_id=lead.id,
-        source_id=contact_data.source_id,
-        operator_id=operator.id if operator else None,
-        message=contact_data.message,
-        status="active"
+    service = ContactIngestionService(db)
+    results = await service.register_batch([
+        IncomingContact(**contact_data.model_dump()) for contact_data in contacts_data
+    ])
+    return results
+
+
+async def _check_target_operator(db: AsyncSession, operator_id: Optional[int]) -> None:
+    """Проверить, что обращения можно передать оператору (None - снять оператора)."""
+    if operator_id is None:
+        return
+    operator = await OperatorRepository(db).get_by_id(operator_id)
+    if not operator:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Оператор не найден"
+        )
+    if not operator.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Оператор неактивен"
+        )
+
+
+def _check_contact_ids(contact_ids: Optional[List[int]]) -> None:
+    if contact_ids is not None and len(contact_ids) > settings.CONTACT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Число обращений не должно превышать {settings.CONTACT_BATCH_MAX_SIZE}"
+        )
+
+
+@router.post("/bulk/close", response_model=ContactBulkResult)
+async def close_contacts(
+    close_data: ContactBulkClose,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Закрыть активные обращения по фильтрам (например, все обращения
+    оператора в конце смены) одним UPDATE.
+    
+    Слоты операторов освобождаются сразу после коммита.
+    """
+    if (
+        close_data.contact_ids is None
+        and close_data.source_id is None
+        and close_data.operator_id is None
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите contact_ids, source_id или operator_id"
+        )
+    _check_contact_ids(close_data.contact_ids)
+    
+    updated = await ContactLifecycleService(db).close_many(
+        contact_ids=close_data.contact_ids,
+        source_id=close_data.source_id,
+        operator_id=close_data.operator_id
     )
+    return ContactBulkResult(updated=updated)
+
+
+@router.post("/bulk/reassign", response_model=ContactBulkResult)
+async def reassign_contacts(
+    reassign_data: ContactBulkReassign,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Передать активные обращения оператора другому оператору одним UPDATE.
     
-    # Загружаем связанные данные для ответа
-    contact = await contact_repo.get_by_id(contact.id)
-    return contact
+    from_operator_id: null выбирает обращения без оператора,
+    to_operator_id: null снимает оператора. Лимит нагрузки получателя
+    не проверяется: это ручное перераспределение.
+    """
+    _check_contact_ids(reassign_data.contact_ids)
+    await _check_target_operator(db, reassign_data.to_operator_id)
+    
+    updated = await ContactLifecycleService(db).reassign_many(
+        reassign_data.from_operator_id,
+        reassign_data.to_operator_id,
+        contact_ids=reassign_data.contact_ids,
+        source_id=reassign_data.source_id
+    )
+    return ContactBulkResult(updated=updated)
+
+
+@router.get("/tickets/{ticket_id}", response_model=ContactTicket)
+async def get_contact_ticket(ticket_id: str):
+    """Состояние заявки на отложенную регистрацию обращения."""
+    ticket = write_behind.get(ticket_id)
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заявка не найдена"
+        )
+    return ticket
 
 
 @router.get("", response_model=List[ContactWithDetails])
-async def get_contacts(db: AsyncSession = Depends(get_db)):
-    """Получить список всех обращений."""
+async def get_contacts(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    source_id: Optional[int] = None,
+    operator_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    fieldset: Fieldset = Depends(contact_fieldset),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить страницу обращений с фильтрами.
+    
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    fields и include ограничивают поля и связи ответа: читаются только
+    нужные колонки, связи присоединяются, только если запрошены.
+    """
     contact_repo = ContactRepository(db)
-    contacts = await contact_repo.get_all()
-    return contacts
+    filters = dict(
+        limit=page.limit + 1,
+        after_id=page.after_id,
+        status=status_filter,
+        source_id=source_id,
+        operator_id=operator_id,
+        created_from=created_from,
+        created_to=created_to
+    )
+    if settings.FAST_SERIALIZATION or fieldset.sparse:
+        rows, headers = split_page(
+            await contact_repo.get_page_rows(
+                **filters, fields=fieldset.fields, include=fieldset.include
+            ),
+            page
+        )
+        return json_response(rows, headers=headers)
+    contacts = await contact_repo.get_page(**filters)
+    return paginate(response, contacts, page)
+
+
+@router.get("/export")
+async def export_contacts(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session_factory: async_sessionmaker = Depends(get_read_session_factory)
+):
+    """Потоковая выгрузка обращений в NDJSON или CSV."""
+    return export_response(
+        session_factory,
+        lambda session: ContactRepository(session).stream_export(
+            chunk_size=settings.EXPORT_CHUNK_SIZE,
+            created_from=created_from,
+            created_to=created_to
+        ),
+        CONTACT_EXPORT_COLUMNS,
+        export_format,
+        filename="contacts"
+    )
 
 
 @router.get("/{contact_id}", response_model=ContactWithDetails)
 async def get_contact(
     contact_id: int,
-    db: AsyncSession = Depends(get_db)
+    fieldset: Fieldset = Depends(contact_fieldset),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить обращение по ID."""
     contact_repo = ContactRepository(db)
+    fast = settings.FAST_SERIALIZATION or fieldset.sparse
+    if fast:
+        contact = await contact_repo.get_row(
+            contact_id, fields=fieldset.fields, include=fieldset.include
+        )
+    else:
+        contact = await contact_repo.get_by_id(contact_id)
+    if not contact:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Обращение не найдено"
+        )
+    return json_response(contact) if fast else contact
+
+
+@router.patch("/{contact_id}", response_model=ContactWithDetails)
+async def update_contact(
+    contact_id: int,
+    contact_data: ContactUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Сменить статус обращения и/или передать его другому оператору.
+    
+    При закрытии или передаче слот оператора освобождается сразу.
+    Лимит нагрузки нового оператора не проверяется.
+    """
+    contact_repo = ContactRepository(db)
     contact = await contact_repo.get_by_id(contact_id)
     if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Обращение не найдено"
         )
+    
+    new_status = contact_data.status or contact.status
+    new_operator_id = contact.operator_id
+    if "operator_id" in contact_data.model_fields_set:
+        new_operator_id = contact_data.operator_id
+        if new_operator_id != contact.operator_id:
+            await _check_target_operator(db, new_operator_id)
+    
+    service = ContactLifecycleService(db)
+    if not await service.update(contact, new_status, new_operator_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Обращение изменено параллельно, повторите запрос"
+        )
     return contact
 
 
 @router.get("/stats/distribution", response_model=List[DistributionStats])
-async def get_distribution_stats(db: AsyncSession = Depends(get_db)):
-    """Получить статистику распределения обращений по операторам и источникам."""
-    contact_repo = ContactRepository(db)
-    stats = await contact_repo.get_distribution_stats()
+async def get_distribution_stats(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    granularity: Optional[Granularity] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить статистику распределения обращений по операторам и источникам.
+    
+    Без параметров - итоги за всё время. С from/to/granularity - счётчики
+    созданных обращений по часам или суткам (по умолчанию по суткам) из
+    предагрегированных сводок; интервалы берутся целиком, если их начало
+    попадает в [from, to). Сводки дополняются фоновым агрегатором, поэтому
+    отстают от текущего момента на период его прохода.
+    """
+    if date_from is None and date_to is None and granularity is None:
+        contact_repo = ContactRepository(db)
+        stats = await contact_repo.get_distribution_stats()
+        return [
+            DistributionStats(**stat) for stat in stats
+        ]
+    
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начало периода должно быть раньше конца"
+        )
+    granularity = granularity or "day"
+    rollup_repo = DistributionRollupRepository(db)
+    stats = await rollup_repo.get_buckets(
+        granularity,
+        date_from=bucket_start(date_from, granularity) if date_from else None,
+        date_to=as_utc(date_to) if date_to else None
+    )
     return [
         DistributionStats(**stat) for stat in stats
-    ]
-
+    ]
\ No newline at end of file
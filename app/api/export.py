@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Literal, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def encode_ndjson(rows: Sequence[Row], columns: Sequence[str]) -> str:
+    """Порция строк в формате NDJSON (один JSON-объект на строку)."""
+    return "".join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: Sequence[Row]) -> str:
+    """Порция строк в формате CSV."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def export_response(
+    session_factory: async_sessionmaker,
+    open_stream: Callable[[AsyncSession], AsyncIterator[Sequence[Row]]],
+    columns: Sequence[str],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """
+    Потоковый ответ с выгрузкой.
+    
+    Сессия открывается внутри генератора и живёт, пока клиент читает
+    ответ; строки читаются серверным курсором порциями, поэтому память
+    ограничена размером порции независимо от размера таблицы.
+    """
+    async def body():
+        if export_format == "csv":
+            # Заголовок отдаём сразу, ещё до выполнения запроса
+            yield encode_csv([columns])
+        async with session_factory() as session:
+            async for rows in open_stream(session):
+                if export_format == "csv":
+                    yield encode_csv(rows)
+                else:
+                    yield encode_ndjson(rows, columns)
+    
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
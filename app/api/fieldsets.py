@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+
+
+@dataclass
+class Fieldset:
+    """Поля ресурса и присоединяемые связи, запрошенные клиентом."""
+    fields: Tuple[str, ...]
+    include: Tuple[str, ...]
+    # Клиент задал fields или include - ответ отличается от схемы
+    sparse: bool
+
+
+def _parse(value: str, allowed: Sequence[str], kind: str) -> Tuple[str, ...]:
+    """Разобрать список через запятую; порядок - как в allowed."""
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные {kind}: {', '.join(sorted(unknown))}"
+        )
+    return tuple(name for name in allowed if name in names)
+
+
+def fieldset_params(
+    allowed_fields: Sequence[str], relations: Sequence[str]
+) -> Callable[..., Fieldset]:
+    """
+    Dependency с параметрами fields и include для ресурса.
+    
+    Без параметров ответ содержит все поля и все связи. id включается
+    всегда (по нему строится курсор страницы); include= без значения
+    отключает все связи.
+    """
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Поля через запятую (id всегда включается): {', '.join(allowed_fields)}"
+        ),
+        include: Optional[str] = Query(
+            None,
+            description=f"Связи через запятую, пустое значение - без связей: {', '.join(relations)}"
+        )
+    ) -> Fieldset:
+        return Fieldset(
+            fields=_parse(f"id,{fields}", allowed_fields, "поля") if fields is not None else tuple(allowed_fields),
+            include=_parse(include, relations, "связи") if include is not None else tuple(relations),
+            sparse=fields is not None or include is not None
+        )
+    
+    return dependency
@@ -1,34 +1,100 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_read_db, get_read_session_factory
+from app.api.export import ExportFormat, export_response
+from app.api.fieldsets import Fieldset, fieldset_params
+from app.api.pagination import PageParams, page_params, paginate, split_page
+from app.api.responses import json_response
 from app.api.schemas import LeadResponse, LeadWithContacts
-from app.infrastructure.repositories import LeadRepository
+from app.infrastructure.repositories import (
+    LeadRepository, LEAD_EXPORT_COLUMNS, LEAD_FIELDS, LEAD_RELATIONS
+)
 
 router = APIRouter(prefix="/leads", tags=["leads"])
 
+# Параметры fields и include чтения лидов
+lead_fieldset = fieldset_params(LEAD_FIELDS, LEAD_RELATIONS)
+
 
 @router.get("", response_model=List[LeadWithContacts])
-async def get_leads(db: AsyncSession = Depends(get_db)):
-    """Получить список всех лидов с их обращениями."""
+async def get_leads(
+    response: Response,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    fieldset: Fieldset = Depends(lead_fieldset),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить страницу лидов с их обращениями.
+    
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    fields и include ограничивают поля и связи ответа: читаются только
+    нужные колонки, связи присоединяются, только если запрошены.
+    """
     lead_repo = LeadRepository(db)
-    leads = await lead_repo.get_all()
-    return leads
+    filters = dict(
+        limit=page.limit + 1,
+        after_id=page.after_id,
+        created_from=created_from,
+        created_to=created_to
+    )
+    if settings.FAST_SERIALIZATION or fieldset.sparse:
+        rows, headers = split_page(
+            await lead_repo.get_page_rows(
+                **filters, fields=fieldset.fields, include=fieldset.include
+            ),
+            page
+        )
+        return json_response(rows, headers=headers)
+    leads = await lead_repo.get_page(**filters)
+    return paginate(response, leads, page)
+
+
+@router.get("/export")
+async def export_leads(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session_factory: async_sessionmaker = Depends(get_read_session_factory)
+):
+    """Потоковая выгрузка лидов в NDJSON или CSV."""
+    return export_response(
+        session_factory,
+        lambda session: LeadRepository(session).stream_export(
+            chunk_size=settings.EXPORT_CHUNK_SIZE,
+            created_from=created_from,
+            created_to=created_to
+        ),
+        LEAD_EXPORT_COLUMNS,
+        export_format,
+        filename="leads"
+    )
 
 
 @router.get("/{lead_id}", response_model=LeadWithContacts)
 async def get_lead(
     lead_id: int,
-    db: AsyncSession = Depends(get_db)
+    fieldset: Fieldset = Depends(lead_fieldset),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить лида по ID с его обращениями."""
     lead_repo = LeadRepository(db)
-    lead = await lead_repo.get_by_id(lead_id)
+    fast = settings.FAST_SERIALIZATION or fieldset.sparse
+    if fast:
+        lead = await lead_repo.get_row(
+            lead_id, fields=fieldset.fields, include=fieldset.include
+        )
+    else:
+        lead = await lead_repo.get_by_id(lead_id)
     if not lead:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Лид не найден"
         )
-    return lead
+    return json_response(lead) if fast else lead
 
@@ -1,13 +1,81 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.api import operators, sources, contacts, leads
+from app.core.database import AsyncSessionLocal, engine, run_sqlite_maintenance
+from app.core.metrics import MetricsMiddleware, instrument_sqlalchemy
+from app.core.query_profiler import DB_QUERIES_HEADER, DB_TIME_HEADER, QueryProfilerMiddleware
+from app.api import operators, sources, contacts, leads, metrics
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.api.responses import ORJSONResponse
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.load_registry import load_registry
+from app.services.stats_rollup import run_rollup_aggregator
+from app.services.write_behind import write_behind
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Прогрев реестра нагрузки и запуск фоновых задач: сверки реестра
+    с БД, диспетчера обращений без оператора, агрегатора сводок статистики
+    по интервалам, обслуживания SQLite и, если включена, очереди
+    отложенной записи обращений. При остановке очередь дописывается
+    до конца, прежде чем процесс завершится.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            await load_registry.reload(session)
+    except Exception:
+        # Например, миграции ещё не применены - реестр загрузится при первом обращении
+        logger.warning("Не удалось загрузить нагрузку операторов при старте", exc_info=True)
+    
+    tasks = [
+        asyncio.create_task(
+            load_registry.run_reconciler(AsyncSessionLocal, settings.LOAD_RECONCILE_INTERVAL)
+        ),
+        asyncio.create_task(
+            backlog_dispatcher.run(AsyncSessionLocal, settings.BACKLOG_DISPATCH_BATCH_SIZE)
+        ),
+        asyncio.create_task(
+            run_rollup_aggregator(
+                AsyncSessionLocal,
+                settings.STATS_ROLLUP_INTERVAL,
+                settings.STATS_ROLLUP_SETTLE_DELAY
+            )
+        ),
+        asyncio.create_task(
+            run_sqlite_maintenance(engine, settings.SQLITE_MAINTENANCE_INTERVAL)
+        ),
+    ]
+    if settings.CONTACT_WRITE_BEHIND:
+        write_behind.start(
+            AsyncSessionLocal,
+            settings.WRITE_BEHIND_QUEUE_SIZE,
+            settings.WRITE_BEHIND_BATCH_SIZE,
+            settings.WRITE_BEHIND_LINGER,
+            settings.WRITE_BEHIND_TICKET_LIMIT
+        )
+    try:
+        yield
+    finally:
+        await write_behind.drain()
+        for task in tasks:
+            task.cancel()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.PROJECT_VERSION,
-    description="Мини-CRM для распределения лидов между операторами по источникам"
+    description="Мини-CRM для распределения лидов между операторами по источникам",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -17,13 +85,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, DB_QUERIES_HEADER, DB_TIME_HEADER],
 )
 
+# Профилирование запросов к БД (DB_QUERY_PROFILING) и метрики запросов;
+# метрики - внешний слой, чтобы учитывать и время CORS и профилировщика
+app.add_middleware(QueryProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+instrument_sqlalchemy()
+
 # Подключаем роутеры
 app.include_router(operators.router, prefix=settings.API_V1_PREFIX)
 app.include_router(sources.router, prefix=settings.API_V1_PREFIX)
 app.include_router(contacts.router, prefix=settings.API_V1_PREFIX)
 app.include_router(leads.router, prefix=settings.API_V1_PREFIX)
+app.include_router(metrics.router)
 
 
 @app.get("/")
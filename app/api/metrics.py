@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_read_db
+from app.core.metrics import (
+    registry, BACKLOG_QUEUE_SIZE, OPERATOR_LOAD, OPERATOR_MAX_LOAD, UNASSIGNED_CONTACTS
+)
+from app.infrastructure.repositories import DistributionStatsRepository, OperatorRepository
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.load_registry import load_registry
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry.add_collector(lambda: BACKLOG_QUEUE_SIZE.set(backlog_dispatcher.pending()))
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(db: AsyncSession = Depends(get_read_db)):
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    
+    Нагрузка операторов берётся из реестра процесса, лимиты и число
+    обращений без оператора - двумя короткими запросами (к операторам
+    и к сводке распределения), а не подсчётом по таблице обращений.
+    """
+    max_loads = await OperatorRepository(db).get_max_loads()
+    unassigned = await DistributionStatsRepository(db).get_unassigned_counts()
+    await load_registry.ensure_loaded(db)
+    
+    OPERATOR_MAX_LOAD.replace({(str(operator_id),): value for operator_id, value in max_loads.items()})
+    OPERATOR_LOAD.replace({(str(operator_id),): load_registry.get(operator_id) for operator_id in max_loads})
+    UNASSIGNED_CONTACTS.replace({(str(source_id),): count for source_id, count in unassigned.items()})
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
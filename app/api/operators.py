@@ -1,8 +1,9 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.api.pagination import PageParams, page_params, paginate
 from app.api.schemas import (
     OperatorCreate, OperatorUpdate, OperatorResponse
 )
@@ -27,17 +28,26 @@ async def create_operator(
 
 
 @router.get("", response_model=List[OperatorResponse])
-async def get_operators(db: AsyncSession = Depends(get_db)):
-    """Получить список всех операторов."""
+async def get_operators(
+    response: Response,
+    is_active: Optional[bool] = None,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить страницу операторов (курсор следующей - в заголовке X-Next-Cursor)."""
     repo = OperatorRepository(db)
-    operators = await repo.get_all()
-    return operators
+    operators = await repo.get_page(
+        limit=page.limit + 1,
+        after_id=page.after_id,
+        is_active=is_active
+    )
+    return paginate(response, operators, page)
 
 
 @router.get("/{operator_id}", response_model=OperatorResponse)
 async def get_operator(
     operator_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить оператора по ID."""
     repo = OperatorRepository(db)
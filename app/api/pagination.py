@@ -0,0 +1,82 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, Query, Response, status
+
+from app.core.config import settings
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+@dataclass
+class PageParams:
+    """Параметры keyset-пагинации списка."""
+    limit: int
+    after_id: Optional[int] = None
+
+
+def encode_cursor(last_id: int) -> str:
+    """Закодировать курсор по id последнего элемента страницы."""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Раскодировать курсор, полученный от клиента."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, value = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(value)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+
+
+def page_params(
+    limit: int = Query(
+        settings.PAGE_SIZE_DEFAULT,
+        ge=1,
+        le=settings.PAGE_SIZE_MAX,
+        description="Размер страницы"
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description=f"Курсор следующей страницы из заголовка {NEXT_CURSOR_HEADER}"
+    )
+) -> PageParams:
+    """Dependency с параметрами пагинации."""
+    return PageParams(
+        limit=limit,
+        after_id=decode_cursor(cursor) if cursor else None
+    )
+
+
+def split_page(items: List[T], params: PageParams) -> Tuple[List[T], Dict[str, str]]:
+    """
+    Обрезать выборку до страницы; вернуть её и заголовки с курсором следующей.
+    
+    Репозиторий запрашивается с limit + 1: лишний элемент означает,
+    что следующая страница существует. Элементы - ORM-объекты или словари
+    с ключом id.
+    """
+    if len(items) <= params.limit:
+        return items, {}
+    items = items[:params.limit]
+    last = items[-1]
+    last_id = last["id"] if isinstance(last, dict) else last.id
+    return items, {NEXT_CURSOR_HEADER: encode_cursor(last_id)}
+
+
+def paginate(response: Response, items: List[T], params: PageParams) -> List[T]:
+    """Обрезать выборку до страницы и выставить курсор следующей в заголовке ответа."""
+    items, headers = split_page(items, params)
+    response.headers.update(headers)
+    return items
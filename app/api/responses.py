@@ -0,0 +1,29 @@
+"""
+Кодирование ответов в JSON.
+
+Ответы кодируются orjson (ORJSONResponse - класс ответа приложения по
+умолчанию). Быстрый путь списков и карточек отдаёт словари, собранные
+репозиторием из строк без ORM-объектов, прямо в ответ, минуя валидацию
+схемой (json_response).
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON-ответ, закодированный orjson.
+    
+    Даты с часовым поясом UTC кодируются с суффиксом Z, как в Pydantic,
+    поэтому ответ не отличается от ответа через схему.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, **kwargs) -> JSONResponse:
+    """Ответ из словарей и списков (даты кодируются в ISO 8601)."""
+    return ORJSONResponse(content, **kwargs)
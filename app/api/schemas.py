@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, Field, ConfigDict
 
 
@@ -28,9 +28,15 @@ class OperatorResponse(OperatorBase):
 
 
 # Источники
+DistributionStrategy = Literal[
+    "weighted_random", "smooth_round_robin", "power_of_two", "least_loaded"
+]
+
+
 class SourceBase(BaseModel):
     name: str
     description: Optional[str] = None
+    distribution_strategy: DistributionStrategy = "weighted_random"
 
 
 class SourceCreate(SourceBase):
@@ -40,6 +46,7 @@ class SourceCreate(SourceBase):
 class SourceUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    distribution_strategy: Optional[DistributionStrategy] = None
 
 
 class SourceResponse(SourceBase):
@@ -108,6 +115,40 @@ class ContactCreate(ContactBase):
     lead_name: Optional[str] = None
 
 
+ContactStatus = Literal["active", "closed"]
+
+
+class ContactUpdate(BaseModel):
+    """
+    Изменение обращения.
+    
+    operator_id: null снимает оператора; поле, не переданное в запросе,
+    не меняется.
+    """
+    status: Optional[ContactStatus] = None
+    operator_id: Optional[int] = None
+
+
+class ContactBulkClose(BaseModel):
+    """Массовое закрытие активных обращений (нужен хотя бы один фильтр)."""
+    contact_ids: Optional[List[int]] = None
+    source_id: Optional[int] = None
+    operator_id: Optional[int] = None
+
+
+class ContactBulkReassign(BaseModel):
+    """Массовая передача активных обращений оператора (null - без оператора) другому."""
+    from_operator_id: Optional[int]
+    to_operator_id: Optional[int]
+    contact_ids: Optional[List[int]] = None
+    source_id: Optional[int] = None
+
+
+class ContactBulkResult(BaseModel):
+    """Результат массового изменения обращений."""
+    updated: int
+
+
 class ContactResponse(ContactBase):
     model_config = ConfigDict(from_attributes=True)
     
@@ -128,14 +169,41 @@ class ContactWithDetails(ContactResponse):
     source: SourceResponse
 
 
+class ContactBatchResult(BaseModel):
+    """Результат регистрации одного обращения из пакета."""
+    model_config = ConfigDict(from_attributes=True)
+    
+    index: int
+    contact: Optional[ContactResponse] = None
+    error: Optional[str] = None
+
+
+class ContactTicket(BaseModel):
+    """Заявка на отложенную регистрацию обращения."""
+    model_config = ConfigDict(from_attributes=True)
+    
+    ticket_id: str
+    status: Literal["queued", "done", "failed"]
+    contact_id: Optional[int] = None
+    operator_id: Optional[int] = None
+    error: Optional[str] = None
+
+
 # Статистика
 class DistributionStats(BaseModel):
-    """Статистика распределения обращений."""
+    """
+    Статистика распределения обращений.
+    
+    bucket_start заполнен для статистики по интервалам (hour/day), в ней
+    нет active_count; в статистике за всё время - наоборот.
+    """
     source_id: int
     source_name: str
     operator_id: Optional[int]
     operator_name: Optional[str]
     contacts_count: int
+    active_count: Optional[int] = None
+    bucket_start: Optional[datetime] = None
 
 
 class LeadWithContacts(LeadResponse):
@@ -1,8 +1,9 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.api.pagination import PageParams, page_params, paginate
 from app.api.schemas import (
     SourceCreate, SourceUpdate, SourceResponse, SourceDistributionConfig,
     OperatorSourceWeightResponse
@@ -31,23 +32,28 @@ async def create_source(
     
     source = await repo.create(
         name=source_data.name,
-        description=source_data.description
+        description=source_data.description,
+        distribution_strategy=source_data.distribution_strategy
     )
     return source
 
 
 @router.get("", response_model=List[SourceResponse])
-async def get_sources(db: AsyncSession = Depends(get_db)):
-    """Получить список всех источников."""
+async def get_sources(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить страницу источников (курсор следующей - в заголовке X-Next-Cursor)."""
     repo = SourceRepository(db)
-    sources = await repo.get_all()
-    return sources
+    sources = await repo.get_page(limit=page.limit + 1, after_id=page.after_id)
+    return paginate(response, sources, page)
 
 
 @router.get("/{source_id}", response_model=SourceResponse)
 async def get_source(
     source_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить источник по ID."""
     repo = SourceRepository(db)
@@ -88,6 +94,9 @@ async def update_source(
     if source_data.description is not None:
         source.description = source_data.description
     
+    if source_data.distribution_strategy is not None:
+        source.distribution_strategy = source_data.distribution_strategy
+    
     source = await repo.update(source)
     return source
 
@@ -137,7 +146,7 @@ async def set_source_distribution(
 )
 async def get_source_distribution(
     source_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить конфигурацию распределения для источника."""
     source_repo = SourceRepository(db)
@@ -1,16 +1,123 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import logging
+from typing import Dict, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
-# Создаём async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-)
+logger = logging.getLogger(__name__)
+
+
+def sqlite_pragmas() -> Dict[str, Union[str, int]]:
+    """
+    Профиль производительности SQLite из настроек.
+    
+    busy_timeout идёт первым, чтобы смена режима журнала тоже ждала
+    снятия блокировки, а не падала с «database is locked».
+    """
+    return {
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+
+
+def install_sqlite_pragmas(
+    engine: AsyncEngine, pragmas: Dict[str, Union[str, int]]
+) -> None:
+    """Выполнять PRAGMA профиля на каждом новом соединении движка SQLite."""
+    if engine.dialect.name != "sqlite":
+        return
+    
+    @event.listens_for(engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+async def run_sqlite_maintenance(engine: AsyncEngine, interval: float) -> None:
+    """
+    Периодическое обслуживание SQLite.
+    
+    PRAGMA optimize обновляет статистику планировщика по таблицам, где она
+    устарела; wal_checkpoint(PASSIVE) переносит WAL в основной файл, не
+    блокируя читателей и писателей, чтобы журнал не рос неограниченно.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql("PRAGMA optimize")
+                if settings.SQLITE_JOURNAL_MODE == "WAL":
+                    await conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        except Exception:
+            logger.exception("Не удалось выполнить обслуживание SQLite")
+
+
+def _create_engine(
+    url: str, pool_size: int, max_overflow: int, **options
+) -> AsyncEngine:
+    """Создать async engine с собственным пулом соединений."""
+    pool_options = {}
+    if ":memory:" not in url:
+        # Для файловой SQLite драйвер aiosqlite по умолчанию не держит пул
+        # (NullPool) и открывает соединение с потоком на каждую сессию;
+        # in-memory SQLite работает на одном соединении, пул к ней неприменим
+        pool_options = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+    return create_async_engine(url, echo=False, future=True, **pool_options, **options)
+
+
+def create_write_engine(url: str) -> AsyncEngine:
+    """Engine для записи: регистрация обращений и прочие изменения."""
+    write_engine = _create_engine(url, settings.DB_WRITE_POOL_SIZE, settings.DB_WRITE_MAX_OVERFLOW)
+    install_sqlite_pragmas(write_engine, sqlite_pragmas())
+    return write_engine
+
+
+def create_read_engine(url: str) -> AsyncEngine:
+    """
+    Engine для чтения: списки, выгрузки и статистика.
+    
+    Свой пул не даёт долгим чтениям занимать соединения записи, а в WAL
+    читатели SQLite не блокируют писателя. Транзакции только для чтения
+    (query_only в SQLite, default_transaction_read_only в PostgreSQL)
+    защищают от случайной записи; режим журнала SQLite хранится в файле
+    БД и выставляется соединениями записи.
+    """
+    options = {}
+    if url.startswith("postgresql"):
+        options["connect_args"] = {"server_settings": {"default_transaction_read_only": "on"}}
+    read_engine = _create_engine(
+        url, settings.DB_READ_POOL_SIZE, settings.DB_READ_MAX_OVERFLOW, **options
+    )
+    pragmas = {name: value for name, value in sqlite_pragmas().items() if name != "journal_mode"}
+    install_sqlite_pragmas(read_engine, {**pragmas, "query_only": "ON"})
+    return read_engine
 
-# Создаём фабрику сессий
+
+# Engines записи и чтения (DATABASE_READ_URL может указывать на реплику)
+engine = create_write_engine(settings.DATABASE_URL)
+read_engine = create_read_engine(settings.DATABASE_READ_URL or settings.DATABASE_URL)
+
+# Создаём фабрики сессий
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -18,16 +125,41 @@ AsyncSessionLocal = async_sessionmaker(
     autocommit=False,
     autoflush=False,
 )
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
 
 # Базовый класс для моделей
 Base = declarative_base()
 
 
+def get_read_session_factory() -> async_sessionmaker:
+    """
+    Dependency для получения фабрики сессий чтения.
+    
+    Используется потоковыми ответами (выгрузками), которые читают
+    после завершения обработчика запроса.
+    """
+    return ReadSessionLocal
+
+
 async def get_db() -> AsyncSession:
-    """Dependency для получения сессии БД."""
+    """Dependency для получения сессии БД (запись)."""
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
             await session.close()
 
+
+async def get_read_db() -> AsyncSession:
+    """Dependency для получения сессии только для чтения (GET-эндпоинты)."""
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
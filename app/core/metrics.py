@@ -0,0 +1,316 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+
+Горячий путь только увеличивает числа в памяти процесса: счётчик - одно
+сложение, гистограмма - bisect по границам корзин и два сложения
+(без кумулятивных сумм и блокировок: приложение работает в одном
+потоке event loop). Кумулятивные значения корзин, значения gauge
+и форматирование считаются при запросе /metrics.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+Labels = Tuple[str, ...]
+
+# Границы корзин задержек, сек
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин для быстрых операций в памяти, сек
+FAST_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.01, 0.1)
+# Границы корзин для числа запросов к БД на HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Значения метрики по наборам меток."""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+    
+    def reset(self) -> None:
+        self._values = {}
+
+
+class Counter(_Metric):
+    """Монотонный счётчик с метками."""
+    
+    kind = "counter"
+
+
+class Gauge(_Metric):
+    """Значение, которое может уменьшаться; set перезаписывает его."""
+    
+    kind = "gauge"
+    
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+    
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+    
+    def replace(self, values: Dict[Labels, float]) -> None:
+        """Заменить все значения (для gauge, вычисляемых при сборе)."""
+        self._values = values
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "total")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Последний элемент - корзина +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+
+class Histogram:
+    """
+    Гистограмма с метками.
+    
+    Значение попадает ровно в одну корзину (le - включительно), накопленные
+    значения корзин считаются при сборе.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(buckets)
+        self._children: Dict[Labels, _HistogramChild] = {}
+    
+    def labels(self, *labels: str) -> _HistogramChild:
+        """Гистограмма для набора меток (создаётся при первом обращении)."""
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _HistogramChild(self.bounds)
+        return child
+    
+    def observe(self, value: float, *labels: str) -> None:
+        # То же, что labels(*labels).observe(value), без двух вызовов на горячем пути
+        child = self._children.get(labels)
+        if child is None:
+            child = self.labels(*labels)
+        child.counts[bisect_left(self.bounds, value)] += 1
+        child.total += value
+    
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for labels, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(self.labelnames, labels, f'le="{_format_value(float(bound))}"'),
+                    cumulative,
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum", label_text, child.total
+            yield f"{self.name}_count", label_text, cumulative
+    
+    def reset(self) -> None:
+        self._children = {}
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и функций, обновляющих gauge перед сбором."""
+    
+    def __init__(self):
+        self._metrics: List[Union[_Metric, "Histogram"]] = []
+        self._collectors: List[Callable[[], None]] = []
+    
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Вызывать collector перед каждым сбором (например, для gauge из реестров в памяти)."""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+    
+    def reset(self) -> None:
+        """Обнулить все метрики."""
+        for metric in self._metrics:
+            metric.reset()
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "Обработанные HTTP-запросы", ("method", "route", "status")
+))
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP-запросы в обработке"
+))
+HTTP_REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Запросы к БД на один HTTP-запрос", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+))
+HTTP_REQUEST_DB_DURATION = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Время запросов к БД на один HTTP-запрос", ("method", "route")
+))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Выполненные запросы к БД"
+))
+DB_QUERY_DURATION = registry.register(Counter(
+    "db_query_duration_seconds_total", "Суммарное время запросов к БД"
+))
+OPERATOR_SELECTION_DURATION = registry.register(Histogram(
+    "operator_selection_duration_seconds", "Время выбора оператора для обращения",
+    buckets=FAST_BUCKETS
+))
+UNASSIGNED_CONTACTS = registry.register(Gauge(
+    "unassigned_contacts", "Активные обращения без оператора по источникам", ("source_id",)
+))
+BACKLOG_QUEUE_SIZE = registry.register(Gauge(
+    "backlog_queue_size", "Обращения в очереди диспетчера процесса"
+))
+OPERATOR_LOAD = registry.register(Gauge(
+    "operator_load", "Активные обращения оператора (с резервами)", ("operator_id",)
+))
+OPERATOR_MAX_LOAD = registry.register(Gauge(
+    "operator_max_load", "Лимит активных обращений оператора", ("operator_id",)
+))
+
+
+class QueryStats:
+    """Запросы к БД в пределах одного HTTP-запроса."""
+    
+    __slots__ = ("count", "duration", "statements")
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Число выполнений по тексту запроса; None - тексты не учитываются
+        self.statements: Optional[Dict[str, int]] = None
+
+
+# Статистика запросов к БД текущего HTTP-запроса (None - вне запроса)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Запросы одного соединения не вкладываются друг в друга - хватает одной отметки,
+    # которую перезапишет следующий запрос, даже если этот завершился ошибкой
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_started")
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.inc(amount=elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        if stats.statements is not None:
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def instrument_sqlalchemy() -> None:
+    """Учитывать число и время запросов всех engines процесса."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время, статус, запросы к БД и число HTTP-запросов в обработке.
+    
+    Маршрут берётся шаблоном пути (например, /api/v1/contacts/{contact_id}),
+    чтобы число меток не росло с числом идентификаторов.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            current_query_stats.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            HTTP_REQUESTS.inc(*labels, str(status_code))
+            HTTP_REQUEST_DURATION.observe(elapsed, *labels)
+            HTTP_REQUEST_DB_QUERIES.observe(stats.count, *labels)
+            HTTP_REQUEST_DB_DURATION.observe(stats.duration, *labels)
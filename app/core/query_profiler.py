@@ -0,0 +1,87 @@
+"""
+Профилирование запросов к БД в пределах HTTP-запроса.
+
+Число и время запросов считают обработчики событий курсора из
+app.core.metrics; профилировщик дополнительно учитывает тексты запросов,
+отдаёт итоги в заголовках X-DB-Queries и X-DB-Time (мс) и предупреждает
+в логе, если запрос одной формы выполнен больше порога раз - типичный
+признак N+1.
+"""
+import logging
+import re
+from typing import Dict
+
+from app.core.config import settings
+from app.core.metrics import QueryStats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+
+# Параметр запроса в синтаксисе любого из драйверов: ?, $1 (и $1::VARCHAR), :name, %(name)s
+_PARAMETER = r"\s*(?:\?|\$\d+(?:::[\w ]+)?|:\w+|%\(\w+\)s)\s*"
+# Список параметров (IN, VALUES) - его длина не меняет форму запроса
+_PARAMETER_LIST = re.compile(rf"\((?:{_PARAMETER},)*{_PARAMETER}\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: текст без различий в пробелах и длине списков параметров."""
+    return _PARAMETER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def repeated_shapes(statements: Dict[str, int], threshold: int) -> Dict[str, int]:
+    """Формы запросов, выполненные больше threshold раз."""
+    shapes: Dict[str, int] = {}
+    for statement, count in statements.items():
+        shape = statement_shape(statement)
+        shapes[shape] = shapes.get(shape, 0) + count
+    return {shape: count for shape, count in shapes.items() if count > threshold}
+
+
+class QueryProfilerMiddleware:
+    """
+    ASGI middleware профилирования запросов к БД (включается DB_QUERY_PROFILING).
+    
+    Заголовки отражают запросы, выполненные до начала ответа: запросы
+    потоковых выгрузок после этого учитываются только в проверке повторов.
+    Должен стоять внутри MetricsMiddleware, чтобы использовать её счётчики.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.DB_QUERY_PROFILING:
+            await self.app(scope, receive, send)
+            return
+        
+        stats = current_query_stats.get()
+        token = None
+        if stats is None:
+            stats = QueryStats()
+            token = current_query_stats.set(stats)
+        stats.statements = {}
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((DB_QUERIES_HEADER.lower().encode(), str(stats.count).encode()))
+                headers.append(
+                    (DB_TIME_HEADER.lower().encode(), f"{stats.duration * 1000:.3f}".encode())
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                current_query_stats.reset(token)
+            threshold = settings.DB_QUERY_REPEAT_THRESHOLD
+            for shape, count in repeated_shapes(stats.statements, threshold).items():
+                logger.warning(
+                    "Запрос выполнен %d раз за %s %s (возможен N+1): %s",
+                    count, scope["method"], scope["path"], shape
+                )
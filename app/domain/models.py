@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -16,6 +16,8 @@ class Operator(Base):
     name = Column(String, nullable=False, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
     max_load = Column(Integer, default=10, nullable=False)  # Лимит активных обращений
+    # Активные обращения; меняется в транзакциях назначения и смены статуса
+    active_load = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -32,6 +34,7 @@ class Source(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, unique=True, index=True)
     description = Column(String, nullable=True)
+    distribution_strategy = Column(String, default="weighted_random", nullable=False)  # Стратегия выбора оператора
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Связи
@@ -54,9 +57,11 @@ class OperatorSourceWeight(Base):
     operator = relationship("Operator", back_populates="source_weights")
     source = relationship("Source", back_populates="operator_weights")
     
-    # Уникальность пары оператор-источник
+    # Уникальность пары оператор-источник; отдельный индекс с source_id
+    # первым - для выборки операторов источника
     __table_args__ = (
         UniqueConstraint('operator_id', 'source_id', name='uq_operator_source'),
+        Index('ix_operator_source_weights_source_operator', 'source_id', 'operator_id'),
     )
 
 
@@ -70,7 +75,7 @@ class Lead(Base):
     phone = Column(String, nullable=True, index=True)
     email = Column(String, nullable=True, index=True)
     name = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Связи
@@ -95,4 +100,69 @@ class Contact(Base):
     lead = relationship("Lead", back_populates="contacts")
     source = relationship("Source", back_populates="contacts")
     operator = relationship("Operator", back_populates="contacts")
+    
+    # Индексы под фильтры и keyset-пагинацию списка обращений (они же
+    # обслуживают обращения оператора и источника), выборку обращений лида
+    # и подсчёт нагрузки операторов (частичный индекс только по активным
+    # обращениям)
+    __table_args__ = (
+        Index('ix_contacts_status_id', 'status', 'id'),
+        Index('ix_contacts_source_id_id', 'source_id', 'id'),
+        Index('ix_contacts_operator_id_id', 'operator_id', 'id'),
+        Index('ix_contacts_created_at', 'created_at'),
+        Index('ix_contacts_lead_id', 'lead_id'),
+        Index(
+            'ix_contacts_active_operator',
+            'operator_id',
+            sqlite_where=text("status = 'active'"),
+            postgresql_where=text("status = 'active'"),
+        ),
+    )
+
+
+class DistributionStat(Base):
+    """
+    Сводка распределения обращений по паре источник-оператор.
+    
+    Поддерживается инкрементально в той же транзакции, что и вставка
+    обращения или смена его статуса; нераспределённые обращения
+    учитываются с operator_id = 0.
+    """
+    
+    __tablename__ = "distribution_stats"
+    
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True)
+    operator_id = Column(Integer, primary_key=True)  # 0 - обращения без оператора
+    contacts_count = Column(Integer, default=0, nullable=False)
+    active_count = Column(Integer, default=0, nullable=False)
+
 
+class DistributionStatHourly(Base):
+    """Почасовая сводка созданных обращений по паре источник-оператор."""
+    
+    __tablename__ = "distribution_stats_hourly"
+    
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)  # Начало часа, UTC
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True)
+    operator_id = Column(Integer, primary_key=True)  # 0 - обращения без оператора
+    contacts_count = Column(Integer, default=0, nullable=False)
+
+
+class DistributionStatDaily(Base):
+    """Посуточная сводка созданных обращений по паре источник-оператор."""
+    
+    __tablename__ = "distribution_stats_daily"
+    
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)  # Начало суток, UTC
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True)
+    operator_id = Column(Integer, primary_key=True)  # 0 - обращения без оператора
+    contacts_count = Column(Integer, default=0, nullable=False)
+
+
+class RollupWatermark(Base):
+    """Отметка фонового агрегатора: часы до settled_until посчитаны окончательно."""
+    
+    __tablename__ = "rollup_watermarks"
+    
+    name = Column(String, primary_key=True)
+    settled_until = Column(DateTime(timezone=True), nullable=False)  # Начало часа, UTC
@@ -1,11 +1,144 @@
-from typing import Optional, List
-from sqlalchemy import select, func, and_
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Tuple, Set, Iterable, AsyncIterator, Sequence, Callable
+from sqlalchemy import select, insert, update, delete, func, and_, or_, literal_column, bindparam
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.domain.models import (
-    Operator, Source, OperatorSourceWeight, Lead, Contact
+    Operator, Source, OperatorSourceWeight, Lead, Contact, DistributionStat,
+    DistributionStatHourly, DistributionStatDaily, RollupWatermark
 )
+from app.infrastructure.routing_cache import (
+    RoutingEntry, RoutingTable, routing_cache
+)
+
+# Поля, по которым обращения сопоставляются с существующим лидом
+LEAD_IDENTITY_FIELDS = ("external_id", "phone", "email")
+
+# Условие частичного индекса ix_contacts_active_operator. Значение
+# подставляется в SQL литералом: с параметром планировщик не может
+# доказать, что запрос попадает под условие индекса
+ACTIVE_CONTACT = Contact.status == literal_column("'active'")
+
+# operator_id в сводке распределения для обращений без оператора
+UNASSIGNED_OPERATOR_ID = 0
+
+# Колонки потоковой выгрузки
+LEAD_EXPORT_COLUMNS = ("id", "external_id", "phone", "email", "name", "created_at", "updated_at")
+CONTACT_EXPORT_COLUMNS = (
+    "id", "lead_id", "source_id", "operator_id", "status", "message", "created_at", "updated_at"
+)
+
+# Поля ответов, собираемых из строк без ORM-объектов, в порядке полей
+# схем ContactResponse, LeadResponse, OperatorResponse и SourceResponse
+CONTACT_FIELDS = (
+    "source_id", "message", "id", "lead_id", "operator_id", "status", "created_at", "updated_at"
+)
+LEAD_FIELDS = ("external_id", "phone", "email", "name", "id", "created_at", "updated_at")
+OPERATOR_FIELDS = ("name", "is_active", "max_load", "id", "created_at")
+SOURCE_FIELDS = ("name", "description", "distribution_strategy", "id", "created_at")
+
+
+def _columns(model, fields: Sequence[str]) -> list:
+    return [getattr(model, field) for field in fields]
+
+
+# Связи обращения, которые можно присоединить к строке: модель, поля,
+# условие соединения и признак LEFT JOIN (у обращения может не быть оператора)
+CONTACT_RELATIONS = {
+    "lead": (Lead, LEAD_FIELDS, Contact.lead_id == Lead.id, False),
+    "operator": (Operator, OPERATOR_FIELDS, Contact.operator_id == Operator.id, True),
+    "source": (Source, SOURCE_FIELDS, Contact.source_id == Source.id, False),
+}
+LEAD_RELATIONS = ("contacts",)
+
+
+def _contact_rows_query(fields: Sequence[str], include: Sequence[str]):
+    """
+    SELECT только нужных колонок обращения и присоединённых связей.
+    
+    Колонки идут подряд: поля обращения, затем поля каждой связи в порядке
+    include; без связей запрос читает одну таблицу contacts.
+    """
+    columns = _columns(Contact, fields)
+    for name in include:
+        model, relation_fields, _, _ = CONTACT_RELATIONS[name]
+        columns += _columns(model, relation_fields)
+    query = select(*columns).select_from(Contact)
+    for name in include:
+        model, _, onclause, outer = CONTACT_RELATIONS[name]
+        query = query.join(model, onclause, isouter=outer)
+    return query
+
+
+def _contact_row_mapper(
+    fields: Sequence[str], include: Sequence[str]
+) -> Callable[[Row], dict]:
+    """Функция, раскладывающая строку _contact_rows_query в словарь ответа."""
+    layout = []
+    start = len(fields)
+    for name in include:
+        relation_fields = CONTACT_RELATIONS[name][1]
+        end = start + len(relation_fields)
+        layout.append((name, relation_fields, start, end, start + relation_fields.index("id")))
+        start = end
+    
+    def to_dict(row: Row) -> dict:
+        contact = dict(zip(fields, row))
+        for name, relation_fields, begin, end, id_index in layout:
+            contact[name] = (
+                dict(zip(relation_fields, row[begin:end])) if row[id_index] is not None else None
+            )
+        return contact
+    
+    return to_dict
+
+
+async def _stream_partitions(
+    session: AsyncSession, query, chunk_size: int
+) -> AsyncIterator[Sequence[Row]]:
+    """Читать результат серверным курсором порциями по chunk_size строк."""
+    result = await session.stream(query.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions(chunk_size):
+        yield partition
+
+
+async def _upsert_increments(
+    session: AsyncSession,
+    model,
+    keys: Sequence[str],
+    counters: Sequence[str],
+    rows: List[dict]
+) -> None:
+    """
+    Прибавить значения счётчиков к строкам сводки одним UPSERT (executemany).
+    
+    Отсутствующие строки создаются, у существующих счётчики увеличиваются
+    (INSERT ... ON CONFLICT DO UPDATE в диалекте SQLite или PostgreSQL).
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql_insert(model)
+    else:
+        stmt = sqlite_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={
+            counter: getattr(model, counter) + getattr(stmt.excluded, counter)
+            for counter in counters
+        }
+    )
+    await session.execute(stmt, rows)
+
+
+def _operator_is(operator_id: Optional[int]):
+    """Условие на оператора обращения (None - обращение без оператора)."""
+    if operator_id is None:
+        return Contact.operator_id.is_(None)
+    return Contact.operator_id == operator_id
 
 
 class OperatorRepository:
@@ -29,14 +162,26 @@ class OperatorRepository:
         )
         return result.scalar_one_or_none()
     
-    async def get_all(self) -> List[Operator]:
-        """Получить всех операторов."""
-        result = await self.session.execute(select(Operator))
+    async def get_page(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Operator]:
+        """Получить страницу операторов (keyset по id)."""
+        query = select(Operator)
+        if after_id is not None:
+            query = query.where(Operator.id > after_id)
+        if is_active is not None:
+            query = query.where(Operator.is_active == is_active)
+        result = await self.session.execute(query.order_by(Operator.id).limit(limit))
         return list(result.scalars().all())
     
     async def update(self, operator: Operator) -> Operator:
         """Обновить оператора."""
         await self.session.commit()
+        # Активность и лимит оператора входят в таблицы всех его источников
+        routing_cache.invalidate()
         await self.session.refresh(operator)
         return operator
     
@@ -64,11 +209,187 @@ class OperatorRepository:
             .where(
                 and_(
                     Contact.operator_id == operator_id,
-                    Contact.status == "active"
+                    ACTIVE_CONTACT
                 )
             )
         )
         return result.scalar() or 0
+    
+    async def claim_capacity(self, operator_id: int, count: int = 1) -> Optional[Operator]:
+        """
+        Занять count слотов оператора в БД, если они свободны.
+        
+        Один UPDATE увеличивает active_load активного оператора, только если
+        после этого нагрузка не превысит max_load; подсчёта обращений нет.
+        Занятая строка заблокирована до конца транзакции, поэтому назначения
+        одному оператору из разных транзакций и экземпляров приложения
+        сериализуются: параллельная транзакция ждёт коммита и проверяет
+        условие уже по новому значению. Строку, не прошедшую условие,
+        UPDATE не блокирует. Коммит выполняет вызывающий код.
+        
+        Возвращает оператора из RETURNING (без отдельного SELECT) или None,
+        если слоты не заняты.
+        """
+        return await self.session.scalar(
+            update(Operator)
+            .where(
+                and_(
+                    Operator.id == operator_id,
+                    Operator.is_active == True,
+                    Operator.active_load + count <= Operator.max_load
+                )
+            )
+            # updated_at отражает правки оператора, а не его нагрузку
+            .values(active_load=Operator.active_load + count, updated_at=Operator.updated_at)
+            .returning(Operator),
+            execution_options={"populate_existing": True}
+        )
+    
+    async def add_active_loads(self, deltas: Dict[int, int]) -> None:
+        """
+        Прибавить приращения к active_load операторов (в текущей транзакции).
+        
+        Строки обновляются в порядке id, как и при занятии слотов пакетом,
+        чтобы параллельные транзакции блокировали их в одном порядке.
+        """
+        rows = [
+            {"operator_id": operator_id, "delta": delta}
+            for operator_id, delta in sorted(deltas.items())
+            if delta
+        ]
+        if not rows:
+            return
+        operators = Operator.__table__
+        await self.session.execute(
+            update(operators)
+            .where(operators.c.id == bindparam("operator_id"))
+            .values(
+                active_load=operators.c.active_load + bindparam("delta"),
+                updated_at=operators.c.updated_at
+            ),
+            rows
+        )
+    
+    async def rebuild_active_loads(self) -> None:
+        """Пересчитать active_load всех операторов по таблице обращений (коммит - у вызывающего)."""
+        await self.session.execute(
+            update(Operator)
+            .values(
+                active_load=select(func.count(Contact.id))
+                .where(
+                    and_(
+                        Contact.operator_id == Operator.id,
+                        ACTIVE_CONTACT
+                    )
+                )
+                .scalar_subquery(),
+                updated_at=Operator.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    async def get_candidates_for_source(
+        self, source_id: int, exclude_full: bool = True
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Получить кандидатов на распределение одним запросом.
+        
+        Возвращает кортежи (operator_id, weight, max_load, active_load)
+        для активных операторов источника. При exclude_full операторы,
+        достигшие лимита, отсекаются на стороне БД.
+        """
+        active_load = func.count(Contact.id)
+        query = (
+            select(
+                OperatorSourceWeight.operator_id,
+                OperatorSourceWeight.weight,
+                Operator.max_load,
+                active_load.label("active_load")
+            )
+            .join(Operator, Operator.id == OperatorSourceWeight.operator_id)
+            .outerjoin(
+                Contact,
+                and_(
+                    Contact.operator_id == OperatorSourceWeight.operator_id,
+                    ACTIVE_CONTACT
+                )
+            )
+            .where(
+                and_(
+                    OperatorSourceWeight.source_id == source_id,
+                    Operator.is_active == True
+                )
+            )
+            .group_by(
+                OperatorSourceWeight.operator_id,
+                OperatorSourceWeight.weight,
+                Operator.max_load
+            )
+        )
+        if exclude_full:
+            query = query.having(active_load < Operator.max_load)
+        result = await self.session.execute(query)
+        return [tuple(row) for row in result.all()]
+    
+    async def get_routing_table(self, source_id: int) -> RoutingTable:
+        """Получить таблицу маршрутизации источника (из кеша или из БД)."""
+        table = routing_cache.get(source_id)
+        if table is not None:
+            return table
+        
+        generation = routing_cache.generation
+        strategy_result = await self.session.execute(
+            select(Source.distribution_strategy).where(Source.id == source_id)
+        )
+        strategy = strategy_result.scalar_one_or_none() or "weighted_random"
+        # Нагрузка в таблицу не входит (её ведёт реестр), поэтому обращения
+        # не присоединяются: хватает весов и лимитов активных операторов
+        result = await self.session.execute(
+            select(
+                OperatorSourceWeight.operator_id,
+                OperatorSourceWeight.weight,
+                Operator.max_load
+            )
+            .join(Operator, Operator.id == OperatorSourceWeight.operator_id)
+            .where(
+                and_(
+                    OperatorSourceWeight.source_id == source_id,
+                    Operator.is_active == True
+                )
+            )
+            .order_by(OperatorSourceWeight.operator_id)
+        )
+        table = RoutingTable(
+            source_id=source_id,
+            entries=tuple(
+                RoutingEntry(operator_id=operator_id, weight=weight, max_load=max_load)
+                for operator_id, weight, max_load in result.all()
+            ),
+            strategy=strategy
+        )
+        routing_cache.put(table, generation)
+        return table
+    
+    async def get_active_loads(self) -> Dict[int, int]:
+        """Получить нагрузку всех операторов одним GROUP BY запросом."""
+        result = await self.session.execute(
+            select(Contact.operator_id, func.count(Contact.id))
+            .where(
+                and_(
+                    Contact.operator_id.is_not(None),
+                    ACTIVE_CONTACT
+                )
+            )
+            .group_by(Contact.operator_id)
+        )
+        return {operator_id: count for operator_id, count in result.all()}
+    
+    async def get_max_loads(self) -> Dict[int, int]:
+        """Получить лимиты нагрузки активных операторов."""
+        result = await self.session.execute(
+            select(Operator.id, Operator.max_load).where(Operator.is_active == True)
+        )
+        return {operator_id: max_load for operator_id, max_load in result.all()}
 
 
 class SourceRepository:
@@ -77,9 +398,18 @@ class SourceRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def create(self, name: str, description: Optional[str] = None) -> Source:
+    async def create(
+        self,
+        name: str,
+        description: Optional[str] = None,
+        distribution_strategy: str = "weighted_random"
+    ) -> Source:
         """Создать источник."""
-        source = Source(name=name, description=description)
+        source = Source(
+            name=name,
+            description=description,
+            distribution_strategy=distribution_strategy
+        )
         self.session.add(source)
         await self.session.commit()
         await self.session.refresh(source)
@@ -99,14 +429,30 @@ class SourceRepository:
         )
         return result.scalar_one_or_none()
     
-    async def get_all(self) -> List[Source]:
-        """Получить все источники."""
-        result = await self.session.execute(select(Source))
+    async def get_existing_ids(self, source_ids: Iterable[int]) -> Set[int]:
+        """Получить те из переданных ID, для которых существуют источники."""
+        ids = set(source_ids)
+        if not ids:
+            return set()
+        result = await self.session.execute(
+            select(Source.id).where(Source.id.in_(ids))
+        )
+        return set(result.scalars().all())
+    
+    async def get_page(
+        self, limit: int, after_id: Optional[int] = None
+    ) -> List[Source]:
+        """Получить страницу источников (keyset по id)."""
+        query = select(Source)
+        if after_id is not None:
+            query = query.where(Source.id > after_id)
+        result = await self.session.execute(query.order_by(Source.id).limit(limit))
         return list(result.scalars().all())
     
     async def update(self, source: Source) -> Source:
         """Обновить источник."""
         await self.session.commit()
+        routing_cache.invalidate(source.id)
         await self.session.refresh(source)
         return source
 
@@ -135,6 +481,7 @@ class OperatorSourceWeightRepository:
         if existing:
             existing.weight = weight
             await self.session.commit()
+            routing_cache.invalidate(source_id)
             await self.session.refresh(existing)
             return existing
         
@@ -145,6 +492,7 @@ class OperatorSourceWeightRepository:
         )
         self.session.add(weight_obj)
         await self.session.commit()
+        routing_cache.invalidate(source_id)
         await self.session.refresh(weight_obj)
         return weight_obj
     
@@ -169,8 +517,10 @@ class OperatorSourceWeightRepository:
         )
         weight = result.scalar_one_or_none()
         if weight:
+            source_id = weight.source_id
             await self.session.delete(weight)
             await self.session.commit()
+            routing_cache.invalidate(source_id)
             return True
         return False
 
@@ -200,51 +550,100 @@ class LeadRepository:
         await self.session.refresh(lead)
         return lead
     
-    async def find_or_create(
-        self,
-        external_id: Optional[str] = None,
-        phone: Optional[str] = None,
-        email: Optional[str] = None,
-        name: Optional[str] = None
-    ) -> Lead:
-        """Найти существующего лида или создать нового."""
-        # Ищем по external_id, phone или email
-        conditions = []
-        if external_id:
-            conditions.append(Lead.external_id == external_id)
-        if phone:
-            conditions.append(Lead.phone == phone)
-        if email:
-            conditions.append(Lead.email == email)
+    async def find_or_create_many(self, identities: List[dict]) -> List[Lead]:
+        """
+        Найти или создать лидов для пакета обращений.
+        
+        identities - словари с ключами external_id, phone, email, name.
+        Существующие лиды загружаются одним запросом, сопоставление идёт
+        в памяти (совпадение всех переданных идентификаторов), повторы
+        внутри пакета получают одного и того же лида. Изменения не фиксируются (только flush).
+        """
+        values: Dict[str, Set[str]] = {field: set() for field in LEAD_IDENTITY_FIELDS}
+        for identity in identities:
+            for field in LEAD_IDENTITY_FIELDS:
+                if identity.get(field):
+                    values[field].add(identity[field])
         
+        conditions = [
+            getattr(Lead, field).in_(field_values)
+            for field, field_values in values.items()
+            if field_values
+        ]
+        known: List[Lead] = []
         if conditions:
-            result = await self.session.execute(
-                select(Lead).where(
-                    and_(*conditions)
+            result = await self.session.execute(select(Lead).where(or_(*conditions)))
+            known = list(result.scalars().all())
+        
+        index: Dict[str, Dict[str, List[Lead]]] = {
+            field: defaultdict(list) for field in LEAD_IDENTITY_FIELDS
+        }
+        
+        def register(lead: Lead) -> None:
+            for field in LEAD_IDENTITY_FIELDS:
+                value = getattr(lead, field)
+                if value and lead not in index[field][value]:
+                    index[field][value].append(lead)
+        
+        for lead in known:
+            register(lead)
+        
+        leads: List[Lead] = []
+        new_leads: List[Lead] = []
+        for identity in identities:
+            keys = [
+                (field, identity[field])
+                for field in LEAD_IDENTITY_FIELDS
+                if identity.get(field)
+            ]
+            lead = None
+            if keys:
+                field, value = keys[0]
+                for candidate in index[field].get(value, ()):
+                    if all(getattr(candidate, f) == v for f, v in keys):
+                        lead = candidate
+                        break
+            
+            if lead is None:
+                lead = Lead(
+                    external_id=identity.get("external_id"),
+                    phone=identity.get("phone"),
+                    email=identity.get("email"),
+                    name=identity.get("name")
                 )
-            )
-            lead = result.scalar_one_or_none()
-            if lead:
+                new_leads.append(lead)
+            else:
                 # Обновляем данные, если они изменились
-                if name and not lead.name:
-                    lead.name = name
-                if phone and not lead.phone:
-                    lead.phone = phone
-                if email and not lead.email:
-                    lead.email = email
-                if external_id and not lead.external_id:
-                    lead.external_id = external_id
-                await self.session.commit()
-                await self.session.refresh(lead)
-                return lead
+                changed = False
+                for field in ("name",) + LEAD_IDENTITY_FIELDS:
+                    if identity.get(field) and not getattr(lead, field):
+                        setattr(lead, field, identity[field])
+                        changed = True
+                if changed:
+                    # Явное значение вместо onupdate: атрибут не истекает после
+                    # flush, и лида можно отдавать без повторного чтения
+                    lead.updated_at = datetime.now(timezone.utc)
+            register(lead)
+            leads.append(lead)
         
-        # Создаём нового лида
-        return await self.create(
-            external_id=external_id,
-            phone=phone,
-            email=email,
-            name=name
-        )
+        if new_leads:
+            self.session.add_all(new_leads)
+        await self.session.flush()
+        return leads
+    
+    def stream_export(
+        self,
+        chunk_size: int,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Потоково выгрузить лидов (только колонки, без ORM-объектов)."""
+        query = select(*(getattr(Lead, column) for column in LEAD_EXPORT_COLUMNS))
+        if created_from is not None:
+            query = query.where(Lead.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Lead.created_at < created_to)
+        return _stream_partitions(self.session, query.order_by(Lead.id), chunk_size)
     
     async def get_by_id(self, lead_id: int) -> Optional[Lead]:
         """Получить лида по ID."""
@@ -255,12 +654,96 @@ class LeadRepository:
         )
         return result.scalar_one_or_none()
     
-    async def get_all(self) -> List[Lead]:
-        """Получить всех лидов."""
+    async def get_page(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> List[Lead]:
+        """Получить страницу лидов с их обращениями (keyset по id)."""
+        query = self._filter_page(select(Lead), after_id, created_from, created_to)
         result = await self.session.execute(
-            select(Lead).options(selectinload(Lead.contacts))
+            query.order_by(Lead.id)
+            .limit(limit)
+            .options(selectinload(Lead.contacts))
         )
         return list(result.scalars().all())
+    
+    async def get_row(
+        self,
+        lead_id: int,
+        fields: Sequence[str] = LEAD_FIELDS,
+        include: Sequence[str] = LEAD_RELATIONS
+    ) -> Optional[dict]:
+        """Получить лида словарём (по умолчанию - поля LeadWithContacts), без ORM-объектов."""
+        result = await self.session.execute(
+            select(*_columns(Lead, fields)).where(Lead.id == lead_id)
+        )
+        rows = await self._to_dicts(result, fields, include)
+        return rows[0] if rows else None
+    
+    async def get_page_rows(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Sequence[str] = LEAD_FIELDS,
+        include: Sequence[str] = LEAD_RELATIONS
+    ) -> List[dict]:
+        """
+        Получить страницу лидов словарями (по умолчанию - поля LeadWithContacts).
+        
+        Читаются только колонки fields (в них должен быть id); обращения
+        лидов - вторым запросом, если они есть в include. Строки сразу
+        раскладываются в словари без ORM-объектов.
+        """
+        query = self._filter_page(
+            select(*_columns(Lead, fields)), after_id, created_from, created_to
+        )
+        result = await self.session.execute(query.order_by(Lead.id).limit(limit))
+        return await self._to_dicts(result, fields, include)
+    
+    async def _to_dicts(
+        self, result, fields: Sequence[str], include: Sequence[str]
+    ) -> List[dict]:
+        leads = [dict(zip(fields, row)) for row in result]
+        if "contacts" in include:
+            await self._with_contacts(leads)
+        return leads
+    
+    async def _with_contacts(self, leads: List[dict]) -> None:
+        """Добавить словарям лидов их обращения (одним запросом на страницу)."""
+        if not leads:
+            return
+        by_id = {}
+        for lead in leads:
+            lead["contacts"] = []
+            by_id[lead["id"]] = lead["contacts"]
+        contacts = await self.session.execute(
+            select(*_columns(Contact, CONTACT_FIELDS))
+            .where(Contact.lead_id.in_(list(by_id)))
+            .order_by(Contact.lead_id, Contact.id)
+        )
+        lead_index = CONTACT_FIELDS.index("lead_id")
+        for row in contacts:
+            by_id[row[lead_index]].append(dict(zip(CONTACT_FIELDS, row)))
+    
+    @staticmethod
+    def _filter_page(
+        query,
+        after_id: Optional[int],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime]
+    ):
+        if after_id is not None:
+            query = query.where(Lead.id > after_id)
+        if created_from is not None:
+            query = query.where(Lead.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Lead.created_at < created_to)
+        return query
 
 
 class ContactRepository:
@@ -269,27 +752,174 @@ class ContactRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def create(
+    async def add(
         self,
-        lead_id: int,
-        source_id: int,
-        operator_id: Optional[int] = None,
+        lead: Lead,
+        source: Source,
+        operator: Optional[Operator] = None,
         message: Optional[str] = None,
         status: str = "active"
     ) -> Contact:
-        """Создать обращение."""
+        """
+        Добавить обращение в текущую транзакцию (INSERT ... RETURNING).
+        
+        Связи заполняются переданными объектами, поэтому обращение можно
+        отдавать в ответе без повторной загрузки. Сводка распределения
+        обновляется в той же транзакции; коммит выполняет вызывающий код.
+        """
         contact = Contact(
-            lead_id=lead_id,
-            source_id=source_id,
-            operator_id=operator_id,
+            lead=lead,
+            source=source,
+            operator=operator,
             message=message,
             status=status
         )
         self.session.add(contact)
-        await self.session.commit()
-        await self.session.refresh(contact)
+        await self.session.flush()
+        await DistributionStatsRepository(self.session).record_created(
+            [(contact.source_id, contact.operator_id, contact.status)]
+        )
         return contact
     
+    async def create_many(self, rows: List[dict]) -> List[Contact]:
+        """
+        Создать обращения одним INSERT ... RETURNING (executemany).
+        
+        Сводка распределения обновляется одним UPSERT по затронутым парам.
+        Изменения не фиксируются - коммит выполняет вызывающий код.
+        """
+        if not rows:
+            return []
+        result = await self.session.scalars(
+            insert(Contact).returning(Contact, sort_by_parameter_order=True),
+            rows
+        )
+        contacts = list(result.all())
+        await DistributionStatsRepository(self.session).record_created(
+            (contact.source_id, contact.operator_id, contact.status)
+            for contact in contacts
+        )
+        return contacts
+    
+    async def update_state(
+        self,
+        contact: Contact,
+        status: str,
+        operator_id: Optional[int]
+    ) -> bool:
+        """
+        Сменить статус и оператора обращения (compare-and-set).
+        
+        UPDATE срабатывает, только если статус и оператор в БД совпадают
+        с прочитанными в contact, иначе возвращается False: параллельное
+        изменение того же обращения не будет учтено в нагрузке дважды.
+        Сводка распределения не обновляется, коммит выполняет вызывающий код.
+        """
+        result = await self.session.execute(
+            update(Contact)
+            .where(
+                Contact.id == contact.id,
+                Contact.status == contact.status,
+                _operator_is(contact.operator_id)
+            )
+            .values(status=status, operator_id=operator_id)
+        )
+        return result.rowcount == 1
+    
+    async def close_many(
+        self,
+        status: str,
+        contact_ids: Optional[Sequence[int]] = None,
+        source_id: Optional[int] = None,
+        operator_id: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Перевести активные обращения по фильтрам в статус status одним UPDATE.
+        
+        Возвращает (source_id, operator_id) изменённых обращений для учёта
+        в сводке и нагрузке. Коммит выполняет вызывающий код.
+        """
+        query = update(Contact).where(ACTIVE_CONTACT)
+        if contact_ids is not None:
+            query = query.where(Contact.id.in_(contact_ids))
+        if source_id is not None:
+            query = query.where(Contact.source_id == source_id)
+        if operator_id is not None:
+            query = query.where(Contact.operator_id == operator_id)
+        result = await self.session.execute(
+            query.values(status=status)
+            .returning(Contact.source_id, Contact.operator_id)
+        )
+        return list(result.all())
+    
+    async def reassign_many(
+        self,
+        from_operator_id: Optional[int],
+        to_operator_id: Optional[int],
+        contact_ids: Optional[Sequence[int]] = None,
+        source_id: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Передать активные обращения оператора (None - без оператора) другому одним UPDATE.
+        
+        Возвращает (id, source_id) переданных обращений. Коммит выполняет
+        вызывающий код.
+        """
+        query = update(Contact).where(ACTIVE_CONTACT, _operator_is(from_operator_id))
+        if contact_ids is not None:
+            query = query.where(Contact.id.in_(contact_ids))
+        if source_id is not None:
+            query = query.where(Contact.source_id == source_id)
+        result = await self.session.execute(
+            query.values(operator_id=to_operator_id)
+            .returning(Contact.id, Contact.source_id)
+        )
+        return list(result.all())
+    
+    async def get_unassigned(self) -> List[Row]:
+        """Активные обращения без оператора: (id, source_id) по возрастанию id."""
+        result = await self.session.execute(
+            select(Contact.id, Contact.source_id)
+            .where(ACTIVE_CONTACT, Contact.operator_id.is_(None))
+            .order_by(Contact.id)
+        )
+        return list(result.all())
+    
+    async def assign_unassigned(
+        self, contact_ids: Sequence[int], operator_id: int
+    ) -> List[int]:
+        """
+        Назначить оператора обращениям, которые всё ещё активны и без оператора.
+        
+        Возвращает id назначенных обращений; остальные (закрытые или
+        назначенные за это время) не меняются. Коммит выполняет вызывающий код.
+        """
+        result = await self.session.execute(
+            update(Contact)
+            .where(
+                Contact.id.in_(contact_ids),
+                ACTIVE_CONTACT,
+                Contact.operator_id.is_(None)
+            )
+            .values(operator_id=operator_id)
+            .returning(Contact.id)
+        )
+        return list(result.scalars().all())
+    
+    def stream_export(
+        self,
+        chunk_size: int,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Потоково выгрузить обращения (только колонки, без ORM-объектов)."""
+        query = select(*(getattr(Contact, column) for column in CONTACT_EXPORT_COLUMNS))
+        if created_from is not None:
+            query = query.where(Contact.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Contact.created_at < created_to)
+        return _stream_partitions(self.session, query.order_by(Contact.id), chunk_size)
+    
     async def get_by_id(self, contact_id: int) -> Optional[Contact]:
         """Получить обращение по ID."""
         result = await self.session.execute(
@@ -303,10 +933,28 @@ class ContactRepository:
         )
         return result.scalar_one_or_none()
     
-    async def get_all(self) -> List[Contact]:
-        """Получить все обращения."""
+    async def get_page(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        status: Optional[str] = None,
+        source_id: Optional[int] = None,
+        operator_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None
+    ) -> List[Contact]:
+        """
+        Получить страницу обращений (keyset по id) с фильтрами.
+        
+        Связи загружаются только для обращений страницы, поэтому объём
+        памяти не зависит от размера таблицы.
+        """
+        query = self._filter_page(
+            select(Contact), after_id, status, source_id, operator_id, created_from, created_to
+        )
         result = await self.session.execute(
-            select(Contact)
+            query.order_by(Contact.id)
+            .limit(limit)
             .options(
                 selectinload(Contact.lead),
                 selectinload(Contact.operator),
@@ -315,20 +963,90 @@ class ContactRepository:
         )
         return list(result.scalars().all())
     
+    async def get_row(
+        self,
+        contact_id: int,
+        fields: Sequence[str] = CONTACT_FIELDS,
+        include: Sequence[str] = tuple(CONTACT_RELATIONS)
+    ) -> Optional[dict]:
+        """Получить обращение словарём (по умолчанию - поля ContactWithDetails), без ORM-объектов."""
+        result = await self.session.execute(
+            _contact_rows_query(fields, include).where(Contact.id == contact_id)
+        )
+        row = result.first()
+        return _contact_row_mapper(fields, include)(row) if row is not None else None
+    
+    async def get_page_rows(
+        self,
+        limit: int,
+        after_id: Optional[int] = None,
+        status: Optional[str] = None,
+        source_id: Optional[int] = None,
+        operator_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Sequence[str] = CONTACT_FIELDS,
+        include: Sequence[str] = tuple(CONTACT_RELATIONS)
+    ) -> List[dict]:
+        """
+        Получить страницу обращений словарями (по умолчанию - поля ContactWithDetails).
+        
+        Читаются только колонки fields (в них должен быть id), связи из
+        include присоединяются в том же SELECT; строки сразу раскладываются
+        в словари: ни ORM-объектов, ни отдельных запросов на связи.
+        """
+        query = self._filter_page(
+            _contact_rows_query(fields, include),
+            after_id, status, source_id, operator_id, created_from, created_to
+        )
+        result = await self.session.execute(query.order_by(Contact.id).limit(limit))
+        return list(map(_contact_row_mapper(fields, include), result))
+    
+    @staticmethod
+    def _filter_page(
+        query,
+        after_id: Optional[int],
+        status: Optional[str],
+        source_id: Optional[int],
+        operator_id: Optional[int],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime]
+    ):
+        if after_id is not None:
+            query = query.where(Contact.id > after_id)
+        if status is not None:
+            query = query.where(Contact.status == status)
+        if source_id is not None:
+            query = query.where(Contact.source_id == source_id)
+        if operator_id is not None:
+            query = query.where(Contact.operator_id == operator_id)
+        if created_from is not None:
+            query = query.where(Contact.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Contact.created_at < created_to)
+        return query
+    
     async def get_distribution_stats(self) -> List[dict]:
-        """Получить статистику распределения обращений."""
+        """
+        Получить статистику распределения обращений.
+        
+        Читается из сводки distribution_stats, поэтому время ответа
+        зависит от числа пар источник-оператор, а не от числа обращений.
+        """
         result = await self.session.execute(
             select(
                 Source.id.label("source_id"),
                 Source.name.label("source_name"),
                 Operator.id.label("operator_id"),
                 Operator.name.label("operator_name"),
-                func.count(Contact.id).label("contacts_count")
+                DistributionStat.contacts_count,
+                DistributionStat.active_count
             )
-            .select_from(Contact)
-            .join(Source, Contact.source_id == Source.id)
-            .outerjoin(Operator, Contact.operator_id == Operator.id)
-            .group_by(Source.id, Source.name, Operator.id, Operator.name)
+            .select_from(DistributionStat)
+            .join(Source, DistributionStat.source_id == Source.id)
+            .outerjoin(Operator, DistributionStat.operator_id == Operator.id)
+            .where(DistributionStat.contacts_count > 0)
+            .order_by(DistributionStat.source_id, DistributionStat.operator_id)
         )
         return [
             {
@@ -336,8 +1054,273 @@ class ContactRepository:
                 "source_name": row.source_name,
                 "operator_id": row.operator_id,
                 "operator_name": row.operator_name,
-                "contacts_count": row.contacts_count
+                "contacts_count": row.contacts_count,
+                "active_count": row.active_count
             }
             for row in result.all()
         ]
 
+
+class DistributionStatsRepository:
+    """
+    Репозиторий сводки распределения обращений.
+    
+    Методы record_* не фиксируют изменения: они вызываются в транзакции,
+    которая вставляет обращения или меняет их статус, и коммитятся вместе
+    с ней.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def record_created(
+        self, contacts: Iterable[Tuple[int, Optional[int], str]]
+    ) -> None:
+        """Учесть новые обращения, заданные тройками (source_id, operator_id, status)."""
+        deltas: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        for source_id, operator_id, status in contacts:
+            delta = deltas[(source_id, operator_id or UNASSIGNED_OPERATOR_ID)]
+            delta[0] += 1
+            if status == "active":
+                delta[1] += 1
+        await self._apply(deltas)
+    
+    async def record_changes(
+        self,
+        changes: Iterable[Tuple[int, Optional[int], str, Optional[int], str]]
+    ) -> None:
+        """
+        Учесть изменения обращений, заданные пятёрками
+        (source_id, old_operator_id, old_status, new_operator_id, new_status).
+        
+        При смене оператора обращение переносится из пары старого
+        оператора в пару нового вместе с признаком активности.
+        """
+        deltas: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        for source_id, old_operator_id, old_status, new_operator_id, new_status in changes:
+            old = deltas[(source_id, old_operator_id or UNASSIGNED_OPERATOR_ID)]
+            new = deltas[(source_id, new_operator_id or UNASSIGNED_OPERATOR_ID)]
+            old[0] -= 1
+            new[0] += 1
+            if old_status == "active":
+                old[1] -= 1
+            if new_status == "active":
+                new[1] += 1
+        await self._apply(deltas)
+    
+    async def _apply(self, deltas: Dict[Tuple[int, int], List[int]]) -> None:
+        """Прибавить приращения к счётчикам пар одним UPSERT (executemany)."""
+        rows = [
+            {
+                "source_id": source_id,
+                "operator_id": operator_id,
+                "contacts_count": contacts_delta,
+                "active_count": active_delta,
+            }
+            for (source_id, operator_id), (contacts_delta, active_delta) in deltas.items()
+            if contacts_delta or active_delta
+        ]
+        if not rows:
+            return
+        
+        await _upsert_increments(
+            self.session,
+            DistributionStat,
+            ("source_id", "operator_id"),
+            ("contacts_count", "active_count"),
+            rows
+        )
+    
+    async def get_unassigned_counts(self) -> Dict[int, int]:
+        """Получить число активных обращений без оператора по источникам."""
+        result = await self.session.execute(
+            select(DistributionStat.source_id, DistributionStat.active_count)
+            .where(DistributionStat.operator_id == UNASSIGNED_OPERATOR_ID)
+        )
+        return {source_id: count for source_id, count in result.all()}
+    
+    async def rebuild(self) -> int:
+        """
+        Пересобрать сводку полным пересчётом по таблице обращений.
+        
+        Используется для восстановления после ручных правок данных.
+        Коммит выполняет вызывающий код. Возвращает число пар в сводке.
+        """
+        operator_key = func.coalesce(Contact.operator_id, UNASSIGNED_OPERATOR_ID)
+        await self.session.execute(delete(DistributionStat))
+        await self.session.execute(
+            insert(DistributionStat).from_select(
+                ["source_id", "operator_id", "contacts_count", "active_count"],
+                select(
+                    Contact.source_id,
+                    operator_key,
+                    func.count(Contact.id),
+                    func.count(Contact.id).filter(Contact.status == "active")
+                )
+                .group_by(Contact.source_id, operator_key)
+            )
+        )
+        return await self.session.scalar(
+            select(func.count()).select_from(DistributionStat)
+        )
+
+
+class DistributionRollupRepository:
+    """
+    Репозиторий почасовых и посуточных сводок распределения.
+    
+    Сводки заполняет фоновый агрегатор: он заново считает по обращениям
+    каждый час после отметки и заменяет строки часа и его суток, а
+    отметку сдвигает за часы, которые больше не изменятся.
+    """
+    
+    WATERMARK = "distribution_rollups"
+    
+    # Таблица сводки для каждой детализации
+    MODELS = {
+        "hour": DistributionStatHourly,
+        "day": DistributionStatDaily,
+    }
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def get_watermark(self) -> Optional[datetime]:
+        """Начало первого часа, который ещё может измениться (None - сводки не заполнялись)."""
+        return await self.session.scalar(
+            select(RollupWatermark.settled_until)
+            .where(RollupWatermark.name == self.WATERMARK)
+        )
+    
+    async def set_watermark(self, settled_until: datetime) -> None:
+        """Сдвинуть отметку (в текущей транзакции)."""
+        if self.session.get_bind().dialect.name == "postgresql":
+            stmt = postgresql_insert(RollupWatermark)
+        else:
+            stmt = sqlite_insert(RollupWatermark)
+        await self.session.execute(
+            stmt.values(name=self.WATERMARK, settled_until=settled_until)
+            .on_conflict_do_update(
+                index_elements=[RollupWatermark.name],
+                set_={"settled_until": settled_until}
+            )
+        )
+    
+    async def get_next_contact_time(self, since: Optional[datetime]) -> Optional[datetime]:
+        """Время создания первого обращения не раньше since (по индексу created_at)."""
+        query = select(func.min(Contact.created_at))
+        if since is not None:
+            query = query.where(Contact.created_at >= since)
+        return await self.session.scalar(query)
+    
+    async def count_contacts(
+        self, created_from: datetime, created_to: datetime
+    ) -> Dict[Tuple[int, int], int]:
+        """Число обращений, созданных в [created_from, created_to), по парам (источник, оператор)."""
+        result = await self.session.execute(
+            select(Contact.source_id, Contact.operator_id, func.count(Contact.id))
+            .where(
+                and_(
+                    Contact.created_at >= created_from,
+                    Contact.created_at < created_to
+                )
+            )
+            .group_by(Contact.source_id, Contact.operator_id)
+        )
+        return {
+            (source_id, operator_id or UNASSIGNED_OPERATOR_ID): count
+            for source_id, operator_id, count in result.all()
+        }
+    
+    async def replace_hour(
+        self, hour_start: datetime, day_start: datetime, counts: Dict[Tuple[int, int], int]
+    ) -> None:
+        """
+        Заменить строки часа и пересчитать его сутки из почасовой сводки.
+        
+        Замена, а не прибавление: повторный пересчёт того же часа даёт тот же
+        результат. Коммит выполняет вызывающий код.
+        """
+        hourly, daily = self.MODELS["hour"], self.MODELS["day"]
+        await self.session.execute(delete(hourly).where(hourly.bucket_start == hour_start))
+        if counts:
+            await self.session.execute(insert(hourly), [
+                {
+                    "bucket_start": hour_start,
+                    "source_id": source_id,
+                    "operator_id": operator_id,
+                    "contacts_count": count,
+                }
+                for (source_id, operator_id), count in counts.items()
+            ])
+        
+        day_rows = await self.session.execute(
+            select(hourly.source_id, hourly.operator_id, func.sum(hourly.contacts_count))
+            .where(
+                and_(
+                    hourly.bucket_start >= day_start,
+                    hourly.bucket_start < day_start + timedelta(days=1)
+                )
+            )
+            .group_by(hourly.source_id, hourly.operator_id)
+        )
+        day_counts = [
+            {
+                "bucket_start": day_start,
+                "source_id": source_id,
+                "operator_id": operator_id,
+                "contacts_count": count,
+            }
+            for source_id, operator_id, count in day_rows.all()
+        ]
+        await self.session.execute(delete(daily).where(daily.bucket_start == day_start))
+        if day_counts:
+            await self.session.execute(insert(daily), day_counts)
+    
+    async def get_buckets(
+        self,
+        granularity: str,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> List[dict]:
+        """Сводка по интервалам [date_from, date_to) с именами источников и операторов."""
+        model = self.MODELS[granularity]
+        query = (
+            select(
+                model.bucket_start,
+                Source.id.label("source_id"),
+                Source.name.label("source_name"),
+                Operator.id.label("operator_id"),
+                Operator.name.label("operator_name"),
+                model.contacts_count
+            )
+            .select_from(model)
+            .join(Source, model.source_id == Source.id)
+            .outerjoin(Operator, model.operator_id == Operator.id)
+        )
+        if date_from is not None:
+            query = query.where(model.bucket_start >= date_from)
+        if date_to is not None:
+            query = query.where(model.bucket_start < date_to)
+        result = await self.session.execute(
+            query.order_by(model.bucket_start, model.source_id, model.operator_id)
+        )
+        return [
+            {
+                "bucket_start": row.bucket_start,
+                "source_id": row.source_id,
+                "source_name": row.source_name,
+                "operator_id": row.operator_id,
+                "operator_name": row.operator_name,
+                "contacts_count": row.contacts_count
+            }
+            for row in result.all()
+        ]
+    
+    async def reset(self) -> None:
+        """Очистить сводки и отметку - агрегатор заполнит их заново."""
+        for model in self.MODELS.values():
+            await self.session.execute(delete(model))
+        await self.session.execute(
+            delete(RollupWatermark).where(RollupWatermark.name == self.WATERMARK)
+        )
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class RoutingEntry:
+    """Оператор, участвующий в распределении по источнику."""
+    operator_id: int
+    weight: int
+    max_load: int
+
+
+@dataclass(frozen=True)
+class RoutingTable:
+    """Таблица маршрутизации источника: активные операторы с весами и лимитами."""
+    source_id: int
+    entries: Tuple[RoutingEntry, ...]
+    strategy: str = "weighted_random"
+
+
+class RoutingCache:
+    """
+    Кеш таблиц маршрутизации процесса по source_id.
+    
+    Веса и активность операторов меняются редко, поэтому таблицы
+    загружаются из БД один раз и сбрасываются явной инвалидацией
+    из путей записи (веса и настройки источника, обновление оператора).
+    """
+    
+    def __init__(self):
+        self._tables: Dict[int, RoutingTable] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._listeners: List[Callable[[], None]] = []
+    
+    @property
+    def generation(self) -> int:
+        """Номер поколения кеша, увеличивается при каждой инвалидации."""
+        return self._generation
+    
+    def get(self, source_id: int) -> Optional[RoutingTable]:
+        """Получить таблицу источника, учитывая попадания и промахи."""
+        table = self._tables.get(source_id)
+        if table is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return table
+    
+    def put(self, table: RoutingTable, generation: int) -> None:
+        """
+        Сохранить таблицу, загруженную в поколении generation.
+        
+        Если за время загрузки кеш был инвалидирован, таблица может быть
+        устаревшей и не сохраняется.
+        """
+        if generation == self._generation:
+            self._tables[table.source_id] = table
+    
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Вызывать listener при каждой инвалидации (изменились операторы, веса или лимиты)."""
+        self._listeners.append(listener)
+    
+    def invalidate(self, source_id: Optional[int] = None) -> None:
+        """Сбросить таблицу источника или, без source_id, весь кеш."""
+        self._generation += 1
+        if source_id is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(source_id, None)
+        for listener in self._listeners:
+            listener()
+    
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов кеша."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._tables),
+        }
+    
+    def reset(self) -> None:
+        """Очистить кеш и счётчики."""
+        self._tables.clear()
+        self._generation += 1
+        self.hits = 0
+        self.misses = 0
+
+
+# Кеш таблиц маршрутизации процесса
+routing_cache = RoutingCache()
@@ -0,0 +1,43 @@
+"""
+Пересборка сводок распределения обращений.
+
+Итоговая сводка (distribution_stats) и нагрузка операторов
+(operators.active_load) поддерживаются инкрементально, почасовая
+и посуточная сводки - фоновым агрегатором; команда нужна для
+восстановления после ручных правок данных в обход API:
+
+    python -m app.rebuild_stats
+"""
+import asyncio
+from typing import Tuple
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.infrastructure.repositories import (
+    DistributionStatsRepository, DistributionRollupRepository, OperatorRepository
+)
+from app.services.stats_rollup import aggregate_rollups
+
+
+async def rebuild() -> Tuple[int, int]:
+    """
+    Пересобрать сводки и нагрузку операторов.
+    
+    Возвращает число пар источник-оператор в итоговой сводке и число
+    обращений, учтённых в сводках по интервалам.
+    """
+    async with AsyncSessionLocal() as session:
+        pairs = await DistributionStatsRepository(session).rebuild()
+        await OperatorRepository(session).rebuild_active_loads()
+        await DistributionRollupRepository(session).reset()
+        await session.commit()
+        contacts = await aggregate_rollups(session, settings.STATS_ROLLUP_SETTLE_DELAY)
+    return pairs, contacts
+
+
+if __name__ == "__main__":
+    pairs, contacts = asyncio.run(rebuild())
+    print(
+        f"Сводки распределения пересобраны: {pairs} пар источник-оператор, "
+        f"{contacts} обращений по интервалам"
+    )
@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.infrastructure.repositories import (
+    ContactRepository, DistributionStatsRepository, OperatorRepository
+)
+from app.infrastructure.routing_cache import routing_cache
+from app.services.distribution_service import DistributionService
+from app.services.load_registry import load_registry, ACTIVE_STATUS
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором после ошибки назначения, сек
+RETRY_DELAY = 1.0
+
+
+class BacklogDispatcher:
+    """
+    Диспетчер очереди обращений без оператора.
+    
+    Обращения, которым при регистрации не нашлось свободного оператора,
+    хранятся в памяти процесса в очереди своего источника (min-heap по id,
+    то есть старые первыми). Диспетчер просыпается по событиям, после
+    которых могли появиться свободные слоты: освобождение нагрузки
+    в реестре (закрытие или передача обращения, сверка с БД) и инвалидация
+    таблиц маршрутизации (активация оператора, рост max_load, новые веса).
+    Таблица обращений при этом не опрашивается: она читается один раз при
+    старте, чтобы восстановить очередь.
+    """
+    
+    def __init__(self):
+        self._queues: Dict[int, List[int]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    @property
+    def is_running(self) -> bool:
+        return self._wakeup is not None
+    
+    def pending(self, source_id: Optional[int] = None) -> int:
+        """Число обращений в очереди источника или во всех очередях."""
+        if source_id is not None:
+            return len(self._queues.get(source_id, ()))
+        return sum(len(queue) for queue in self._queues.values())
+    
+    def enqueue(self, source_id: int, contact_id: int) -> None:
+        """Поставить обращение без оператора в очередь (если диспетчер запущен)."""
+        if self._wakeup is None:
+            return
+        heapq.heappush(self._queues.setdefault(source_id, []), contact_id)
+    
+    def notify(self) -> None:
+        """Разбудить диспетчер: у операторов могли появиться свободные слоты."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def reset(self) -> None:
+        """Очистить очереди."""
+        self._queues = {}
+    
+    async def reload(self, session: AsyncSession) -> None:
+        """
+        Дополнить очереди активными обращениями без оператора из БД.
+        
+        Повторы id в очереди допустимы: обращение, которое уже назначено,
+        при следующей попытке просто выбывает из очереди.
+        """
+        for contact_id, source_id in await ContactRepository(session).get_unassigned():
+            heapq.heappush(self._queues.setdefault(source_id, []), contact_id)
+    
+    async def dispatch(self, session: AsyncSession, batch_size: int) -> int:
+        """
+        Назначить операторов обращениям из очередей, пока есть свободные слоты.
+        
+        Источники обходятся по кругу порциями до batch_size обращений, чтобы
+        большая очередь одного источника не задерживала остальные.
+        Возвращает число назначенных обращений.
+        """
+        total = 0
+        progress = True
+        while progress:
+            progress = False
+            for source_id in list(self._queues):
+                queue = self._queues[source_id]
+                queued = len(queue)
+                total += await self._dispatch_source(session, source_id, batch_size)
+                if len(queue) < queued:
+                    progress = True
+                if not queue and self._queues.get(source_id) is queue:
+                    del self._queues[source_id]
+        return total
+    
+    async def _dispatch_source(
+        self, session: AsyncSession, source_id: int, batch_size: int
+    ) -> int:
+        """
+        Назначить одну порцию обращений источника одной транзакцией.
+        
+        Операторы резервируются в реестре и их слоты занимаются в БД, как
+        при пакетной регистрации; обращения операторов, которым БД не
+        подтвердила слоты, возвращаются в очередь. UPDATE по каждому
+        оператору затрагивает только обращения, которые всё ещё активны
+        и без оператора, остальные выбывают из очереди, а их резервы
+        и занятые слоты освобождаются.
+        """
+        queue = self._queues[source_id]
+        distribution_service = DistributionService(session)
+        contact_repo = ContactRepository(session)
+        # Обращение -> зарезервированный для него оператор
+        reserved: Dict[int, int] = {}
+        try:
+            while queue and len(reserved) < batch_size:
+                contact_id = heapq.heappop(queue)
+                if contact_id in reserved:
+                    continue
+                try:
+                    operator_id = await distribution_service.reserve_operator(source_id)
+                except Exception:
+                    # Обращение ещё не в reserved - возвращаем его в очередь здесь
+                    heapq.heappush(queue, contact_id)
+                    raise
+                if operator_id is None:
+                    heapq.heappush(queue, contact_id)
+                    break
+                reserved[contact_id] = operator_id
+            if not reserved:
+                return 0
+            
+            by_operator: Dict[int, List[int]] = defaultdict(list)
+            for contact_id, operator_id in reserved.items():
+                by_operator[operator_id].append(contact_id)
+            rejected = await distribution_service.claim_reserved(
+                {operator_id: len(contact_ids) for operator_id, contact_ids in by_operator.items()}
+            )
+            for operator_id in rejected:
+                # Резервы уже сняты
+                for contact_id in by_operator.pop(operator_id):
+                    del reserved[contact_id]
+                    heapq.heappush(queue, contact_id)
+            
+            assigned = set()
+            unused_slots: Dict[int, int] = {}
+            for operator_id, contact_ids in by_operator.items():
+                operator_assigned = await contact_repo.assign_unassigned(contact_ids, operator_id)
+                assigned.update(operator_assigned)
+                unused_slots[operator_id] = len(contact_ids) - len(operator_assigned)
+            # Освобождаем слоты обращений, закрытых или назначенных за это время
+            await OperatorRepository(session).add_active_loads(
+                {operator_id: -count for operator_id, count in unused_slots.items()}
+            )
+            await DistributionStatsRepository(session).record_changes(
+                (source_id, None, ACTIVE_STATUS, operator_id, ACTIVE_STATUS)
+                for contact_id, operator_id in reserved.items()
+                if contact_id in assigned
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            for contact_id, operator_id in reserved.items():
+                load_registry.cancel(operator_id)
+                heapq.heappush(queue, contact_id)
+            raise
+        
+        for contact_id, operator_id in reserved.items():
+            if contact_id in assigned:
+                load_registry.confirm(operator_id)
+            else:
+                load_registry.cancel(operator_id)
+        return len(assigned)
+    
+    async def run(self, session_factory: async_sessionmaker, batch_size: int) -> None:
+        """Восстановить очереди из БД и назначать обращения по событиям."""
+        self._wakeup = asyncio.Event()
+        try:
+            try:
+                async with session_factory() as session:
+                    await self.reload(session)
+            except Exception:
+                # Например, миграции ещё не применены - в очереди будут только новые обращения
+                logger.warning("Не удалось загрузить очередь обращений без оператора", exc_info=True)
+            # Первый проход: слоты могли освободиться, пока процесс не работал
+            self._wakeup.set()
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                try:
+                    async with session_factory() as session:
+                        await self.dispatch(session, batch_size)
+                except Exception:
+                    logger.exception("Не удалось назначить операторов обращениям из очереди")
+                    # Снятые резервы снова разбудят диспетчер - повторяем не сразу
+                    await asyncio.sleep(RETRY_DELAY)
+        finally:
+            self._wakeup = None
+
+
+# Диспетчер очереди обращений процесса
+backlog_dispatcher = BacklogDispatcher()
+load_registry.subscribe(backlog_dispatcher.notify)
+routing_cache.subscribe(backlog_dispatcher.notify)
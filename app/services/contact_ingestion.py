@@ -0,0 +1,168 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.models import Contact, Source
+from app.infrastructure.repositories import (
+    LeadRepository, ContactRepository, SourceRepository
+)
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.distribution_service import DistributionService
+from app.services.load_registry import load_registry
+
+
+@dataclass
+class IncomingContact:
+    """Данные входящего обращения (поля совпадают с ContactCreate)."""
+    source_id: int
+    message: Optional[str] = None
+    lead_external_id: Optional[str] = None
+    lead_phone: Optional[str] = None
+    lead_email: Optional[str] = None
+    lead_name: Optional[str] = None
+
+
+@dataclass
+class IngestionResult:
+    """Результат регистрации одного обращения из пакета."""
+    index: int
+    contact: Optional[Contact] = None
+    error: Optional[str] = None
+
+
+class ContactIngestionService:
+    """Сервис регистрации обращений (одиночной и пакетной)."""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.source_repo = SourceRepository(session)
+        self.lead_repo = LeadRepository(session)
+        self.contact_repo = ContactRepository(session)
+        self.distribution_service = DistributionService(session)
+    
+    async def register(self, item: IncomingContact, source: Source) -> Contact:
+        """
+        Зарегистрировать одно обращение в одной транзакции.
+        
+        Лид ищется и при необходимости создаётся, оператор выбирается
+        в памяти, а его слот занимается UPDATE строки оператора, обращение
+        вставляется через INSERT ... RETURNING, затем выполняется
+        единственный коммит. Связи обращения (лид, оператор,
+        источник) заполнены уже загруженными объектами, так что ответ
+        строится без повторного чтения из БД.
+        """
+        operator = None
+        try:
+            lead, = await self.lead_repo.find_or_create_many([{
+                "external_id": item.lead_external_id,
+                "phone": item.lead_phone,
+                "email": item.lead_email,
+                "name": item.lead_name,
+            }])
+            
+            operator = await self.distribution_service.assign_operator(source.id)
+            
+            contact = await self.contact_repo.add(
+                lead=lead,
+                source=source,
+                operator=operator,
+                message=item.message
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            if operator is not None:
+                load_registry.cancel(operator.id)
+            raise
+        
+        if operator is not None:
+            load_registry.confirm(operator.id)
+        else:
+            backlog_dispatcher.enqueue(source.id, contact.id)
+        return contact
+    
+    async def register_batch(
+        self, items: Sequence[IncomingContact]
+    ) -> List[IngestionResult]:
+        """
+        Зарегистрировать пакет обращений в одной транзакции.
+        
+        1. Проверяем источники одним запросом
+        2. Находим или создаём лидов пакетно
+        3. Назначаем операторов в памяти: каждое назначение сразу
+           резервирует слот в реестре нагрузки, поэтому max_load
+           соблюдается в пределах всего пакета
+        4. Занимаем слоты в БД одним UPDATE на оператора; обращения
+           операторов, которым БД не подтвердила слоты, остаются без
+           оператора и уходят диспетчеру
+        5. Вставляем все обращения одним executemany и делаем один коммит
+        
+        Обращения с ошибками (например, неизвестный источник) не создаются
+        и возвращаются с текстом ошибки, остальные создаются.
+        """
+        results = [IngestionResult(index=index) for index in range(len(items))]
+        
+        existing_sources = await self.source_repo.get_existing_ids(
+            item.source_id for item in items
+        )
+        valid: List[int] = []
+        for index, item in enumerate(items):
+            if item.source_id in existing_sources:
+                valid.append(index)
+            else:
+                results[index].error = "Источник не найден"
+        
+        if not valid:
+            return results
+        
+        reserved: Counter[int] = Counter()
+        try:
+            leads = await self.lead_repo.find_or_create_many([
+                {
+                    "external_id": items[index].lead_external_id,
+                    "phone": items[index].lead_phone,
+                    "email": items[index].lead_email,
+                    "name": items[index].lead_name,
+                }
+                for index in valid
+            ])
+            
+            rows = []
+            for index, lead in zip(valid, leads):
+                item = items[index]
+                operator_id = await self.distribution_service.reserve_operator(item.source_id)
+                if operator_id is not None:
+                    reserved[operator_id] += 1
+                rows.append({
+                    "lead_id": lead.id,
+                    "source_id": item.source_id,
+                    "operator_id": operator_id,
+                    "message": item.message,
+                    "status": "active",
+                })
+            
+            rejected = await self.distribution_service.claim_reserved(reserved)
+            for operator_id in rejected:
+                # Резервы уже сняты
+                del reserved[operator_id]
+            for row in rows:
+                if row["operator_id"] in rejected:
+                    row["operator_id"] = None
+            
+            contacts = await self.contact_repo.create_many(rows)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            # Назначения не состоялись - возвращаем слоты операторам
+            for operator_id in reserved.elements():
+                load_registry.cancel(operator_id)
+            raise
+        
+        for operator_id in reserved.elements():
+            load_registry.confirm(operator_id)
+        for index, contact in zip(valid, contacts):
+            results[index].contact = contact
+            if contact.operator_id is None:
+                backlog_dispatcher.enqueue(contact.source_id, contact.id)
+        return results
@@ -0,0 +1,153 @@
+from collections import Counter
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.models import Contact
+from app.infrastructure.repositories import (
+    ContactRepository, DistributionStatsRepository, OperatorRepository
+)
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.load_registry import load_registry, ACTIVE_STATUS
+
+CLOSED_STATUS = "closed"
+
+
+def _load_deltas(
+    old_operator_id: Optional[int],
+    old_status: str,
+    new_operator_id: Optional[int],
+    new_status: str,
+    count: int = 1
+) -> Dict[int, int]:
+    """Изменение active_load операторов при смене статуса и/или оператора count обращений."""
+    deltas: Dict[int, int] = {}
+    if old_operator_id is not None and old_status == ACTIVE_STATUS:
+        deltas[old_operator_id] = -count
+    if new_operator_id is not None and new_status == ACTIVE_STATUS:
+        deltas[new_operator_id] = deltas.get(new_operator_id, 0) + count
+    return deltas
+
+
+class ContactLifecycleService:
+    """
+    Сервис смены статуса и оператора обращений.
+    
+    Изменение, сводка распределения и нагрузка учитываются согласованно:
+    UPDATE обращений, UPSERT сводки и active_load операторов выполняются
+    в одной транзакции, а после коммита нагрузка в реестре меняется за O(1)
+    на пару оператор-статус, без пересчёта по таблице обращений.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.contact_repo = ContactRepository(session)
+        self.stats_repo = DistributionStatsRepository(session)
+        self.operator_repo = OperatorRepository(session)
+    
+    async def update(
+        self, contact: Contact, status: str, operator_id: Optional[int]
+    ) -> bool:
+        """
+        Сменить статус и/или оператора обращения.
+        
+        Возвращает False, если обращение было изменено параллельно после
+        чтения (тогда ничего не меняется).
+        """
+        old_status, old_operator_id = contact.status, contact.operator_id
+        if old_status == status and old_operator_id == operator_id:
+            return True
+        
+        try:
+            if not await self.contact_repo.update_state(contact, status, operator_id):
+                await self.session.rollback()
+                return False
+            await self.stats_repo.record_changes(
+                [(contact.source_id, old_operator_id, old_status, operator_id, status)]
+            )
+            await self.operator_repo.add_active_loads(
+                _load_deltas(old_operator_id, old_status, operator_id, status)
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        
+        load_registry.apply_change(old_operator_id, old_status, operator_id, status)
+        if operator_id is None and status == ACTIVE_STATUS:
+            backlog_dispatcher.enqueue(contact.source_id, contact.id)
+        await self.session.refresh(
+            contact, ["status", "operator_id", "updated_at", "operator"]
+        )
+        return True
+    
+    async def close_many(
+        self,
+        contact_ids: Optional[Sequence[int]] = None,
+        source_id: Optional[int] = None,
+        operator_id: Optional[int] = None
+    ) -> int:
+        """Закрыть активные обращения по фильтрам одним UPDATE, вернуть их число."""
+        try:
+            rows = await self.contact_repo.close_many(
+                CLOSED_STATUS,
+                contact_ids=contact_ids,
+                source_id=source_id,
+                operator_id=operator_id
+            )
+            await self.stats_repo.record_changes(
+                (row.source_id, row.operator_id, ACTIVE_STATUS, row.operator_id, CLOSED_STATUS)
+                for row in rows
+            )
+            released = Counter(row.operator_id for row in rows if row.operator_id is not None)
+            await self.operator_repo.add_active_loads(
+                {released_operator_id: -count for released_operator_id, count in released.items()}
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        
+        for released_operator_id, count in released.items():
+            load_registry.apply_change(
+                released_operator_id, ACTIVE_STATUS, released_operator_id, CLOSED_STATUS, count
+            )
+        return len(rows)
+    
+    async def reassign_many(
+        self,
+        from_operator_id: Optional[int],
+        to_operator_id: Optional[int],
+        contact_ids: Optional[Sequence[int]] = None,
+        source_id: Optional[int] = None
+    ) -> int:
+        """Передать активные обращения другому оператору одним UPDATE, вернуть их число."""
+        if from_operator_id == to_operator_id:
+            return 0
+        try:
+            rows = await self.contact_repo.reassign_many(
+                from_operator_id,
+                to_operator_id,
+                contact_ids=contact_ids,
+                source_id=source_id
+            )
+            await self.stats_repo.record_changes(
+                (row.source_id, from_operator_id, ACTIVE_STATUS, to_operator_id, ACTIVE_STATUS)
+                for row in rows
+            )
+            await self.operator_repo.add_active_loads(
+                _load_deltas(from_operator_id, ACTIVE_STATUS, to_operator_id, ACTIVE_STATUS, len(rows))
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        
+        if rows:
+            load_registry.apply_change(
+                from_operator_id, ACTIVE_STATUS, to_operator_id, ACTIVE_STATUS, len(rows)
+            )
+        if to_operator_id is None:
+            for row in rows:
+                backlog_dispatcher.enqueue(row.source_id, row.id)
+        return len(rows)
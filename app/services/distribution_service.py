@@ -1,12 +1,22 @@
-import random
-from typing import Optional, List
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.domain.models import Operator, OperatorSourceWeight
-from app.infrastructure.repositories import (
-    OperatorRepository,
-    OperatorSourceWeightRepository
-)
+from app.core.metrics import OPERATOR_SELECTION_DURATION
+from app.domain.models import Operator
+from app.infrastructure.repositories import OperatorRepository
+from app.infrastructure.routing_cache import RoutingTable, routing_cache
+from app.services.load_registry import load_registry
+from app.services.sampling import WeightedSampler
+from app.services.strategies import SelectionStrategy, build_strategy
+
+
+# Стратегии источников процесса; перестраиваются при смене таблицы маршрутизации
+_strategies: Dict[int, SelectionStrategy] = {}
+
+# Инвалидация кеша маршрутизации сбрасывает и стратегии: таблицы удалённых
+# и изменённых источников не остаются в памяти
+routing_cache.subscribe(_strategies.clear)
 
 
 class DistributionService:
@@ -15,69 +25,130 @@ class DistributionService:
     def __init__(self, session: AsyncSession):
         self.session = session
         self.operator_repo = OperatorRepository(session)
-        self.weight_repo = OperatorSourceWeightRepository(session)
     
     async def select_operator(
         self, source_id: int
-    ) -> Optional[Operator]:
+    ) -> Optional[int]:
         """
         Выбрать оператора для источника с учётом весов и лимитов.
         
         Алгоритм:
-        1. Получаем всех активных операторов для источника
-        2. Фильтруем по лимиту нагрузки
-        3. Выбираем оператора с учётом весов (вероятностный выбор)
+        1. Берём таблицу маршрутизации источника (активные операторы,
+           веса и лимиты) из кеша процесса
+        2. Выбираем оператора стратегией источника (по умолчанию -
+           вероятностный выбор по весам) за O(1)-O(log n); заполненные
+           операторы отсекаются по нагрузке из реестра в памяти
+        
+        После прогрева кеша и реестра выбор не обращается к БД.
+        Возвращает ID оператора или None, если свободных операторов нет.
         """
-        # Получаем активных операторов для источника
-        operators = await self.operator_repo.get_active_operators_for_source(source_id)
+        _, operator_id = await self._select(source_id)
+        return operator_id
+    
+    async def _select(self, source_id: int) -> Tuple[RoutingTable, Optional[int]]:
+        """Выбрать оператора; вместе с ним вернуть таблицу маршрутизации источника."""
+        started = time.perf_counter()
+        table = await self.operator_repo.get_routing_table(source_id)
+        await load_registry.ensure_loaded(self.session)
         
-        if not operators:
-            return None
+        strategy = _strategies.get(source_id)
+        if strategy is None or strategy.table is not table:
+            strategy = build_strategy(table)
+            _strategies[source_id] = strategy
         
-        # Получаем веса для этих операторов
-        weights = await self.weight_repo.get_weights_for_source(source_id)
-        weight_map = {w.operator_id: w.weight for w in weights}
+        operator_id = strategy.choose(load_registry)
+        OPERATOR_SELECTION_DURATION.observe(time.perf_counter() - started)
+        return table, operator_id
+    
+    async def reserve_operator(self, source_id: int) -> Optional[int]:
+        """
+        Выбрать оператора и сразу зарезервировать его слот в реестре.
         
-        # Фильтруем операторов по лимиту нагрузки
-        available_operators: List[tuple[Operator, int]] = []
-        for operator in operators:
-            current_load = await self.operator_repo.get_operator_load(operator.id)
-            if current_load < operator.max_load:
-                weight = weight_map.get(operator.id, 1)
-                available_operators.append((operator, weight))
+        Выбор и резерв выполняются без передачи управления event loop,
+        поэтому параллельные запросы не могут занять один и тот же
+        последний слот. Слот в БД занимает claim_reserved; вызывающий код
+        обязан подтвердить резерв после коммита (load_registry.confirm)
+        или снять его (load_registry.cancel).
+        """
+        _, operator_id = await self._select(source_id)
+        if operator_id is not None:
+            load_registry.reserve(operator_id)
+        return operator_id
+    
+    async def assign_operator(self, source_id: int) -> Optional[Operator]:
+        """
+        Выбрать оператора и занять его слот в реестре и в БД.
         
-        if not available_operators:
+        Реестр процесса не видит назначений других экземпляров приложения,
+        поэтому слот подтверждается в БД (OperatorRepository.claim_capacity).
+        Если БД не подтвердила слот выбранного оператора, он до сверки
+        считается заполненным, а остальные операторы источника, свободные
+        по реестру, пробуются в порядке взвешенной случайной перестановки.
+        Резерв подтверждается и снимается так же, как после reserve_operator.
+        Возвращает оператора, загруженного тем же UPDATE, занявшим слот.
+        """
+        table, preferred_id = await self._select(source_id)
+        if preferred_id is None:
             return None
-        
-        # Выбираем оператора с учётом весов (вероятностный выбор)
-        return self._weighted_random_choice(available_operators)
+        max_loads: Optional[Dict[int, int]] = None
+        for operator_id in self._candidate_order(table, preferred_id):
+            if operator_id != preferred_id:
+                # Остальные кандидаты нужны, только если БД отказала выбранному
+                if max_loads is None:
+                    max_loads = {entry.operator_id: entry.max_load for entry in table.entries}
+                if load_registry.get(operator_id) >= max_loads[operator_id]:
+                    continue
+            load_registry.reserve(operator_id)
+            try:
+                operator = await self.operator_repo.claim_capacity(operator_id)
+                if operator is not None:
+                    return operator
+                await self._reject({operator_id: 1})
+            except Exception:
+                load_registry.cancel(operator_id)
+                raise
+        return None
     
-    def _weighted_random_choice(
-        self, operators_with_weights: List[tuple[Operator, int]]
-    ) -> Operator:
+    async def claim_reserved(self, reserved: Dict[int, int]) -> Set[int]:
         """
-        Вероятностный выбор оператора на основе весов.
+        Занять в БД слоты, зарезервированные в реестре (operator_id -> число).
         
-        Пример: оператор1 с весом 10, оператор2 с весом 30
-        Вероятности: 10/(10+30)=25% и 30/(10+30)=75%
+        По одному UPDATE на оператора в порядке id: параллельные пакеты
+        блокируют строки операторов в одном порядке и не взаимоблокируются.
+        Возвращает операторов, у которых в БД не нашлось столько свободных
+        слотов; их резервы уже сняты, и до сверки они считаются заполненными.
         """
-        operators = [op for op, _ in operators_with_weights]
-        weights = [w for _, w in operators_with_weights]
-        
-        total_weight = sum(weights)
-        if total_weight == 0:
-            return random.choice(operators)
-        
-        # Генерируем случайное число от 0 до total_weight
-        random_value = random.uniform(0, total_weight)
-        
-        # Выбираем оператора на основе накопленных весов
-        cumulative_weight = 0
-        for operator, weight in operators_with_weights:
-            cumulative_weight += weight
-            if random_value <= cumulative_weight:
-                return operator
-        
-        # На случай ошибки округления возвращаем последнего
-        return operators[-1]
-
+        rejected = {}
+        for operator_id, count in sorted(reserved.items()):
+            if await self.operator_repo.claim_capacity(operator_id, count) is None:
+                rejected[operator_id] = count
+        if rejected:
+            await self._reject(rejected)
+        return set(rejected)
+    
+    async def _reject(self, rejected: Dict[int, int]) -> None:
+        """Снять резервы операторов, которым БД не подтвердила слоты, и считать их заполненными."""
+        max_loads = {}
+        for operator_id in rejected:
+            operator = await self.operator_repo.get_by_id(operator_id)
+            max_loads[operator_id] = operator.max_load if operator is not None else 0
+        # Без await между снятием резервов и отметкой: диспетчер, разбуженный
+        # снятием, уже не увидит у операторов свободных слотов
+        for operator_id, count in rejected.items():
+            for _ in range(count):
+                load_registry.cancel(operator_id)
+            load_registry.mark_full(operator_id, max_loads[operator_id])
+    
+    def _candidate_order(
+        self, table: RoutingTable, preferred_id: int
+    ) -> Iterator[int]:
+        """Выбранный оператор, затем остальные во взвешенном случайном порядке."""
+        yield preferred_id
+        others = [
+            entry for entry in table.entries
+            if entry.operator_id != preferred_id and entry.weight > 0
+        ]
+        sampler = WeightedSampler([entry.weight for entry in others])
+        while (index := sampler.sample()) is not None:
+            sampler.update(index, 0)
+            yield others[index].operator_id
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import Callable, Deque, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.infrastructure.repositories import OperatorRepository
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUS = "active"
+
+# Сколько последних освобождений слотов помнит реестр (см. released_since)
+RELEASE_LOG_SIZE = 1024
+
+
+class LoadRegistry:
+    """
+    Реестр текущей нагрузки операторов в памяти процесса.
+    
+    Нагрузка (количество активных обращений) загружается одним GROUP BY
+    запросом, далее поддерживается инкрементально при создании обращений
+    и смене их статуса, а периодическая сверка с БД устраняет накопленный
+    дрейф (например, от изменений, сделанных другими процессами).
+    
+    Пока запрос сверки выполняется, приращения нагрузки записываются
+    в журнал и прибавляются к полученному снимку: снимок мог быть сделан
+    до коммита этих изменений. Уменьшения к снимку не применяются - если
+    снимок их уже учёл, нагрузка ушла бы ниже фактической и допустила бы
+    превышение max_load; завышенное значение исправит следующая сверка.
+    
+    Слоты под ещё не зафиксированные назначения резервируются отдельно
+    (reserve/confirm/cancel) и учитываются в нагрузке, поэтому параллельные
+    запросы не превышают max_load. Сверка заменяет только зафиксированную
+    нагрузку: резервы хранятся отдельно и сохраняются, а подтверждения
+    во время сверки попадают в журнал приращений.
+    """
+    
+    def __init__(self):
+        self._loads: Dict[int, int] = {}
+        self._reserved: Dict[int, int] = {}
+        self._loaded = False
+        self._lock: Optional[asyncio.Lock] = None
+        self._releases = 0
+        # Операторы последних освобождений; None - могли освободиться все
+        self._release_log: Deque[Optional[int]] = deque(maxlen=RELEASE_LOG_SIZE)
+        self._listeners: List[Callable[[], None]] = []
+        # Журналы приращений нагрузки выполняющихся сверок
+        self._reload_logs: List[Dict[int, int]] = []
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+    
+    @property
+    def releases(self) -> int:
+        """Счётчик событий, после которых у операторов могли освободиться слоты."""
+        return self._releases
+    
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Вызывать listener при каждом событии, после которого могли освободиться слоты."""
+        self._listeners.append(listener)
+    
+    def released_since(self, releases: int) -> Optional[List[int]]:
+        """
+        Операторы, у которых освобождались слоты после значения счётчика releases.
+        
+        None - если состав неизвестен: журнал уже вытеснил эти события или
+        среди них была сверка либо сброс, менявшие нагрузку всех операторов.
+        """
+        count = self._releases - releases
+        if count < 0 or count > len(self._release_log):
+            return None
+        released = list(islice(reversed(self._release_log), count))
+        if None in released:
+            return None
+        return released
+    
+    def _released(self, operator_id: Optional[int] = None) -> None:
+        self._releases += 1
+        self._release_log.append(operator_id)
+        for listener in self._listeners:
+            listener()
+    
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """Загрузить нагрузку из БД, если реестр ещё не инициализирован."""
+        if self._loaded:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._loaded:
+                await self.reload(session)
+    
+    async def reload(self, session: AsyncSession) -> None:
+        """Пересчитать нагрузку всех операторов по данным БД."""
+        log: Dict[int, int] = {}
+        self._reload_logs.append(log)
+        try:
+            loads = await OperatorRepository(session).get_active_loads()
+        finally:
+            self._reload_logs = [other for other in self._reload_logs if other is not log]
+        for operator_id, delta in log.items():
+            loads[operator_id] = loads.get(operator_id, 0) + delta
+        self._loads = loads
+        self._loaded = True
+        self._released()
+    
+    def get(self, operator_id: int) -> int:
+        """Текущая нагрузка оператора с учётом резервов, O(1)."""
+        return self._loads.get(operator_id, 0) + self._reserved.get(operator_id, 0)
+    
+    def reserve(self, operator_id: int) -> None:
+        """
+        Зарезервировать слот оператора под назначение до коммита.
+        
+        Вызывается синхронно сразу после выбора оператора (без await между
+        ними), поэтому выбор и резервирование атомарны для event loop.
+        """
+        self._reserved[operator_id] = self._reserved.get(operator_id, 0) + 1
+    
+    def confirm(self, operator_id: int) -> None:
+        """Перевести резерв в нагрузку после успешного коммита."""
+        self._drop_reservation(operator_id)
+        self.increment(operator_id)
+    
+    def cancel(self, operator_id: int) -> None:
+        """Снять резерв, если назначение не состоялось."""
+        self._drop_reservation(operator_id)
+        self._released(operator_id)
+    
+    def _drop_reservation(self, operator_id: int) -> None:
+        reserved = self._reserved.get(operator_id, 0) - 1
+        if reserved > 0:
+            self._reserved[operator_id] = reserved
+        else:
+            self._reserved.pop(operator_id, None)
+    
+    def increment(self, operator_id: int, delta: int = 1) -> None:
+        """Учесть новые активные обращения оператора."""
+        self._loads[operator_id] = self._loads.get(operator_id, 0) + delta
+        for log in self._reload_logs:
+            log[operator_id] = log.get(operator_id, 0) + delta
+    
+    def decrement(self, operator_id: int, delta: int = 1) -> None:
+        """Освободить слоты оператора."""
+        self._loads[operator_id] = max(self._loads.get(operator_id, 0) - delta, 0)
+        self._released(operator_id)
+    
+    def mark_full(self, operator_id: int, max_load: int) -> None:
+        """
+        Считать оператора заполненным до следующей сверки.
+        
+        Вызывается, когда БД не подтвердила свободный слот: нагрузка
+        в реестре занижена (например, назначениями других экземпляров).
+        """
+        self.increment(operator_id, max(max_load - self.get(operator_id), 0))
+    
+    def apply_status_change(
+        self, operator_id: Optional[int], old_status: str, new_status: str
+    ) -> None:
+        """Учесть смену статуса обращения оператора."""
+        self.apply_change(operator_id, old_status, operator_id, new_status)
+    
+    def apply_change(
+        self,
+        old_operator_id: Optional[int],
+        old_status: str,
+        new_operator_id: Optional[int],
+        new_status: str,
+        count: int = 1
+    ) -> None:
+        """Учесть смену статуса и/или оператора count обращений, O(1)."""
+        if old_operator_id == new_operator_id and old_status == new_status:
+            return
+        if old_operator_id is not None and old_status == ACTIVE_STATUS:
+            self.decrement(old_operator_id, count)
+        if new_operator_id is not None and new_status == ACTIVE_STATUS:
+            self.increment(new_operator_id, count)
+    
+    def reset(self) -> None:
+        """Сбросить реестр (следующее обращение загрузит его заново)."""
+        self._loads = {}
+        self._reserved = {}
+        self._loaded = False
+        self._lock = None
+        self._released()
+    
+    async def run_reconciler(
+        self, session_factory: async_sessionmaker, interval: float
+    ) -> None:
+        """Периодически сверять реестр с БД."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as session:
+                    await self.reload(session)
+            except Exception:
+                logger.exception("Не удалось сверить нагрузку операторов с БД")
+
+
+# Реестр нагрузки процесса
+load_registry = LoadRegistry()
@@ -0,0 +1,67 @@
+import random
+from typing import List, Optional, Sequence
+
+
+class WeightedSampler:
+    """
+    Взвешенный выбор индекса на дереве Фенвика.
+    
+    Построение O(n), выбор и изменение веса одного элемента O(log n),
+    поэтому выбывание оператора (вес 0) и его возврат не требуют
+    перестроения. Случайное число берётся целым из [0, total), так что
+    вероятность элемента ровно weight / total без смещения на границах.
+    """
+    
+    def __init__(self, weights: Sequence[int], rng: Optional[random.Random] = None):
+        self._n = len(weights)
+        self._weights: List[int] = list(weights)
+        self._tree: List[int] = [0] * (self._n + 1)
+        for i, weight in enumerate(self._weights, 1):
+            self._tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= self._n:
+                self._tree[parent] += self._tree[i]
+        self._total = sum(self._weights)
+        self._top = 1 << (self._n.bit_length() - 1) if self._n else 0
+        self._random = (rng or random).random
+    
+    @property
+    def total(self) -> int:
+        """Сумма текущих весов."""
+        return self._total
+    
+    def __len__(self) -> int:
+        return self._n
+    
+    def weight(self, index: int) -> int:
+        """Текущий вес элемента."""
+        return self._weights[index]
+    
+    def update(self, index: int, weight: int) -> None:
+        """Изменить вес элемента за O(log n)."""
+        delta = weight - self._weights[index]
+        if not delta:
+            return
+        self._weights[index] = weight
+        self._total += delta
+        i = index + 1
+        while i <= self._n:
+            self._tree[i] += delta
+            i += i & -i
+    
+    def sample(self) -> Optional[int]:
+        """Выбрать индекс пропорционально весу, None - если все веса нулевые."""
+        if self._total <= 0:
+            return None
+        target = min(int(self._random() * self._total), self._total - 1)
+        # Спуск по дереву: наибольшая позиция с префиксной суммой <= target
+        pos = 0
+        step = self._top
+        tree = self._tree
+        while step:
+            nxt = pos + step
+            if nxt <= self._n and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.infrastructure.repositories import DistributionRollupRepository
+
+logger = logging.getLogger(__name__)
+
+Granularity = Literal["hour", "day"]
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Привести момент к UTC; время без зоны (так его возвращает SQLite) считается UTC."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def bucket_start(moment: datetime, granularity: Granularity) -> datetime:
+    """Начало часового или суточного интервала (UTC), которому принадлежит момент."""
+    moment = as_utc(moment)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def aggregate_rollups(session: AsyncSession, settle_delay: float) -> int:
+    """
+    Пересчитать почасовую и посуточную сводки начиная с отметки.
+    
+    Отметка - начало первого часа, который ещё может измениться. Каждый
+    проход заново считает по обращениям (GROUP BY по диапазону created_at)
+    каждый час от отметки до текущего и заменяет его строки и строки его
+    суток; каждый час - в отдельной транзакции. Пересчёт идемпотентен,
+    поэтому ни прерванный проход, ни порядок коммитов (id обращений
+    в PostgreSQL не следуют ему) не приводят к пропуску или двойному счёту.
+    Отметка переходит за час, когда с его конца прошло settle_delay секунд:
+    транзакции, начатые в этом часе, к тому времени зафиксированы, поэтому
+    задержка должна превышать самую долгую транзакцию записи. Часы без
+    обращений пропускаются.
+    
+    Обращение учитывается за оператором, за которым оно числилось при
+    последнем пересчёте своего часа (как правило, назначенным при
+    создании). Переназначения после этого сводки по интервалам не меняют,
+    в отличие от итоговой сводки distribution_stats.
+    
+    Возвращает число обращений в пересчитанных часах.
+    """
+    repo = DistributionRollupRepository(session)
+    now = datetime.now(timezone.utc)
+    settled = now - timedelta(seconds=settle_delay)
+    hour = await repo.get_watermark()
+    processed = 0
+    
+    while True:
+        next_created_at = await repo.get_next_contact_time(hour)
+        if next_created_at is None:
+            break
+        hour_start = bucket_start(next_created_at, "hour")
+        if hour is not None:
+            hour_start = max(hour_start, as_utc(hour))
+        if hour_start > now:
+            break
+        hour_end = hour_start + timedelta(hours=1)
+        
+        counts = await repo.count_contacts(hour_start, hour_end)
+        await repo.replace_hour(hour_start, bucket_start(hour_start, "day"), counts)
+        if hour_end <= settled:
+            await repo.set_watermark(hour_end)
+        await session.commit()
+        processed += sum(counts.values())
+        hour = hour_end
+    
+    await session.rollback()
+    return processed
+
+
+async def run_rollup_aggregator(
+    session_factory: async_sessionmaker,
+    interval: float,
+    settle_delay: float
+) -> None:
+    """Периодически пересчитывать сводки по интервалам от отметки."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as session:
+                await aggregate_rollups(session, settle_delay)
+        except Exception:
+            logger.exception("Не удалось обновить сводки распределения по интервалам")
@@ -0,0 +1,241 @@
+import heapq
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from app.infrastructure.routing_cache import RoutingTable
+from app.services.load_registry import LoadRegistry
+from app.services.sampling import WeightedSampler
+
+DEFAULT_STRATEGY = "weighted_random"
+
+
+class SelectionStrategy(ABC):
+    """
+    Стратегия выбора оператора для одного источника.
+    
+    Экземпляр строится один раз на таблицу маршрутизации и хранит
+    предвычисленное состояние; choose вызывается на каждое обращение
+    и не должен обращаться к БД - нагрузка берётся из реестра.
+    """
+    
+    name: str = ""
+    
+    def __init__(self, table: RoutingTable):
+        self.table = table
+    
+    @abstractmethod
+    def choose(self, registry: LoadRegistry) -> Optional[int]:
+        """Выбрать оператора со свободными слотами, None - если таких нет."""
+
+
+class _SampledStrategy(SelectionStrategy):
+    """
+    Основа стратегий на взвешенном семплере.
+    
+    Оператор, достигший лимита, выбывает обнулением веса в семплере,
+    а после освобождения слотов возвращается - без перестроения.
+    """
+    
+    def __init__(self, table: RoutingTable):
+        super().__init__(table)
+        self.sampler = WeightedSampler([entry.weight for entry in table.entries])
+        self._dropped: Set[int] = set()
+        self._releases_seen = 0
+    
+    def _restore(self, registry: LoadRegistry) -> None:
+        """Вернуть выбывших операторов, если с прошлого выбора слоты освобождались."""
+        if self._dropped and registry.releases != self._releases_seen:
+            for index in list(self._dropped):
+                entry = self.table.entries[index]
+                if registry.get(entry.operator_id) < entry.max_load:
+                    self._dropped.discard(index)
+                    self.sampler.update(index, entry.weight)
+        self._releases_seen = registry.releases
+    
+    def _draw(self, registry: LoadRegistry) -> Optional[int]:
+        """Выбрать индекс свободного оператора пропорционально весу."""
+        entries = self.table.entries
+        while True:
+            index = self.sampler.sample()
+            if index is None:
+                return None
+            entry = entries[index]
+            if registry.get(entry.operator_id) < entry.max_load:
+                return index
+            # Оператор заполнен - исключаем его из выбора до освобождения слотов
+            self._dropped.add(index)
+            self.sampler.update(index, 0)
+
+
+class WeightedRandomStrategy(_SampledStrategy):
+    """Вероятностный выбор пропорционально весу, O(log n)."""
+    
+    name = "weighted_random"
+    
+    def choose(self, registry: LoadRegistry) -> Optional[int]:
+        self._restore(registry)
+        index = self._draw(registry)
+        return None if index is None else self.table.entries[index].operator_id
+
+
+class PowerOfTwoChoicesStrategy(_SampledStrategy):
+    """
+    Взвешенные «два случайных выбора».
+    
+    Два кандидата выбираются пропорционально весу, назначается тот,
+    у кого больше свободных слотов, O(log n).
+    """
+    
+    name = "power_of_two"
+    
+    def choose(self, registry: LoadRegistry) -> Optional[int]:
+        self._restore(registry)
+        first = self._draw(registry)
+        if first is None:
+            return None
+        second = self._draw(registry)
+        entries = self.table.entries
+        best = entries[first]
+        if second is not None and second != first:
+            other = entries[second]
+            if (
+                other.max_load - registry.get(other.operator_id)
+                > best.max_load - registry.get(best.operator_id)
+            ):
+                best = other
+        return best.operator_id
+
+
+class SmoothWeightedRoundRobinStrategy(SelectionStrategy):
+    """
+    Детерминированный плавный взвешенный round-robin.
+    
+    Stride-планирование на куче: оператор выбирается раз в 1/weight
+    виртуального времени, O(log n) на выбор. Доли обращений те же, что
+    у smooth WRR из nginx, и оператор с весом 5 из 7 не получает 5
+    обращений подряд, но сама последовательность другая: для весов 5/1/1
+    это a, a, a, b, a, a, c, а не a, a, b, a, c, a, a, как у nginx
+    с его проходом по всем операторам на каждый выбор.
+    """
+    
+    name = "smooth_round_robin"
+    
+    def __init__(self, table: RoutingTable):
+        super().__init__(table)
+        self._strides = [
+            1.0 / entry.weight if entry.weight > 0 else 0.0
+            for entry in table.entries
+        ]
+        # (виртуальное время следующего выбора, индекс оператора);
+        # начальные фазы разнесены, чтобы операторы с равными весами не шли
+        # пачкой, а операторы с нулевым весом в очередь не попадают
+        count = len(self._strides)
+        self._heap: List[Tuple[float, int]] = [
+            (stride * (index + 0.5) / count, index)
+            for index, stride in enumerate(self._strides)
+            if stride > 0
+        ]
+        heapq.heapify(self._heap)
+        self._dropped: Set[int] = set()
+        self._releases_seen = 0
+        self._clock = 0.0
+    
+    def choose(self, registry: LoadRegistry) -> Optional[int]:
+        entries = self.table.entries
+        if self._dropped and registry.releases != self._releases_seen:
+            for index in list(self._dropped):
+                entry = entries[index]
+                if registry.get(entry.operator_id) < entry.max_load:
+                    self._dropped.discard(index)
+                    # Возвращается с текущего времени, без накопленного «долга»
+                    heapq.heappush(self._heap, (self._clock + self._strides[index] / 2, index))
+        self._releases_seen = registry.releases
+        
+        while self._heap:
+            pass_value, index = heapq.heappop(self._heap)
+            entry = entries[index]
+            if registry.get(entry.operator_id) >= entry.max_load:
+                self._dropped.add(index)
+                continue
+            self._clock = pass_value
+            heapq.heappush(self._heap, (pass_value + self._strides[index], index))
+            return entry.operator_id
+        return None
+
+
+class LeastLoadedWeightedStrategy(SelectionStrategy):
+    """
+    Выбор по максимуму weight × оставшаяся ёмкость.
+    
+    Оценки хранятся в куче и уточняются лениво: назначения только
+    уменьшают оценку, поэтому вершину достаточно перепроверить. После
+    освобождения слотов в кучу добавляется новая оценка только
+    освободившегося оператора, а прежняя запись остаётся и поправляется,
+    когда дойдёт до вершины. Куча перестраивается целиком, когда записей
+    становится вдвое больше операторов или реестр не знает, кто
+    освобождался (сверка, сброс), поэтому выбор амортизированно O(log n).
+    """
+    
+    name = "least_loaded"
+    
+    def __init__(self, table: RoutingTable):
+        super().__init__(table)
+        self._heap: List[Tuple[int, int]] = []
+        self._releases_seen: Optional[int] = None
+        self._indexes = {entry.operator_id: index for index, entry in enumerate(table.entries)}
+    
+    def _score(self, index: int, registry: LoadRegistry) -> int:
+        entry = self.table.entries[index]
+        return entry.weight * (entry.max_load - registry.get(entry.operator_id))
+    
+    def _refresh(self, registry: LoadRegistry) -> None:
+        """Учесть освобождения слотов с прошлого выбора."""
+        released = None
+        if self._releases_seen is not None:
+            released = registry.released_since(self._releases_seen)
+        self._releases_seen = registry.releases
+        if released is not None:
+            indexes = {
+                self._indexes[operator_id] for operator_id in released if operator_id in self._indexes
+            }
+            if len(self._heap) + len(indexes) <= 2 * len(self.table.entries):
+                for index in indexes:
+                    heapq.heappush(self._heap, (-self._score(index, registry), index))
+                return
+        self._heap = [
+            (-self._score(index, registry), index)
+            for index in range(len(self.table.entries))
+        ]
+        heapq.heapify(self._heap)
+    
+    def choose(self, registry: LoadRegistry) -> Optional[int]:
+        if registry.releases != self._releases_seen:
+            self._refresh(registry)
+        
+        heap = self._heap
+        while heap:
+            stored, index = heap[0]
+            score = self._score(index, registry)
+            if -stored == score:
+                if score <= 0:
+                    return None
+                return self.table.entries[index].operator_id
+            heapq.heapreplace(heap, (-score, index))
+        return None
+
+
+STRATEGIES: Dict[str, Type[SelectionStrategy]] = {
+    strategy.name: strategy
+    for strategy in (
+        WeightedRandomStrategy,
+        SmoothWeightedRoundRobinStrategy,
+        PowerOfTwoChoicesStrategy,
+        LeastLoadedWeightedStrategy,
+    )
+}
+
+
+def build_strategy(table: RoutingTable) -> SelectionStrategy:
+    """Построить стратегию источника по его таблице маршрутизации."""
+    strategy_cls = STRATEGIES.get(table.strategy, STRATEGIES[DEFAULT_STRATEGY])
+    return strategy_cls(table)
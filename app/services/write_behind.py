@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.services.contact_ingestion import ContactIngestionService, IncomingContact
+
+logger = logging.getLogger(__name__)
+
+TICKET_QUEUED = "queued"
+TICKET_DONE = "done"
+TICKET_FAILED = "failed"
+
+
+@dataclass
+class IngestionTicket:
+    """Состояние обращения, принятого в очередь отложенной записи."""
+    ticket_id: str
+    status: str = TICKET_QUEUED
+    contact_id: Optional[int] = None
+    operator_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class WriteBehindQueue:
+    """
+    Отложенная запись обращений.
+    
+    Эндпоинт только проверяет данные и кладёт их в ограниченную очередь
+    процесса; фоновый обработчик забирает обращения порциями и
+    регистрирует каждую порцию одной транзакцией (лиды, операторы, вставка)
+    через ContactIngestionService.register_batch. Состояние заявок
+    хранится в памяти, старые заявки вытесняются после ticket_limit.
+    """
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._tickets: "OrderedDict[str, IngestionTicket]" = OrderedDict()
+        self._ticket_limit = 0
+        self._accepting = False
+    
+    @property
+    def is_running(self) -> bool:
+        """Очередь принимает новые обращения."""
+        return self._accepting
+    
+    def start(
+        self,
+        session_factory: async_sessionmaker,
+        max_size: int,
+        batch_size: int,
+        linger: float,
+        ticket_limit: int
+    ) -> None:
+        """Создать очередь и запустить фоновый обработчик."""
+        self._queue = asyncio.Queue(maxsize=max_size)
+        self._ticket_limit = ticket_limit
+        self._accepting = True
+        self._worker = asyncio.create_task(
+            self._run(session_factory, batch_size, linger)
+        )
+    
+    def submit(self, item: IncomingContact) -> IngestionTicket:
+        """
+        Поставить обращение в очередь и вернуть заявку.
+        
+        Не ждёт места в очереди: при переполнении сразу выбрасывает
+        asyncio.QueueFull, чтобы эндпоинт ответил 429.
+        """
+        ticket = IngestionTicket(ticket_id=uuid.uuid4().hex)
+        self._queue.put_nowait((ticket, item))
+        self._tickets[ticket.ticket_id] = ticket
+        while len(self._tickets) > self._ticket_limit:
+            self._tickets.popitem(last=False)
+        return ticket
+    
+    def get(self, ticket_id: str) -> Optional[IngestionTicket]:
+        """Заявка по идентификатору (None - неизвестна или уже вытеснена)."""
+        return self._tickets.get(ticket_id)
+    
+    async def drain(self) -> None:
+        """Перестать принимать обращения, дописать очередь и остановить обработчик."""
+        if self._worker is None:
+            return
+        self._accepting = False
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+    
+    def reset(self) -> None:
+        """Сбросить очередь и заявки (обработчик должен быть остановлен)."""
+        if self._worker is not None:
+            self._worker.cancel()
+        self._queue = None
+        self._worker = None
+        self._tickets = OrderedDict()
+        self._accepting = False
+    
+    async def _next_batch(
+        self, batch_size: int, linger: float
+    ) -> List[Tuple[IngestionTicket, IncomingContact]]:
+        """
+        Дождаться первого обращения и добрать порцию.
+        
+        После первого обращения порция добирается тем, что уже лежит
+        в очереди, и ждёт новых не дольше linger секунд.
+        """
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + linger
+        while len(batch) < batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(
+        self, session_factory: async_sessionmaker, batch_size: int, linger: float
+    ) -> None:
+        while True:
+            batch = await self._next_batch(batch_size, linger)
+            try:
+                await self._write(session_factory, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _write(
+        self,
+        session_factory: async_sessionmaker,
+        batch: List[Tuple[IngestionTicket, IncomingContact]]
+    ) -> None:
+        try:
+            async with session_factory() as session:
+                results = await ContactIngestionService(session).register_batch(
+                    [item for _, item in batch]
+                )
+        except Exception:
+            logger.exception("Не удалось записать порцию из %d обращений", len(batch))
+            for ticket, _ in batch:
+                ticket.status = TICKET_FAILED
+                ticket.error = "Ошибка записи обращения"
+            return
+        
+        for (ticket, _), result in zip(batch, results):
+            if result.contact is None:
+                ticket.status = TICKET_FAILED
+                ticket.error = result.error
+            else:
+                ticket.status = TICKET_DONE
+                ticket.contact_id = result.contact.id
+                ticket.operator_id = result.contact.operator_id
+
+
+# Очередь отложенной записи процесса
+write_behind = WriteBehindQueue()
@@ -0,0 +1,291 @@
+"""
+Нагрузочный прогон API: регистрация обращений, списки и статистика.
+
+Создаётся отдельная файловая БД, в неё напрямую записываются источники,
+операторы, веса и существующие лиды, после чего приложение
+(app.api.main:app) получает конкурентную смесь запросов: POST /contacts
+и чтения (страница обращений, статистика распределения). Приложение
+запускается в процессе (httpx через ASGI, с lifespan) или отдельным
+процессом uvicorn (--server uvicorn). Результат - JSON с пропускной
+способностью и p50/p95/p99 по каждому виду запросов; --baseline сравнивает
+его с сохранённым результатом другого коммита.
+
+    python -m benchmarks.api_load --requests 5000 --concurrency 50 --output result.json
+    python -m benchmarks.api_load --server uvicorn --baseline result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+LEADS_CHUNK = 5000
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        **_percentiles(latencies),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(database_url: str, args: argparse.Namespace) -> List[int]:
+    """Создать схему и данные прогона; вернуть id источников."""
+    # Модули приложения импортируются после того, как DATABASE_URL
+    # указывает на БД прогона (engine создаётся при импорте)
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    
+    from app.core.database import Base, create_write_engine
+    from app.domain.models import Lead, Operator, OperatorSourceWeight, Source
+    
+    rng = random.Random(args.seed)
+    engine = create_write_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async with session_maker() as session:
+        operators = [
+            Operator(name=f"Оператор {index}", max_load=args.max_load)
+            for index in range(args.operators)
+        ]
+        sources = [Source(name=f"Бот {index}") for index in range(args.sources)]
+        session.add_all(operators + sources)
+        await session.flush()
+        per_source = min(args.operators_per_source, args.operators)
+        session.add_all(
+            OperatorSourceWeight(
+                operator_id=operator.id, source_id=source.id, weight=rng.randint(1, 10)
+            )
+            for source in sources
+            for operator in rng.sample(operators, per_source)
+        )
+        for start in range(0, args.leads, LEADS_CHUNK):
+            await session.execute(insert(Lead), [
+                {"phone": f"+7900{index:07d}"}
+                for index in range(start, min(start + LEADS_CHUNK, args.leads))
+            ])
+        await session.commit()
+        source_ids = [source.id for source in sources]
+    
+    await engine.dispose()
+    return source_ids
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(client: httpx.AsyncClient, process: subprocess.Popen) -> None:
+    for _ in range(200):
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn завершился при запуске")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("uvicorn не ответил на /health")
+
+
+async def drive(
+    client: httpx.AsyncClient, source_ids: List[int], args: argparse.Namespace
+) -> Dict[str, Dict[str, float]]:
+    """Выполнить смесь запросов конкурентно и собрать задержки по видам запросов."""
+    rng = random.Random(args.seed + 1)
+    new_lead_index = args.leads
+    
+    def next_request(index: int):
+        nonlocal new_lead_index
+        roll = rng.random()
+        if roll < args.stats_ratio:
+            return "get_stats", "GET", f"{API}/contacts/stats/distribution", None
+        if roll < args.stats_ratio + args.list_ratio:
+            return "get_contacts", "GET", f"{API}/contacts", None
+        # Доля обращений от уже известных лидов, остальные создают новых
+        if args.leads and rng.random() < args.existing_lead_ratio:
+            phone = f"+7900{rng.randrange(args.leads):07d}"
+        else:
+            phone = f"+7900{new_lead_index:07d}"
+            new_lead_index += 1
+        payload = {
+            "source_id": rng.choice(source_ids),
+            "lead_phone": phone,
+            "message": f"load {index}",
+        }
+        return "post_contacts", "POST", f"{API}/contacts", payload
+    
+    plan = [next_request(index) for index in range(args.warmup + args.requests)]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    
+    async def run(requests, record: bool):
+        queue = iter(requests)
+        
+        async def worker():
+            for name, method, url, payload in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=payload)
+                    failed = response.status_code >= 400
+                except httpx.TransportError:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                if not record:
+                    continue
+                if failed:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(elapsed)
+        
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    
+    await run(plan[:args.warmup], record=False)
+    started = time.perf_counter()
+    await run(plan[args.warmup:], record=True)
+    elapsed = time.perf_counter() - started
+    
+    results = {
+        name: _summary(latencies[name], errors[name], elapsed)
+        for name in sorted(set(latencies) | set(errors))
+    }
+    results["total"] = _summary(
+        [value for values in latencies.values() for value in values],
+        sum(errors.values()),
+        elapsed
+    )
+    return results
+
+
+async def run_asgi(source_ids: List[int], args: argparse.Namespace):
+    """Прогон приложения в процессе через ASGI-транспорт httpx (с lifespan)."""
+    from app.api.main import app
+    
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, source_ids, args)
+
+
+async def run_uvicorn(source_ids: List[int], args: argparse.Namespace):
+    """Прогон через настоящий HTTP-сервер: uvicorn в отдельном процессе."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.api.main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        env=os.environ.copy()
+    )
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+        ) as client:
+            await _wait_ready(client, process)
+            return await drive(client, source_ids, args)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def compare(result: dict, baseline: dict) -> None:
+    """Напечатать изменение пропускной способности и задержек относительно базового прогона."""
+    print(f"{'запрос':<16}{'обр/с':>16}{'p50, мс':>18}{'p95, мс':>18}{'p99, мс':>18}", file=sys.stderr)
+    for name, current in result["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (current[key] / base[key] - 1) * 100 if base[key] else 0.0
+            cells.append(f"{current[key]:>9.1f} {change:>+6.1f}%")
+        print(f"{name:<16}" + "".join(f"{cell:>18}" for cell in cells), file=sys.stderr)
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        database_url = f"sqlite+aiosqlite:///{Path(directory) / 'load.db'}"
+        os.environ["DATABASE_URL"] = database_url
+        source_ids = await seed(database_url, args)
+        if args.server == "uvicorn":
+            results = await run_uvicorn(source_ids, args)
+        else:
+            results = await run_asgi(source_ids, args)
+    
+    config = {
+        key: value for key, value in vars(args).items()
+        if key not in ("output", "baseline", "directory")
+    }
+    return {"commit": _git_commit(), "config": config, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", choices=["asgi", "uvicorn"], default="asgi", help="Как запускать приложение")
+    parser.add_argument("--sources", type=int, default=10, help="Число источников")
+    parser.add_argument("--operators", type=int, default=50, help="Число операторов")
+    parser.add_argument("--operators-per-source", type=int, default=10, help="Операторов с весом на источник")
+    parser.add_argument("--max-load", type=int, default=1_000_000, help="Лимит нагрузки операторов")
+    parser.add_argument("--leads", type=int, default=10000, help="Существующих лидов")
+    parser.add_argument("--existing-lead-ratio", type=float, default=0.5, help="Доля обращений от существующих лидов")
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов в замере")
+    parser.add_argument("--warmup", type=int, default=200, help="Запросов прогрева (не учитываются)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Параллельных клиентов")
+    parser.add_argument("--list-ratio", type=float, default=0.1, help="Доля запросов GET /contacts")
+    parser.add_argument("--stats-ratio", type=float, default=0.05, help="Доля запросов статистики")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора для воспроизводимости")
+    parser.add_argument("--dir", dest="directory", help="Каталог для файла БД, по умолчанию - системный temp")
+    parser.add_argument("--output", help="Файл для JSON-результата (по умолчанию - stdout)")
+    parser.add_argument("--baseline", help="JSON-результат другого прогона для сравнения")
+    args = parser.parse_args()
+    
+    result = asyncio.run(main(args))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    if args.baseline:
+        compare(result, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
@@ -0,0 +1,308 @@
+"""
+Микро-бенчмарк выбора оператора по размеру пула и распределению весов.
+
+Для каждого размера пула (1 ... 10 000 операторов одного источника)
+и распределения весов замеряются время на вызов и память:
+
+- sqlite/select_operator_warm - DistributionService.select_operator на
+  SQLite в памяти с прогретыми кешем маршрутизации и реестром нагрузки
+  (путь обычного запроса);
+- sqlite/select_operator_cold - то же с чтением таблицы маршрутизации
+  из БД и построением стратегии на каждом вызове (после инвалидации);
+- memory/strategy_choose - стратегия источника без БД и сервиса;
+- memory/weighted_random_choice - разовый выбор по списку (оператор, вес)
+  с построением семплера на каждом вызове, как до кеша маршрутизации.
+
+Память снимается tracemalloc за серию вызовов: пик выделенных байт,
+а также число блоков памяти и байты, оставшиеся выделенными после серии,
+в пересчёте на вызов (разница снимков tracemalloc; сюда входит и кеш,
+заполненный последним вызовом, а рост с числом вызовов означает утечку).
+Печатаются кривые масштабирования (нс на вызов и отношение к наименьшему
+пулу), --json выводит все замеры.
+
+    python -m benchmarks.distribution --sizes 1 10 100 1000 10000 --weights uniform zipf
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.domain.models import Operator, OperatorSourceWeight, Source
+from app.infrastructure.routing_cache import RoutingEntry, RoutingTable, routing_cache
+from app.services.distribution_service import DistributionService
+from app.services.load_registry import LoadRegistry, load_registry
+from app.services.sampling import WeightedSampler
+from app.services.strategies import STRATEGIES, build_strategy
+
+MAX_LOAD = 100
+
+
+def _weights(distribution: str, size: int, rng: random.Random) -> List[int]:
+    if distribution == "uniform":
+        return [1] * size
+    if distribution == "linear":
+        return [index + 1 for index in range(size)]
+    if distribution == "zipf":
+        # Тяжёлый хвост: несколько операторов забирают большую часть потока
+        return [max(1, 10_000 // (index + 1)) for index in range(size)]
+    return [rng.randint(1, 100) for _ in range(size)]
+
+
+WEIGHT_DISTRIBUTIONS = ("uniform", "linear", "zipf", "random")
+
+
+def _weighted_random_choice(operators_with_weights: List[Tuple[int, int]]) -> Optional[int]:
+    """Разовый взвешенный выбор оператора без кеша - точка отсчёта для стратегий."""
+    if not operators_with_weights:
+        return None
+    index = WeightedSampler([weight for _, weight in operators_with_weights]).sample()
+    if index is None:
+        return None
+    return operators_with_weights[index][0]
+
+
+def _full_operators(size: int, full_ratio: float) -> int:
+    """Сколько операторов пула (с начала) заполнено; хотя бы один остаётся свободным."""
+    return min(int(size * full_ratio), size - 1)
+
+
+# Снимки tracemalloc не учитывают выделения самого модуля
+_TRACEMALLOC_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def _start_tracing() -> Tuple[tracemalloc.Snapshot, int]:
+    """Начать трассировку выделений; вернуть исходный снимок и объём памяти."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+    tracemalloc.reset_peak()
+    return before, tracemalloc.get_traced_memory()[0]
+
+
+def _stop_tracing(tracing: Tuple[tracemalloc.Snapshot, int], calls: int) -> Dict[str, float]:
+    """Пик байт за серию, оставшиеся блоки и байты на вызов; трассировка останавливается."""
+    before, baseline = tracing
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    return {
+        "peak_bytes": peak - baseline,
+        "retained_blocks_per_op": sum(stat.count_diff for stat in diff) / calls,
+        "retained_bytes_per_op": sum(stat.size_diff for stat in diff) / calls,
+    }
+
+
+def _measure(call: Callable[[], None], min_time: float) -> Dict[str, float]:
+    """Время на вызов (повторы удваиваются до min_time секунд) и память на вызов."""
+    call()
+    iterations = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(iterations):
+            call()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_time * 1e9:
+            break
+        iterations *= 2
+    
+    calls = min(iterations, 1000)
+    tracing = _start_tracing()
+    for _ in range(calls):
+        call()
+    return {
+        "ns_per_op": elapsed / iterations,
+        "iterations": iterations,
+        **_stop_tracing(tracing, calls),
+    }
+
+
+async def _measure_async(call: Callable[[], Awaitable[None]], min_time: float) -> Dict[str, float]:
+    """Асинхронный вариант _measure: вызовы ожидаются в одной корутине."""
+    await call()
+    iterations = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(iterations):
+            await call()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_time * 1e9:
+            break
+        iterations *= 2
+    
+    calls = min(iterations, 1000)
+    tracing = _start_tracing()
+    for _ in range(calls):
+        await call()
+    return {
+        "ns_per_op": elapsed / iterations,
+        "iterations": iterations,
+        **_stop_tracing(tracing, calls),
+    }
+
+
+async def bench_sqlite(
+    size: int, weights: List[int], strategy: str, full_ratio: float, min_time: float
+) -> Dict[str, Dict[str, float]]:
+    """select_operator на SQLite в памяти: с прогретыми кешами и с чтением из БД."""
+    load_registry.reset()
+    routing_cache.reset()
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    try:
+        async with session_maker() as session:
+            source = Source(name="Бот", distribution_strategy=strategy)
+            operators = [Operator(name=f"Оператор {index}", max_load=MAX_LOAD) for index in range(size)]
+            session.add_all([source, *operators])
+            await session.flush()
+            session.add_all(
+                OperatorSourceWeight(operator_id=operator.id, source_id=source.id, weight=weight)
+                for operator, weight in zip(operators, weights)
+            )
+            await session.commit()
+            
+            await load_registry.ensure_loaded(session)
+            for operator in operators[:_full_operators(size, full_ratio)]:
+                load_registry.increment(operator.id, MAX_LOAD)
+            
+            service = DistributionService(session)
+            
+            async def warm():
+                await service.select_operator(source.id)
+            
+            async def cold():
+                routing_cache.invalidate(source.id)
+                await service.select_operator(source.id)
+            
+            return {
+                "select_operator_warm": await _measure_async(warm, min_time),
+                "select_operator_cold": await _measure_async(cold, min_time),
+            }
+    finally:
+        await engine.dispose()
+        load_registry.reset()
+        routing_cache.reset()
+
+
+def bench_memory(
+    size: int, weights: List[int], strategy: str, full_ratio: float, min_time: float
+) -> Dict[str, Dict[str, float]]:
+    """Стратегия источника и разовый взвешенный выбор без БД."""
+    registry = LoadRegistry()
+    table = RoutingTable(
+        source_id=1,
+        entries=tuple(
+            RoutingEntry(operator_id=index + 1, weight=weight, max_load=MAX_LOAD)
+            for index, weight in enumerate(weights)
+        ),
+        strategy=strategy
+    )
+    for index in range(_full_operators(size, full_ratio)):
+        registry.increment(index + 1, MAX_LOAD)
+    selection = build_strategy(table)
+    pairs = [(index + 1, weight) for index, weight in enumerate(weights)]
+    
+    return {
+        "strategy_choose": _measure(lambda: selection.choose(registry), min_time),
+        "weighted_random_choice": _measure(lambda: _weighted_random_choice(pairs), min_time),
+    }
+
+
+async def main(
+    sizes: List[int],
+    distributions: List[str],
+    strategy: str,
+    full_ratio: float,
+    min_time: float,
+    as_json: bool,
+    seed: Optional[int]
+) -> None:
+    rng = random.Random(seed)
+    results = []
+    for distribution in distributions:
+        for size in sizes:
+            weights = _weights(distribution, size, rng)
+            measured = {
+                f"sqlite/{name}": value
+                for name, value in (await bench_sqlite(size, weights, strategy, full_ratio, min_time)).items()
+            }
+            measured.update(
+                (f"memory/{name}", value)
+                for name, value in bench_memory(size, weights, strategy, full_ratio, min_time).items()
+            )
+            for benchmark, value in measured.items():
+                results.append({
+                    "benchmark": benchmark,
+                    "weights": distribution,
+                    "operators": size,
+                    **value,
+                })
+    
+    if as_json:
+        print(json.dumps({
+            "strategy": strategy, "full_ratio": full_ratio, "results": results
+        }, indent=2))
+        return
+    
+    print(f"стратегия {strategy}, заполнено операторов {full_ratio:.0%}")
+    for distribution in distributions:
+        for benchmark in dict.fromkeys(row["benchmark"] for row in results):
+            rows = [
+                row for row in results
+                if row["benchmark"] == benchmark and row["weights"] == distribution
+            ]
+            print(f"\n{benchmark} [{distribution}]")
+            print(
+                f"{'операторов':>11}{'нс/вызов':>14}{'× к min':>10}{'пик, Б':>10}"
+                f"{'остаётся блоков':>17}{'Б/вызов':>10}"
+            )
+            base = rows[0]["ns_per_op"]
+            for row in rows:
+                print(
+                    f"{row['operators']:>11}{row['ns_per_op']:>14.0f}{row['ns_per_op'] / base:>10.1f}"
+                    f"{row['peak_bytes']:>10}{row['retained_blocks_per_op']:>17.2f}"
+                    f"{row['retained_bytes_per_op']:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000],
+        help="Размеры пула операторов"
+    )
+    parser.add_argument(
+        "--weights", nargs="+", choices=WEIGHT_DISTRIBUTIONS, default=list(WEIGHT_DISTRIBUTIONS),
+        help="Распределения весов"
+    )
+    parser.add_argument(
+        "--strategy", choices=sorted(STRATEGIES), default="weighted_random",
+        help="Стратегия источника"
+    )
+    parser.add_argument(
+        "--full-ratio", type=float, default=0.0,
+        help="Доля заполненных операторов (проверяет путь выбывания)"
+    )
+    parser.add_argument("--min-time", type=float, default=0.2, help="Минимальное время замера, сек")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно для случайных весов")
+    parser.add_argument("--json", action="store_true", help="Вывести все замеры в JSON")
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.sizes, args.weights, args.strategy, args.full_ratio,
+        args.min_time, args.json, args.seed
+    ))
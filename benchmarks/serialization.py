@@ -0,0 +1,154 @@
+"""
+Бенчмарк сериализации списков и карточек: путь через схему и быстрый путь.
+
+Для каждого маршрута (страницы обращений и лидов, карточки обращения
+и лида) приложение в процессе (httpx через ASGI) получает одну и ту же
+серию запросов дважды: с FAST_SERIALIZATION=false (ORM-объекты
+и валидация схемой from_attributes) и с FAST_SERIALIZATION=true (строки
+сразу в словари и JSON). Замеряются процессорное время (process_time)
+и время ответа на запрос; разница процессорного времени - сэкономленная
+работа интерпретатора.
+
+    python -m benchmarks.serialization --leads 2000 --contacts-per-lead 3 --limit 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+API = "/api/v1"
+
+
+async def seed(database_url: str, args: argparse.Namespace) -> Dict[str, int]:
+    """Создать схему и данные; вернуть id обращения и лида для карточек."""
+    # Модули приложения импортируются после того, как DATABASE_URL
+    # указывает на БД прогона (engine создаётся при импорте)
+    from sqlalchemy import insert, select
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    
+    from app.core.database import Base, create_write_engine
+    from app.domain.models import Contact, Lead, Operator, Source
+    
+    rng = random.Random(args.seed)
+    engine = create_write_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async with session_maker() as session:
+        await session.execute(insert(Operator), [
+            {"name": f"Оператор {index}", "max_load": 1000} for index in range(args.operators)
+        ])
+        await session.execute(insert(Source), [
+            {"name": f"Бот {index}", "description": "Источник бенчмарка"} for index in range(args.sources)
+        ])
+        await session.execute(insert(Lead), [
+            {"phone": f"+7900{index:07d}", "name": f"Лид {index}"} for index in range(args.leads)
+        ])
+        operator_ids = list((await session.scalars(select(Operator.id))).all())
+        source_ids = list((await session.scalars(select(Source.id))).all())
+        lead_ids = list((await session.scalars(select(Lead.id))).all())
+        await session.execute(insert(Contact), [
+            {
+                "lead_id": lead_id,
+                "source_id": rng.choice(source_ids),
+                # Часть обращений без оператора
+                "operator_id": rng.choice(operator_ids) if rng.random() < 0.9 else None,
+                "status": "active" if rng.random() < 0.7 else "closed",
+                "message": f"Сообщение лида {lead_id}",
+            }
+            for lead_id in lead_ids
+            for _ in range(args.contacts_per_lead)
+        ])
+        await session.commit()
+        contact_id = await session.scalar(select(Contact.id).limit(1))
+    
+    await engine.dispose()
+    return {"contact_id": contact_id, "lead_id": lead_ids[0]}
+
+
+async def measure(client: httpx.AsyncClient, url: str, repeat: int) -> Dict[str, float]:
+    """Процессорное время и время ответа на запрос (после одного прогревочного)."""
+    (await client.get(url)).raise_for_status()
+    latencies: List[float] = []
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    cpu = time.process_time() - cpu_started
+    return {
+        "cpu_ms": cpu / repeat * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "bytes": len(response.content),
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        database_url = f"sqlite+aiosqlite:///{Path(directory) / 'serialization.db'}"
+        os.environ["DATABASE_URL"] = database_url
+        ids = await seed(database_url, args)
+        
+        from app.api.main import app
+        from app.core.config import settings
+        
+        routes = {
+            "GET /contacts": f"{API}/contacts?limit={args.limit}",
+            "GET /contacts/{id}": f"{API}/contacts/{ids['contact_id']}",
+            "GET /leads": f"{API}/leads?limit={args.limit}",
+            "GET /leads/{id}": f"{API}/leads/{ids['lead_id']}",
+        }
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, url in routes.items():
+                measured = {}
+                for mode, fast in (("schema", False), ("fast", True)):
+                    settings.FAST_SERIALIZATION = fast
+                    measured[mode] = await measure(client, url, args.repeat)
+                schema_cpu, fast_cpu = measured["schema"]["cpu_ms"], measured["fast"]["cpu_ms"]
+                measured["cpu_saved_pct"] = (1 - fast_cpu / schema_cpu) * 100 if schema_cpu else 0.0
+                results[name] = measured
+    
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "directory")}
+    return {"config": config, "results": results}
+
+
+def report(result: dict) -> None:
+    print(f"{'маршрут':<20}{'схема, мс ЦП':>14}{'быстрый, мс ЦП':>16}{'экономия':>10}{'p50 схема':>11}{'p50 быстрый':>13}")
+    for name, measured in result["results"].items():
+        print(
+            f"{name:<20}{measured['schema']['cpu_ms']:>14.2f}{measured['fast']['cpu_ms']:>16.2f}"
+            f"{measured['cpu_saved_pct']:>9.0f}%{measured['schema']['p50_ms']:>11.2f}"
+            f"{measured['fast']['p50_ms']:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--leads", type=int, default=2000, help="Число лидов")
+    parser.add_argument("--contacts-per-lead", type=int, default=3, help="Обращений на лида")
+    parser.add_argument("--operators", type=int, default=20, help="Число операторов")
+    parser.add_argument("--sources", type=int, default=5, help="Число источников")
+    parser.add_argument("--limit", type=int, default=1000, help="Размер страницы списков")
+    parser.add_argument("--repeat", type=int, default=20, help="Запросов на маршрут и режим")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора для воспроизводимости")
+    parser.add_argument("--dir", dest="directory", help="Каталог для файла БД, по умолчанию - системный temp")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+    
+    result = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        report(result)
@@ -0,0 +1,154 @@
+"""
+Сравнение профилей PRAGMA SQLite на пути регистрации обращения.
+
+Для каждого профиля создаётся отдельная файловая БД, затем заданное
+число обращений регистрируется конкурентно через ContactIngestionService,
+как это делает POST /api/v1/contacts (своя сессия на обращение).
+Печатаются пропускная способность, перцентили задержки и число ошибок
+блокировки.
+
+    python -m benchmarks.sqlite_profiles --contacts 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.core.database import Base, install_sqlite_pragmas, sqlite_pragmas
+from app.domain.models import Operator, OperatorSourceWeight, Source
+from app.infrastructure.routing_cache import routing_cache
+from app.services.contact_ingestion import ContactIngestionService, IncomingContact
+from app.services.load_registry import load_registry
+
+PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    # Умолчания SQLite: журнал отката, synchronous=FULL, кеш 2 МиБ
+    "sqlite_defaults": {"busy_timeout": 30000},
+    "wal_full": {"busy_timeout": 30000, "journal_mode": "WAL", "synchronous": "FULL"},
+    # Профиль из настроек приложения
+    "settings": sqlite_pragmas(),
+}
+
+OPERATORS = 20
+SOURCES = 5
+
+
+async def _seed(session_maker: async_sessionmaker) -> List[int]:
+    """Операторы без практического лимита и источники со всеми операторами."""
+    async with session_maker() as session:
+        operators = [
+            Operator(name=f"Оператор {index}", max_load=1_000_000)
+            for index in range(OPERATORS)
+        ]
+        sources = [Source(name=f"Бот {index}") for index in range(SOURCES)]
+        session.add_all(operators + sources)
+        await session.flush()
+        session.add_all(
+            OperatorSourceWeight(operator_id=operator.id, source_id=source.id, weight=index + 1)
+            for source in sources
+            for index, operator in enumerate(operators)
+        )
+        await session.commit()
+        return [source.id for source in sources]
+
+
+async def run_profile(
+    name: str,
+    pragmas: Dict[str, Union[str, int]],
+    contacts: int,
+    concurrency: int,
+    directory: Optional[str] = None
+) -> Dict[str, float]:
+    """Прогнать регистрацию обращений на свежей БД с заданным профилем."""
+    load_registry.reset()
+    routing_cache.reset()
+    
+    with tempfile.TemporaryDirectory(dir=directory) as directory:
+        # Пул как у engine записи приложения
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{Path(directory) / f'{name}.db'}",
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_WRITE_POOL_SIZE,
+            max_overflow=settings.DB_WRITE_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        install_sqlite_pragmas(engine, pragmas)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        source_ids = await _seed(session_maker)
+        
+        queue = iter(range(contacts))
+        latencies: List[float] = []
+        errors = 0
+        
+        async def worker():
+            nonlocal errors
+            for index in queue:
+                started = time.perf_counter()
+                try:
+                    async with session_maker() as session:
+                        source = await session.get(Source, source_ids[index % SOURCES])
+                        await ContactIngestionService(session).register(
+                            IncomingContact(
+                                source_id=source.id,
+                                lead_phone=f"+7999{index % (contacts // 2 or 1):07d}",
+                                message="benchmark"
+                            ),
+                            source
+                        )
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+    
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(
+    contacts: int, concurrency: int, profiles: List[str], directory: Optional[str]
+) -> None:
+    print(f"{'профиль':<16}{'обр/с':>10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'ошибки':>8}")
+    for name in profiles:
+        result = await run_profile(name, PROFILES[name], contacts, concurrency, directory)
+        print(
+            f"{name:<16}{result['rps']:>10.0f}{result['p50_ms']:>10.1f}"
+            f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--contacts", type=int, default=2000, help="Число обращений на профиль")
+    parser.add_argument("--concurrency", type=int, default=50, help="Параллельных регистраций")
+    parser.add_argument(
+        "--profile", action="append", choices=sorted(PROFILES), dest="profiles",
+        help="Профиль для прогона (можно несколько), по умолчанию - все"
+    )
+    parser.add_argument(
+        "--dir", dest="directory",
+        help="Каталог для файлов БД (tmpfs скрывает разницу в synchronous), по умолчанию - системный temp"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.contacts, args.concurrency, args.profiles or list(PROFILES), args.directory
+    ))
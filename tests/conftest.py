@@ -1,28 +1,105 @@
+import os
+from contextlib import asynccontextmanager, contextmanager
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.api.main import app
-from app.core.database import Base, get_db
+from app.core.database import (
+    Base, get_db, get_read_db, get_read_session_factory,
+    create_write_engine, create_read_engine
+)
+from app.core.metrics import registry as metrics_registry
+from app.infrastructure.routing_cache import routing_cache
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.load_registry import load_registry
+from app.services.write_behind import write_behind
+
+
+# Тестовая база данных: по умолчанию SQLite в памяти; TEST_DATABASE_URL
+# позволяет прогнать тесты на временной PostgreSQL, например
+# TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost:5432/leads_test
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+IS_POSTGRES = TEST_DATABASE_URL.startswith("postgresql")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Пропускает тесты, рассчитанные на другую СУБД."""
+    for item in items:
+        if IS_POSTGRES and item.get_closest_marker("sqlite_only"):
+            item.add_marker(pytest.mark.skip(reason="Тест только для SQLite"))
+        if not IS_POSTGRES and item.get_closest_marker("postgres_only"):
+            item.add_marker(pytest.mark.skip(reason="Нужен TEST_DATABASE_URL с PostgreSQL"))
+
 
+@pytest.fixture(autouse=True)
+def reset_process_state():
+    """Сбрасывает состояние процесса (реестр нагрузки, кеш маршрутизации, очереди, метрики) между тестами."""
+    load_registry.reset()
+    routing_cache.reset()
+    write_behind.reset()
+    backlog_dispatcher.reset()
+    metrics_registry.reset()
+    yield
+    load_registry.reset()
+    routing_cache.reset()
+    write_behind.reset()
+    backlog_dispatcher.reset()
+    metrics_registry.reset()
 
-# Тестовая база данных в памяти
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+@pytest.fixture
+def query_budget():
+    """
+    Проверка бюджета запросов к БД:
+        
+        with query_budget(3):
+            await client.get("/api/v1/contacts")
+    
+    Внутри блока считаются запросы всех engines процесса; если их больше
+    бюджета, тест падает со списком выполненных запросов.
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        statements = []
+        
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(Engine, "after_cursor_execute", count)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, "after_cursor_execute", count)
+        assert len(statements) <= max_queries, (
+            f"Выполнено {len(statements)} запросов к БД при бюджете {max_queries}:\n"
+            + "\n".join(statements)
+        )
+    
+    return budget
 
 
 @pytest.fixture
 async def test_db():
-    """Создаёт тестовую базу данных в памяти для каждого теста."""
-    engine = create_async_engine(
-        TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=False,
-    )
+    """Создаёт тестовую базу данных (по умолчанию в памяти) для каждого теста."""
+    if IS_POSTGRES:
+        engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool, echo=False)
+    else:
+        engine = create_async_engine(
+            TEST_DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+            echo=False,
+        )
     
-    # Создаём таблицы
+    # Создаём таблицы (в PostgreSQL - начисто, после возможного прерванного прогона)
     async with engine.begin() as conn:
+        if IS_POSTGRES:
+            await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
     
     async_session_maker = async_sessionmaker(
@@ -58,10 +135,79 @@ async def client(test_db):
             await test_db.rollback()
             raise
     
+    async def override_get_read_db():
+        yield test_db
+    
+    @asynccontextmanager
+    async def test_session_factory():
+        yield test_db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
+    app.dependency_overrides[get_read_session_factory] = lambda: test_session_factory
     
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
     
     app.dependency_overrides.clear()
 
+
+@pytest.fixture
+async def concurrent_session_makers(tmp_path):
+    """
+    Фабрики сессий записи и чтения для конкурентных тестов.
+    
+    Файловая БД и отдельные engines записи и чтения с профилем PRAGMA из
+    настроек (WAL, busy_timeout и т.д.) и пулами, как в рабочей конфигурации.
+    """
+    url = TEST_DATABASE_URL if IS_POSTGRES else f"sqlite+aiosqlite:///{tmp_path / 'concurrent.db'}"
+    engine = create_write_engine(url)
+    read_engine = create_read_engine(url)
+    
+    async with engine.begin() as conn:
+        if IS_POSTGRES:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async_session_maker = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+    read_session_maker = async_sessionmaker(
+        read_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    
+    yield async_session_maker, read_session_maker
+    
+    if IS_POSTGRES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    await read_engine.dispose()
+    await engine.dispose()
+
+
+@pytest.fixture
+async def concurrent_client(concurrent_session_makers):
+    """
+    Клиент для конкурентных запросов.
+    
+    Отдельная сессия на каждый запрос, как в приложении, поэтому запросы
+    действительно выполняются параллельно.
+    """
+    async_session_maker, read_session_maker = concurrent_session_makers
+    
+    async def override_get_db():
+        async with async_session_maker() as session:
+            yield session
+    
+    async def override_get_read_db():
+        async with read_session_maker() as session:
+            yield session
+    
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
+    app.dependency_overrides[get_read_session_factory] = lambda: read_session_maker
+    
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        yield ac
+    
+    app.dependency_overrides.clear()
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.infrastructure.repositories import DistributionStatsRepository
+from app.services.backlog_dispatcher import backlog_dispatcher
+from app.services.distribution_service import DistributionService
+
+
+async def _wait_until(check, timeout: float = 5.0) -> None:
+    """Ждать, пока асинхронная проверка не вернёт True."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await check():
+        assert asyncio.get_running_loop().time() < deadline, "Условие не выполнено за отведённое время"
+        await asyncio.sleep(0.01)
+
+
+async def _setup(client: AsyncClient, max_load: int) -> tuple[int, int]:
+    """Источник с одним оператором; возвращает (source_id, operator_id)."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": max_load}
+    )
+    op_id = op_response.json()["id"]
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник"})
+    source_id = source_response.json()["id"]
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    return source_id, op_id
+
+
+async def _start_dispatcher(session_factory: async_sessionmaker) -> asyncio.Task:
+    task = asyncio.create_task(backlog_dispatcher.run(session_factory, batch_size=100))
+    
+    async def started():
+        return backlog_dispatcher.is_running
+    
+    await _wait_until(started)
+    return task
+
+
+async def _stop_dispatcher(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_backlog_assigned_when_capacity_frees(concurrent_client: AsyncClient, concurrent_session_makers):
+    """Обращения без оператора назначаются по событиям освобождения слотов, старые первыми."""
+    client = concurrent_client
+    session_factory, _ = concurrent_session_makers
+    source_id, op_id = await _setup(client, max_load=1)
+    task = await _start_dispatcher(session_factory)
+    try:
+        contacts = [
+            (await client.post(
+                "/api/v1/contacts",
+                json={"source_id": source_id, "lead_phone": f"+7900123480{i}"}
+            )).json()
+            for i in range(3)
+        ]
+        assert [contact["operator_id"] for contact in contacts] == [op_id, None, None]
+        assert backlog_dispatcher.pending(source_id) == 2
+        
+        async def operator_of(contact):
+            return (await client.get(f"/api/v1/contacts/{contact['id']}")).json()["operator_id"]
+        
+        # Закрытие обращения освобождает слот - его получает самое старое из очереди
+        await client.patch(f"/api/v1/contacts/{contacts[0]['id']}", json={"status": "closed"})
+        
+        async def second_assigned():
+            return await operator_of(contacts[1]) == op_id
+        
+        await _wait_until(second_assigned)
+        assert await operator_of(contacts[2]) is None
+        assert backlog_dispatcher.pending(source_id) == 1
+        
+        # Рост лимита оператора тоже будит диспетчер
+        await client.patch(f"/api/v1/operators/{op_id}", json={"max_load": 2})
+        
+        async def third_assigned():
+            return await operator_of(contacts[2]) == op_id
+        
+        await _wait_until(third_assigned)
+        assert backlog_dispatcher.pending() == 0
+    finally:
+        await _stop_dispatcher(task)
+    
+    # Сводка распределения учитывает назначения диспетчера
+    incremental = (await client.get("/api/v1/contacts/stats/distribution")).json()
+    assert [(row["operator_id"], row["contacts_count"], row["active_count"]) for row in incremental] == [
+        (op_id, 3, 2)
+    ]
+    async with session_factory() as session:
+        await DistributionStatsRepository(session).rebuild()
+        await session.commit()
+    assert (await client.get("/api/v1/contacts/stats/distribution")).json() == incremental
+
+
+@pytest.mark.asyncio
+async def test_backlog_restored_from_database(concurrent_client: AsyncClient, concurrent_session_makers):
+    """При запуске диспетчер восстанавливает очередь из БД и сразу раздаёт свободные слоты."""
+    client = concurrent_client
+    session_factory, _ = concurrent_session_makers
+    source_id, op_id = await _setup(client, max_load=1)
+    
+    # Диспетчер не запущен: обращения без оператора лежат только в БД
+    response = await client.post(
+        "/api/v1/contacts/batch",
+        json=[{"source_id": source_id, "lead_phone": f"+7900123481{i}"} for i in range(4)]
+    )
+    contact_ids = [result["contact"]["id"] for result in response.json()]
+    assert backlog_dispatcher.pending() == 0
+    await client.patch(f"/api/v1/operators/{op_id}", json={"max_load": 3})
+    
+    task = await _start_dispatcher(session_factory)
+    try:
+        async def assigned_ids():
+            response = await client.get("/api/v1/contacts", params={"operator_id": op_id})
+            return [contact["id"] for contact in response.json()]
+        
+        async def filled():
+            return len(await assigned_ids()) == 3
+        
+        await _wait_until(filled)
+        assert await assigned_ids() == contact_ids[:3]
+        assert backlog_dispatcher.pending(source_id) == 1
+    finally:
+        await _stop_dispatcher(task)
+
+
+@pytest.mark.asyncio
+async def test_backlog_keeps_contacts_when_selection_fails(client: AsyncClient, test_db, monkeypatch):
+    """Ошибка выбора оператора не теряет обращения из очереди."""
+    source_id, op_id = await _setup(client, max_load=1)
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[{"source_id": source_id, "lead_phone": f"+7900123482{i}"} for i in range(3)]
+    )
+    await backlog_dispatcher.reload(test_db)
+    assert backlog_dispatcher.pending(source_id) == 2
+    await client.patch(f"/api/v1/operators/{op_id}", json={"max_load": 3})
+    
+    async def failing_reserve(self, source_id):
+        raise RuntimeError("БД недоступна")
+    
+    with monkeypatch.context() as patch:
+        patch.setattr(DistributionService, "reserve_operator", failing_reserve)
+        with pytest.raises(RuntimeError):
+            await backlog_dispatcher.dispatch(test_db, batch_size=10)
+    assert backlog_dispatcher.pending(source_id) == 2
+    
+    assert await backlog_dispatcher.dispatch(test_db, batch_size=10) == 2
+    assert backlog_dispatcher.pending(source_id) == 0
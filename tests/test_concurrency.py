@@ -0,0 +1,198 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+
+from app.api.main import app
+from app.core.database import get_read_session_factory
+from app.domain.models import Contact, Operator
+from app.services.load_registry import load_registry
+
+
+@pytest.mark.asyncio
+async def test_concurrent_contacts_never_exceed_max_load(concurrent_client: AsyncClient):
+    """Стресс-тест: сотни параллельных обращений не превышают лимиты операторов."""
+    client = concurrent_client
+    max_loads = {}
+    for index in range(5):
+        response = await client.post(
+            "/api/v1/operators",
+            json={"name": f"Оператор {index}", "is_active": True, "max_load": 10}
+        )
+        max_loads[response.json()["id"]] = 10
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Нагруженный бот"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+                for op_id in max_loads
+            ]
+        }
+    )
+    
+    # Лиды уже существуют: регистрация не пишет в БД до вставки обращения,
+    # так что выбор операторов в параллельных запросах действительно пересекается
+    seed_response = await client.post("/api/v1/sources", json={"name": "Источник лидов"})
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": seed_response.json()["id"], "lead_phone": f"+7900555{index:04d}"}
+            for index in range(200)
+        ]
+    )
+    
+    responses = await asyncio.gather(*(
+        client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900555{index:04d}"}
+        )
+        for index in range(200)
+    ))
+    assert all(response.status_code == 201 for response in responses)
+    
+    assigned = Counter(
+        response.json()["operator_id"]
+        for response in responses
+        if response.json()["operator_id"] is not None
+    )
+    for operator_id, count in assigned.items():
+        assert count <= max_loads[operator_id]
+    # Все слоты заняты, лишние обращения остались без оператора
+    assert sum(assigned.values()) == sum(max_loads.values())
+
+
+@pytest.mark.asyncio
+async def test_long_read_does_not_block_writes(concurrent_client: AsyncClient):
+    """Долгое чтение через engine чтения не блокирует регистрацию обращений."""
+    client = concurrent_client
+    source_response = await client.post("/api/v1/sources", json={"name": "Бот отчётов"})
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": f"+7900777{index:04d}"}
+            for index in range(10)
+        ]
+    )
+    
+    read_session_maker = app.dependency_overrides[get_read_session_factory]()
+    async with read_session_maker() as session:
+        # Недочитанный курсор держит блокировку чтения, как долгая выгрузка
+        result = await session.stream(
+            select(Contact.id).execution_options(yield_per=1)
+        )
+        await result.fetchmany(1)
+        
+        response = await asyncio.wait_for(
+            client.post(
+                "/api/v1/contacts",
+                json={"source_id": source_id, "lead_phone": "+79007779999"}
+            ),
+            timeout=5
+        )
+        assert response.status_code == 201
+        
+        # Сессии чтения не могут изменять данные
+        with pytest.raises(DBAPIError):
+            await session.execute(text("DELETE FROM contacts"))
+        await result.close()
+
+
+@pytest.mark.postgres_only
+@pytest.mark.asyncio
+async def test_row_locks_prevent_overshoot_with_stale_registry(
+    concurrent_client: AsyncClient, monkeypatch
+):
+    """
+    В PostgreSQL лимиты соблюдаются блокировками строк, даже если реестр
+    нагрузки процесса ничего не знает о назначениях (как у нескольких
+    экземпляров приложения).
+    """
+    client = concurrent_client
+    max_loads = {}
+    for index in range(2):
+        response = await client.post(
+            "/api/v1/operators",
+            json={"name": f"Оператор {index}", "is_active": True, "max_load": 5}
+        )
+        max_loads[response.json()["id"]] = 5
+    
+    source_response = await client.post("/api/v1/sources", json={"name": "Бот экземпляров"})
+    source_id = source_response.json()["id"]
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+                for op_id in max_loads
+            ]
+        }
+    )
+    
+    # Реестр «чужого» экземпляра: все операторы всегда выглядят свободными
+    monkeypatch.setattr(load_registry, "get", lambda operator_id: 0)
+    
+    responses = await asyncio.gather(*(
+        client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900888{index:04d}"}
+        )
+        for index in range(40)
+    ))
+    assert all(response.status_code == 201 for response in responses)
+    
+    assigned = Counter(
+        response.json()["operator_id"]
+        for response in responses
+        if response.json()["operator_id"] is not None
+    )
+    assert assigned == Counter(max_loads)
+
+
+@pytest.mark.asyncio
+async def test_contended_operator_gets_every_free_slot(concurrent_client: AsyncClient):
+    """
+    Параллельные назначения одному оператору ждут друг друга, а не
+    пропускают его: пока у оператора есть слоты, обращения не остаются
+    без оператора. Нагрузка в строке оператора совпадает с числом его
+    активных обращений.
+    """
+    client = concurrent_client
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Единственный оператор", "is_active": True, "max_load": 20}
+    )
+    op_id = op_response.json()["id"]
+    source_response = await client.post("/api/v1/sources", json={"name": "Бот одного оператора"})
+    source_id = source_response.json()["id"]
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={"operator_weights": [{"operator_id": op_id, "source_id": source_id, "weight": 1}]}
+    )
+    
+    responses = await asyncio.gather(*(
+        client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900666{index:04d}"}
+        )
+        for index in range(25)
+    ))
+    assert all(response.status_code == 201 for response in responses)
+    assigned = [response.json()["operator_id"] for response in responses]
+    assert assigned.count(op_id) == 20
+    assert assigned.count(None) == 5
+    
+    read_session_maker = app.dependency_overrides[get_read_session_factory]()
+    async with read_session_maker() as session:
+        assert await session.scalar(select(Operator.active_load).where(Operator.id == op_id)) == 20
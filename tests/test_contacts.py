@@ -1,5 +1,24 @@
+import asyncio
+import csv
+import io
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select, update
+
+from app.api.schemas import ContactResponse, LeadResponse, OperatorResponse, SourceResponse
+from app.core.config import settings
+from app.domain.models import Contact, Operator
+from app.infrastructure.repositories import (
+    DistributionStatsRepository, OperatorRepository,
+    CONTACT_FIELDS, LEAD_FIELDS, OPERATOR_FIELDS, SOURCE_FIELDS
+)
+from app.services.load_registry import load_registry
+from app.services.stats_rollup import aggregate_rollups, bucket_start
+from app.services.write_behind import write_behind
 
 
 @pytest.mark.asyncio
@@ -155,3 +174,685 @@ async def test_get_distribution_stats(client: AsyncClient):
     assert isinstance(data, list)
     assert len(data) > 0
 
+
+@pytest.mark.asyncio
+async def test_distribution_stats_summary_matches_rebuild(client: AsyncClient, test_db):
+    """Сводка обновляется при вставке обращений и совпадает с полным пересчётом."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор сводки", "is_active": True, "max_load": 2}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник сводки"})
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    
+    # Одно обращение по одному и три пакетом: оператору достаётся два,
+    # остальные остаются без оператора из-за лимита
+    await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79005550000"}
+    )
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": f"+7900555000{i}"}
+            for i in range(1, 4)
+        ]
+    )
+    
+    response = await client.get("/api/v1/contacts/stats/distribution")
+    assert response.status_code == 200
+    incremental = response.json()
+    assert incremental == [
+        {
+            "source_id": source_id,
+            "source_name": "Источник сводки",
+            "operator_id": None,
+            "operator_name": None,
+            "contacts_count": 2,
+            "active_count": 2,
+            "bucket_start": None,
+        },
+        {
+            "source_id": source_id,
+            "source_name": "Источник сводки",
+            "operator_id": op_id,
+            "operator_name": "Оператор сводки",
+            "contacts_count": 2,
+            "active_count": 2,
+            "bucket_start": None,
+        },
+    ]
+    
+    await DistributionStatsRepository(test_db).rebuild()
+    await test_db.commit()
+    response = await client.get("/api/v1/contacts/stats/distribution")
+    assert response.json() == incremental
+
+
+@pytest.mark.asyncio
+async def test_distribution_stats_rollups(client: AsyncClient, test_db):
+    """Статистика по часам и суткам читается из сводок фонового агрегатора."""
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник интервалов"})
+    source_id = source_response.json()["id"]
+    
+    contact_ids = []
+    for i in range(3):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900666000{i}"}
+        )
+        contact_ids.append(response.json()["id"])
+    
+    # Разносим обращения по разным часам одних суток
+    for contact_id, created_at in zip(contact_ids, (
+        datetime(2026, 3, 1, 10, 15),
+        datetime(2026, 3, 1, 10, 45),
+        datetime(2026, 3, 1, 12, 5),
+    )):
+        await test_db.execute(
+            update(Contact).where(Contact.id == contact_id).values(created_at=created_at)
+        )
+    await test_db.commit()
+    
+    # До прохода агрегатора сводки пусты
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution", params={"granularity": "hour"}
+    )
+    assert response.json() == []
+    
+    assert await aggregate_rollups(test_db, settle_delay=0) == 3
+    # Часы прошли отметку: повторный проход их не пересчитывает
+    assert await aggregate_rollups(test_db, settle_delay=0) == 0
+    
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution",
+        params={
+            "granularity": "hour",
+            "from": "2026-03-01T10:30:00Z",
+            "to": "2026-03-01T13:00:00Z",
+        }
+    )
+    assert response.status_code == 200
+    hourly = [(item["bucket_start"][:13], item["contacts_count"]) for item in response.json()]
+    assert hourly == [("2026-03-01T10", 2), ("2026-03-01T12", 1)]
+    assert all(item["operator_id"] is None for item in response.json())
+    
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution",
+        params={"from": "2026-03-01T00:00:00Z", "to": "2026-03-02T00:00:00Z"}
+    )
+    daily = response.json()
+    assert len(daily) == 1
+    assert daily[0]["source_name"] == "Источник интервалов"
+    assert daily[0]["contacts_count"] == 3
+    
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution",
+        params={"from": "2026-03-02T00:00:00Z", "to": "2026-03-01T00:00:00Z"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rollups_count_contacts_committed_after_later_ids(client: AsyncClient, test_db):
+    """Обращение, зафиксированное после прохода агрегатора, учитывается пересчётом своего часа."""
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник пересчёта"})
+    source_id = source_response.json()["id"]
+    contact_ids = []
+    for i in range(2):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900667000{i}"}
+        )
+        contact_ids.append(response.json()["id"])
+    
+    # Первое обращение «ещё не зафиксировано»: на время прохода оно вне сводок
+    current_hour = bucket_start(datetime.now(timezone.utc), "hour")
+    await test_db.execute(
+        update(Contact)
+        .where(Contact.id == contact_ids[0])
+        .values(created_at=current_hour + timedelta(days=1))
+    )
+    await test_db.execute(
+        update(Contact).where(Contact.id == contact_ids[1]).values(created_at=current_hour)
+    )
+    await test_db.commit()
+    # Текущий час не окончателен, отметка не проходит его
+    assert await aggregate_rollups(test_db, settle_delay=3600) == 1
+    
+    # Обращение с меньшим id появилось в том же часе после прохода
+    await test_db.execute(
+        update(Contact).where(Contact.id == contact_ids[0]).values(created_at=current_hour)
+    )
+    await test_db.commit()
+    assert await aggregate_rollups(test_db, settle_delay=3600) == 2
+    # Пересчёт заменяет строки часа, а не прибавляет к ним
+    assert await aggregate_rollups(test_db, settle_delay=3600) == 2
+    
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution",
+        params={"granularity": "hour", "from": current_hour.isoformat()}
+    )
+    assert [item["contacts_count"] for item in response.json()] == [2]
+    response = await client.get(
+        "/api/v1/contacts/stats/distribution",
+        params={"from": bucket_start(current_hour, "day").isoformat()}
+    )
+    assert [item["contacts_count"] for item in response.json()] == [2]
+
+
+@pytest.mark.asyncio
+async def test_operator_max_load_respected(client: AsyncClient):
+    """Тест соблюдения лимита нагрузки оператора."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор с лимитом", "is_active": True, "max_load": 1}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник с лимитом"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    
+    first = await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234580"}
+    )
+    second = await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234581"}
+    )
+    assert first.json()["operator_id"] == op_id
+    assert second.json()["operator_id"] is None  # Лимит исчерпан
+
+
+@pytest.mark.asyncio
+async def test_create_contacts_batch(client: AsyncClient):
+    """Тест пакетной регистрации обращений."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": 2}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    
+    response = await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": "+79001234620", "message": "первое"},
+            {"source_id": 99999, "lead_phone": "+79001234621"},
+            {"source_id": source_id, "lead_phone": "+79001234620", "lead_name": "Повтор"},
+            {"source_id": source_id, "lead_phone": "+79001234622"},
+        ]
+    )
+    assert response.status_code == 201
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    
+    assert results[1]["contact"] is None
+    assert results[1]["error"] == "Источник не найден"
+    
+    first, repeat, last = results[0]["contact"], results[2]["contact"], results[3]["contact"]
+    assert first["message"] == "первое"
+    assert first["lead_id"] == repeat["lead_id"]  # Повтор лида внутри пакета
+    assert first["operator_id"] == op_id
+    assert repeat["operator_id"] == op_id
+    assert last["operator_id"] is None  # Лимит соблюдается в пределах пакета
+    
+    # Данные лида дополнены из повторного обращения
+    lead_response = await client.get(f"/api/v1/leads/{first['lead_id']}")
+    assert lead_response.json()["name"] == "Повтор"
+    assert len(lead_response.json()["contacts"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_filters(client: AsyncClient):
+    """Тест фильтров и пагинации списка обращений."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": 2}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    other_source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Другой источник"}
+    )
+    other_source_id = other_source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": "+79001234630"},
+            {"source_id": source_id, "lead_phone": "+79001234631"},
+            {"source_id": source_id, "lead_phone": "+79001234632"},
+            {"source_id": other_source_id, "lead_phone": "+79001234633"},
+        ]
+    )
+    
+    by_operator = await client.get("/api/v1/contacts", params={"operator_id": op_id})
+    assert len(by_operator.json()) == 2
+    
+    by_source = await client.get("/api/v1/contacts", params={"source_id": other_source_id})
+    assert [c["lead"]["phone"] for c in by_source.json()] == ["+79001234633"]
+    
+    by_status = await client.get("/api/v1/contacts", params={"status": "closed"})
+    assert by_status.json() == []
+    
+    page = await client.get("/api/v1/contacts", params={"source_id": source_id, "limit": 2})
+    assert len(page.json()) == 2
+    next_page = await client.get(
+        "/api/v1/contacts",
+        params={"source_id": source_id, "limit": 2, "cursor": page.headers["X-Next-Cursor"]}
+    )
+    assert [c["lead"]["phone"] for c in next_page.json()] == ["+79001234632"]
+    
+    future = await client.get("/api/v1/contacts", params={"created_from": "2100-01-01T00:00:00"})
+    assert future.json() == []
+
+
+@pytest.mark.asyncio
+async def test_export_contacts(client: AsyncClient):
+    """Тест потоковой выгрузки обращений в NDJSON и CSV."""
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": "+79001234640", "message": "первое"},
+            {"source_id": source_id, "lead_phone": "+79001234641"},
+        ]
+    )
+    
+    response = await client.get("/api/v1/contacts/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["message"] for row in rows] == ["первое", None]
+    assert rows[0]["source_id"] == source_id
+    assert rows[0]["status"] == "active"
+    
+    response = await client.get("/api/v1/contacts/export", params={"format": "csv"})
+    assert response.status_code == 200
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert lines[0][:3] == ["id", "lead_id", "source_id"]
+    assert len(lines) == 3
+
+
+@pytest.mark.asyncio
+async def test_create_contact_write_behind(client: AsyncClient, test_db, monkeypatch):
+    """Тест отложенной записи: 202 с заявкой, 429 при заполненной очереди, дозапись при остановке."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": 10}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    
+    # Обработчик ждёт разрешения, поэтому очередь наполняется
+    released = asyncio.Event()
+    
+    @asynccontextmanager
+    async def gated_session_factory():
+        await released.wait()
+        yield test_db
+    
+    monkeypatch.setattr(settings, "CONTACT_WRITE_BEHIND", True)
+    write_behind.start(gated_session_factory, max_size=2, batch_size=10, linger=0, ticket_limit=100)
+    
+    payloads = [{"source_id": 99999, "lead_phone": "+79001234650"}] + [
+        {"source_id": source_id, "lead_phone": f"+7900123466{i}"} for i in range(4)
+    ]
+    responses = [
+        await client.post("/api/v1/contacts", json=payload) for payload in payloads
+    ]
+    statuses = [response.status_code for response in responses]
+    # Одно обращение у обработчика и два в очереди - остальные отклонены
+    assert statuses[:2] == [202, 202]
+    assert statuses[-1] == 429
+    assert responses[-1].headers["retry-after"] == "1"
+    accepted = [response for response in responses if response.status_code == 202]
+    
+    ticket = accepted[0].json()
+    assert ticket["status"] == "queued"
+    assert accepted[0].headers["location"] == f"/api/v1/contacts/tickets/{ticket['ticket_id']}"
+    
+    released.set()
+    await write_behind.drain()
+    assert not write_behind.is_running
+    
+    tickets = [
+        (await client.get(f"/api/v1/contacts/tickets/{response.json()['ticket_id']}")).json()
+        for response in accepted
+    ]
+    assert tickets[0]["status"] == "failed"
+    assert tickets[0]["error"] == "Источник не найден"
+    for ticket in tickets[1:]:
+        assert ticket["status"] == "done"
+        assert ticket["operator_id"] == op_id
+        contact = (await client.get(f"/api/v1/contacts/{ticket['contact_id']}")).json()
+        assert contact["operator_id"] == op_id
+    
+    response = await client.get("/api/v1/contacts/tickets/unknown")
+    assert response.status_code == 404
+    
+    # После остановки очереди обращения регистрируются синхронно
+    response = await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234670"}
+    )
+    assert response.status_code == 201
+
+
+async def _setup_source_with_operators(client: AsyncClient, max_load: int, operators: int = 1):
+    """Источник с операторами равного веса; возвращает (source_id, [operator_id])."""
+    operator_ids = []
+    for number in range(operators):
+        op_response = await client.post(
+            "/api/v1/operators",
+            json={"name": f"Оператор {number}", "is_active": True, "max_load": max_load}
+        )
+        operator_ids.append(op_response.json()["id"])
+    
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник"})
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+                for op_id in operator_ids
+            ]
+        }
+    )
+    return source_id, operator_ids
+
+
+async def _stored_loads(session, operator_ids) -> list:
+    """active_load операторов в БД; после пересчёта по обращениям значения те же."""
+    query = select(Operator.active_load).where(Operator.id.in_(operator_ids)).order_by(Operator.id)
+    incremental = list((await session.scalars(query)).all())
+    await OperatorRepository(session).rebuild_active_loads()
+    await session.commit()
+    assert list((await session.scalars(query)).all()) == incremental
+    return incremental
+
+
+@pytest.mark.asyncio
+async def test_update_contact_releases_operator_slot(client: AsyncClient, test_db):
+    """Закрытие и передача обращения сразу освобождают слот оператора."""
+    source_id, (op_id,) = await _setup_source_with_operators(client, max_load=1)
+    
+    first = (await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234700"}
+    )).json()
+    assert first["operator_id"] == op_id
+    second = (await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234701"}
+    )).json()
+    assert second["operator_id"] is None  # Лимит исчерпан
+    
+    response = await client.patch(f"/api/v1/contacts/{first['id']}", json={"status": "closed"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "closed"
+    assert response.json()["updated_at"] is not None
+    assert load_registry.get(op_id) == 0
+    
+    # Слот свободен - обращение без оператора можно передать вручную
+    response = await client.patch(
+        f"/api/v1/contacts/{second['id']}", json={"operator_id": op_id}
+    )
+    assert response.status_code == 200
+    assert response.json()["operator_id"] == op_id
+    assert response.json()["operator"]["id"] == op_id
+    assert load_registry.get(op_id) == 1
+    assert await _stored_loads(test_db, [op_id]) == [1]
+    
+    # Снятие оператора
+    response = await client.patch(f"/api/v1/contacts/{second['id']}", json={"operator_id": None})
+    assert response.json()["operator_id"] is None
+    assert load_registry.get(op_id) == 0
+    assert await _stored_loads(test_db, [op_id]) == [0]
+    
+    response = await client.patch("/api/v1/contacts/99999", json={"status": "closed"})
+    assert response.status_code == 404
+    response = await client.patch(f"/api/v1/contacts/{second['id']}", json={"operator_id": 99999})
+    assert response.status_code == 404
+    response = await client.patch(f"/api/v1/contacts/{second['id']}", json={"status": "unknown"})
+    assert response.status_code == 422
+    
+    # Сводка совпадает с полным пересчётом
+    incremental = (await client.get("/api/v1/contacts/stats/distribution")).json()
+    assert {(row["operator_id"], row["contacts_count"], row["active_count"]) for row in incremental} == {
+        (op_id, 1, 0), (None, 1, 1)
+    }
+    await DistributionStatsRepository(test_db).rebuild()
+    await test_db.commit()
+    assert (await client.get("/api/v1/contacts/stats/distribution")).json() == incremental
+
+
+@pytest.mark.asyncio
+async def test_bulk_close_and_reassign_contacts(client: AsyncClient, test_db):
+    """Массовые закрытие и передача обращений одним UPDATE с учётом нагрузки и сводки."""
+    source_id, (first_op, second_op) = await _setup_source_with_operators(
+        client, max_load=3, operators=2
+    )
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[{"source_id": source_id, "lead_phone": f"+7900123471{i}"} for i in range(7)]
+    )
+    assert load_registry.get(first_op) == 3
+    assert load_registry.get(second_op) == 3
+    assert await _stored_loads(test_db, [first_op, second_op]) == [3, 3]
+    
+    # Конец смены первого оператора: его обращения - второму, сверх лимита вручную
+    response = await client.post(
+        "/api/v1/contacts/bulk/reassign",
+        json={"from_operator_id": first_op, "to_operator_id": second_op}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"updated": 3}
+    assert load_registry.get(first_op) == 0
+    assert load_registry.get(second_op) == 6
+    assert await _stored_loads(test_db, [first_op, second_op]) == [0, 6]
+    
+    # Обращение без оператора - первому
+    response = await client.post(
+        "/api/v1/contacts/bulk/reassign",
+        json={"from_operator_id": None, "to_operator_id": first_op}
+    )
+    assert response.json() == {"updated": 1}
+    assert load_registry.get(first_op) == 1
+    
+    response = await client.post(
+        "/api/v1/contacts/bulk/close", json={"operator_id": second_op}
+    )
+    assert response.json() == {"updated": 6}
+    assert load_registry.get(second_op) == 0
+    # Повторное закрытие ничего не меняет
+    response = await client.post(
+        "/api/v1/contacts/bulk/close", json={"operator_id": second_op}
+    )
+    assert response.json() == {"updated": 0}
+    
+    response = await client.get("/api/v1/contacts", params={"status": "closed"})
+    assert len(response.json()) == 6
+    
+    response = await client.post("/api/v1/contacts/bulk/close", json={})
+    assert response.status_code == 400
+    response = await client.post(
+        "/api/v1/contacts/bulk/reassign",
+        json={"from_operator_id": second_op, "to_operator_id": 99999}
+    )
+    assert response.status_code == 404
+    
+    # Нагрузка в реестре и сводка совпадают с пересчётом по БД
+    incremental_loads = [load_registry.get(op) for op in (first_op, second_op)]
+    await load_registry.reload(test_db)
+    assert [load_registry.get(op) for op in (first_op, second_op)] == incremental_loads == [1, 0]
+    assert await _stored_loads(test_db, [first_op, second_op]) == [1, 0]
+    incremental = (await client.get("/api/v1/contacts/stats/distribution")).json()
+    await DistributionStatsRepository(test_db).rebuild()
+    await test_db.commit()
+    assert (await client.get("/api/v1/contacts/stats/distribution")).json() == incremental
+
+
+def test_fast_serialization_fields_match_schemas():
+    """Поля словарей быстрого пути совпадают с полями схем ответа."""
+    assert CONTACT_FIELDS == tuple(ContactResponse.model_fields)
+    assert LEAD_FIELDS == tuple(LeadResponse.model_fields)
+    assert OPERATOR_FIELDS == tuple(OperatorResponse.model_fields)
+    assert SOURCE_FIELDS == tuple(SourceResponse.model_fields)
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_fast_serialization(client: AsyncClient, monkeypatch):
+    """Быстрый путь (строки сразу в JSON) отдаёт то же, что и путь через схему."""
+    source_id, (op_id,) = await _setup_source_with_operators(client, max_load=2)
+    for index in range(3):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900000000{index}", "message": f"Вопрос {index}"}
+        )
+        assert response.status_code == 201
+    # Третье обращение осталось без оператора
+    contact_id = response.json()["id"]
+    assert response.json()["operator"] is None
+    
+    responses = {}
+    for fast in (True, False):
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+        page = await client.get("/api/v1/contacts", params={"limit": 2})
+        next_page = await client.get(
+            "/api/v1/contacts", params={"limit": 2, "cursor": page.headers["X-Next-Cursor"]}
+        )
+        detail = await client.get(f"/api/v1/contacts/{contact_id}")
+        missing = await client.get("/api/v1/contacts/99999")
+        assert page.headers["content-type"] == "application/json"
+        responses[fast] = (
+            page.json(), page.headers["X-Next-Cursor"], next_page.json(),
+            "X-Next-Cursor" in next_page.headers, detail.json(), missing.status_code
+        )
+    
+    assert responses[True] == responses[False]
+    assert responses[True][0][0]["operator"]["id"] == op_id
+    assert responses[True][5] == 404
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_sparse_fieldsets(client: AsyncClient, query_budget):
+    """fields и include: только запрошенные колонки и связи."""
+    source_id, (op_id,) = await _setup_source_with_operators(client, max_load=1)
+    for index in range(3):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900000000{index}"}
+        )
+    contact_id = response.json()["id"]
+    
+    with query_budget(1) as statements:
+        response = await client.get(
+            "/api/v1/contacts", params={"fields": "status", "include": "", "limit": 2}
+        )
+    assert response.status_code == 200
+    assert [set(item) for item in response.json()] == [{"id", "status"}] * 2
+    # Без связей - одна таблица и только запрошенные колонки
+    assert "JOIN" not in statements[0] and "message" not in statements[0]
+    next_page = await client.get(
+        "/api/v1/contacts",
+        params={"fields": "status", "include": "", "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert [item["id"] for item in next_page.json()] == [contact_id]
+    
+    response = await client.get(
+        "/api/v1/contacts", params={"fields": "operator_id,status", "include": "operator"}
+    )
+    data = response.json()
+    assert set(data[0]) == {"id", "operator_id", "status", "operator"}
+    assert data[0]["operator"]["id"] == op_id
+    # Последнее обращение - без оператора (LEFT JOIN)
+    assert data[-1]["operator"] is None
+    
+    # include без fields - все поля обращения и только указанные связи
+    response = await client.get(f"/api/v1/contacts/{contact_id}", params={"include": "source,lead"})
+    data = response.json()
+    assert set(data) == set(CONTACT_FIELDS) | {"lead", "source"}
+    assert data["source"]["id"] == source_id
+    assert data["lead"]["phone"] == "+79000000002"
+    
+    response = await client.get("/api/v1/contacts", params={"fields": "id,secret"})
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+    response = await client.get("/api/v1/contacts/1", params={"include": "contacts"})
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import install_sqlite_pragmas, sqlite_pragmas
+
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """Профиль PRAGMA из настроек применяется к каждому новому соединению."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pragmas.db'}")
+    install_sqlite_pragmas(engine, sqlite_pragmas())
+    
+    async with engine.connect() as conn:
+        values = {
+            name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "cache_size", "temp_store", "busy_timeout")
+        }
+    await engine.dispose()
+    
+    assert values == {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "cache_size": -65536,
+        "temp_store": 2,  # MEMORY
+        "busy_timeout": 30000,
+    }
@@ -0,0 +1,222 @@
+from itertools import groupby
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.models import Operator, Source, OperatorSourceWeight, Lead, Contact
+from app.infrastructure.repositories import OperatorRepository
+from app.infrastructure.routing_cache import RoutingEntry, RoutingTable, routing_cache
+from app.services import distribution_service, strategies
+from app.services.distribution_service import DistributionService
+from app.services.load_registry import LoadRegistry
+from app.services.strategies import (
+    WeightedRandomStrategy, SmoothWeightedRoundRobinStrategy,
+    PowerOfTwoChoicesStrategy, LeastLoadedWeightedStrategy
+)
+
+
+@pytest.mark.asyncio
+async def test_candidates_for_source(test_db: AsyncSession):
+    """Тест получения кандидатов с весами и нагрузкой одним запросом."""
+    free = Operator(name="Свободный", max_load=2)
+    full = Operator(name="Заполненный", max_load=1)
+    inactive = Operator(name="Неактивный", is_active=False, max_load=5)
+    source = Source(name="Источник")
+    lead = Lead(phone="+79001234600")
+    test_db.add_all([free, full, inactive, source, lead])
+    await test_db.flush()
+    
+    test_db.add_all([
+        OperatorSourceWeight(operator_id=free.id, source_id=source.id, weight=10),
+        OperatorSourceWeight(operator_id=full.id, source_id=source.id, weight=30),
+        OperatorSourceWeight(operator_id=inactive.id, source_id=source.id, weight=50),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=free.id, status="active"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=free.id, status="closed"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=full.id, status="active"),
+    ])
+    await test_db.commit()
+    
+    repo = OperatorRepository(test_db)
+    assert await repo.get_candidates_for_source(source.id) == [(free.id, 10, 2, 1)]
+    
+    all_candidates = await repo.get_candidates_for_source(source.id, exclude_full=False)
+    assert sorted(all_candidates) == sorted([(free.id, 10, 2, 1), (full.id, 30, 1, 1)])
+    
+    service = DistributionService(test_db)
+    assert await service.select_operator(source.id) == free.id
+
+
+@pytest.mark.asyncio
+async def test_routing_cache_hits_and_invalidation(client: AsyncClient):
+    """Тест кеша таблиц маршрутизации и его инвалидации при записи."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": 10}
+    )
+    op_id = op_response.json()["id"]
+    
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 10}
+            ]
+        }
+    )
+    
+    for phone in ("+79001234610", "+79001234611"):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": phone}
+        )
+        assert response.json()["operator_id"] == op_id
+    assert routing_cache.stats()["misses"] == 1
+    assert routing_cache.stats()["hits"] == 1
+    
+    # Деактивация оператора сбрасывает кеш
+    await client.patch(f"/api/v1/operators/{op_id}", json={"is_active": False})
+    response = await client.post(
+        "/api/v1/contacts",
+        json={"source_id": source_id, "lead_phone": "+79001234612"}
+    )
+    assert response.json()["operator_id"] is None
+    assert routing_cache.stats()["misses"] == 2
+
+
+def test_strategy_drops_and_restores_full_operator():
+    """Тест выбывания заполненного оператора и его возврата после освобождения."""
+    table = RoutingTable(
+        source_id=1,
+        entries=(
+            RoutingEntry(operator_id=1, weight=1, max_load=1),
+            RoutingEntry(operator_id=2, weight=1, max_load=1),
+        )
+    )
+    registry = LoadRegistry()
+    router = WeightedRandomStrategy(table)
+    
+    registry.increment(1)
+    assert {router.choose(registry) for _ in range(50)} == {2}
+    
+    registry.increment(2)
+    assert router.choose(registry) is None
+    
+    registry.decrement(1)
+    assert router.choose(registry) == 1
+
+
+def _table(*entries: tuple[int, int, int], strategy: str = "weighted_random") -> RoutingTable:
+    return RoutingTable(
+        source_id=1,
+        entries=tuple(
+            RoutingEntry(operator_id=operator_id, weight=weight, max_load=max_load)
+            for operator_id, weight, max_load in entries
+        ),
+        strategy=strategy
+    )
+
+
+def test_smooth_round_robin_sequence():
+    """Тест детерминированного плавного чередования по весам."""
+    strategy = SmoothWeightedRoundRobinStrategy(_table((1, 5, 100), (2, 1, 100), (3, 1, 100)))
+    registry = LoadRegistry()
+    sequence = [strategy.choose(registry) for _ in range(14)]
+    
+    assert sequence[:7] == [1, 1, 1, 2, 1, 1, 3]
+    assert sequence.count(1) == 10
+    assert sequence.count(2) == 2
+    assert sequence.count(3) == 2
+    # Оператор с большим весом не получает все свои обращения подряд
+    longest_run = max(len(list(run)) for operator_id, run in groupby(sequence) if operator_id == 1)
+    assert longest_run <= 3
+
+
+def test_power_of_two_prefers_free_capacity():
+    """Тест выбора оператора с большей свободной ёмкостью."""
+    strategy = PowerOfTwoChoicesStrategy(_table((1, 1, 10), (2, 1, 10)))
+    registry = LoadRegistry()
+    registry.increment(1, 9)
+    
+    choices = [strategy.choose(registry) for _ in range(200)]
+    assert choices.count(2) > choices.count(1)
+
+
+def test_least_loaded_weighted_scoring():
+    """Тест выбора по weight × оставшаяся ёмкость."""
+    strategy = LeastLoadedWeightedStrategy(_table((1, 3, 10), (2, 1, 10)))
+    registry = LoadRegistry()
+    assert strategy.choose(registry) == 1  # 3*10 > 1*10
+    
+    registry.increment(1, 8)  # 3*2 < 1*10
+    assert strategy.choose(registry) == 2
+    
+    registry.increment(2, 10)
+    registry.increment(1, 2)
+    assert strategy.choose(registry) is None
+    
+    registry.decrement(2)
+    assert strategy.choose(registry) == 2
+
+
+def test_least_loaded_refreshes_only_released_operator(monkeypatch):
+    """Тест: освобождение слота уточняет оценку одного оператора без перестроения кучи."""
+    strategy = LeastLoadedWeightedStrategy(_table(*((operator_id, 1, 10) for operator_id in range(1, 9))))
+    registry = LoadRegistry()
+    for operator_id in range(1, 9):
+        registry.increment(operator_id, 5)
+    assert strategy.choose(registry) == 1
+    
+    heapify_calls = []
+    monkeypatch.setattr(strategies.heapq, "heapify", lambda heap: heapify_calls.append(heap))
+    for _ in range(4):
+        registry.increment(3, 4)
+        registry.decrement(3, 4)
+        registry.decrement(7)  # у седьмого больше всех свободных слотов
+        assert strategy.choose(registry) == 7
+        registry.increment(7)
+    assert heapify_calls == []
+    # Записей не больше, чем вдвое больше операторов
+    assert len(strategy._heap) <= 16
+    
+    # После сверки состав освобождений неизвестен - куча перестраивается
+    registry._released()
+    strategy.choose(registry)
+    assert len(heapify_calls) == 1
+
+
+def test_strategies_dropped_on_routing_invalidation():
+    """Тест: инвалидация кеша маршрутизации сбрасывает стратегии источников."""
+    distribution_service._strategies[12345] = WeightedRandomStrategy(_table((1, 1, 1)))
+    routing_cache.invalidate(12345)
+    assert 12345 not in distribution_service._strategies
+
+
+@pytest.mark.asyncio
+async def test_source_strategy_setting(client: AsyncClient):
+    """Тест настройки стратегии распределения источника."""
+    response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник", "distribution_strategy": "smooth_round_robin"}
+    )
+    assert response.status_code == 201
+    source_id = response.json()["id"]
+    assert response.json()["distribution_strategy"] == "smooth_round_robin"
+    
+    response = await client.patch(
+        f"/api/v1/sources/{source_id}",
+        json={"distribution_strategy": "least_loaded"}
+    )
+    assert response.json()["distribution_strategy"] == "least_loaded"
+    
+    response = await client.patch(
+        f"/api/v1/sources/{source_id}",
+        json={"distribution_strategy": "unknown"}
+    )
+    assert response.status_code == 422
@@ -1,6 +1,10 @@
+import json
+
 import pytest
 from httpx import AsyncClient
 
+from app.core.config import settings
+
 
 @pytest.mark.asyncio
 async def test_get_leads(client: AsyncClient):
@@ -150,3 +154,93 @@ async def test_lead_deduplication(client: AsyncClient):
     data = response.json()
     assert len(data["contacts"]) == 2
 
+
+
+@pytest.mark.asyncio
+async def test_export_leads(client: AsyncClient):
+    """Тест потоковой выгрузки лидов."""
+    source_response = await client.post(
+        "/api/v1/sources",
+        json={"name": "Источник"}
+    )
+    source_id = source_response.json()["id"]
+    
+    await client.post(
+        "/api/v1/contacts/batch",
+        json=[
+            {"source_id": source_id, "lead_phone": "+79001234650", "lead_name": "Первый"},
+            {"source_id": source_id, "lead_email": "lead@example.com"},
+        ]
+    )
+    
+    response = await client.get("/api/v1/leads/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["phone"], row["email"], row["name"]) for row in rows] == [
+        ("+79001234650", None, "Первый"),
+        (None, "lead@example.com", None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_leads_fast_serialization(client: AsyncClient, monkeypatch):
+    """Быстрый путь (строки сразу в JSON) отдаёт то же, что и путь через схему."""
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник"})
+    source_id = source_response.json()["id"]
+    for index in range(5):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900000000{index % 3}", "lead_name": "Лид"}
+        )
+    lead_id = response.json()["lead"]["id"]
+    
+    def normalized(lead):
+        # Порядок обращений лида в пути через схему не задан
+        return {**lead, "contacts": sorted(lead["contacts"], key=lambda contact: contact["id"])}
+    
+    responses = {}
+    for fast in (True, False):
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+        page = await client.get("/api/v1/leads", params={"limit": 2})
+        next_page = await client.get(
+            "/api/v1/leads", params={"limit": 2, "cursor": page.headers["X-Next-Cursor"]}
+        )
+        detail = await client.get(f"/api/v1/leads/{lead_id}")
+        missing = await client.get("/api/v1/leads/99999")
+        responses[fast] = (
+            [normalized(lead) for lead in page.json() + next_page.json()],
+            page.headers["X-Next-Cursor"], normalized(detail.json()), missing.status_code
+        )
+    
+    assert responses[True] == responses[False]
+    assert [len(lead["contacts"]) for lead in responses[True][0]] == [2, 2, 1]
+    assert responses[True][3] == 404
+
+
+@pytest.mark.asyncio
+async def test_get_leads_sparse_fieldsets(client: AsyncClient, query_budget):
+    """fields и include: обращения лидов читаются, только если запрошены."""
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник"})
+    source_id = source_response.json()["id"]
+    lead_ids = []
+    for index in range(3):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900000000{index % 2}"}
+        )
+        lead_ids.append(response.json()["lead"]["id"])
+    
+    with query_budget(1):
+        response = await client.get("/api/v1/leads", params={"fields": "phone", "include": ""})
+    assert response.json() == [
+        {"id": lead_ids[0], "phone": "+79000000000"},
+        {"id": lead_ids[1], "phone": "+79000000001"},
+    ]
+    
+    response = await client.get(f"/api/v1/leads/{lead_ids[0]}", params={"fields": "name"})
+    data = response.json()
+    assert set(data) == {"id", "name", "contacts"}
+    assert len(data["contacts"]) == 2
+    
+    response = await client.get("/api/v1/leads", params={"include": "operator"})
+    assert response.status_code == 400
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.models import Operator, Source, Lead, Contact
+from app.infrastructure.repositories import OperatorRepository
+from app.services.load_registry import LoadRegistry
+
+
+async def _seed(session: AsyncSession) -> tuple[int, int]:
+    """Создаёт двух операторов и обращения с разными статусами."""
+    first = Operator(name="Первый", max_load=10)
+    second = Operator(name="Второй", max_load=10)
+    source = Source(name="Источник")
+    lead = Lead(phone="+79001234590")
+    session.add_all([first, second, source, lead])
+    await session.flush()
+    
+    session.add_all([
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=first.id, status="active"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=first.id, status="active"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=first.id, status="closed"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=second.id, status="active"),
+        Contact(lead_id=lead.id, source_id=source.id, operator_id=None, status="active"),
+    ])
+    await session.commit()
+    return first.id, second.id
+
+
+@pytest.mark.asyncio
+async def test_registry_loads_active_contacts(test_db: AsyncSession):
+    """Тест загрузки нагрузки операторов одним запросом."""
+    first_id, second_id = await _seed(test_db)
+    
+    registry = LoadRegistry()
+    await registry.ensure_loaded(test_db)
+    
+    assert registry.get(first_id) == 2
+    assert registry.get(second_id) == 1
+    assert registry.get(99999) == 0
+
+
+@pytest.mark.asyncio
+async def test_registry_incremental_updates(test_db: AsyncSession):
+    """Тест инкрементального обновления и сверки с БД."""
+    first_id, _ = await _seed(test_db)
+    
+    registry = LoadRegistry()
+    await registry.ensure_loaded(test_db)
+    
+    registry.increment(first_id)
+    assert registry.get(first_id) == 3
+    registry.apply_status_change(first_id, "active", "closed")
+    registry.apply_status_change(first_id, "active", "closed")
+    assert registry.get(first_id) == 1
+    registry.apply_status_change(first_id, "closed", "active")
+    assert registry.get(first_id) == 2
+    
+    # Сверка с БД возвращает фактическое значение
+    registry.increment(first_id, 5)
+    await registry.reload(test_db)
+    assert registry.get(first_id) == 2
+
+
+def _pause_reload(monkeypatch) -> tuple[asyncio.Event, asyncio.Event]:
+    """
+    Задерживает запрос сверки после снимка нагрузки.
+    
+    Возвращает события «снимок сделан» и «завершить запрос»: изменения
+    между ними не попадают в снимок, как коммиты после начала запроса.
+    """
+    snapshot_taken = asyncio.Event()
+    finish = asyncio.Event()
+    get_active_loads = OperatorRepository.get_active_loads
+    
+    async def paused(self):
+        loads = await get_active_loads(self)
+        snapshot_taken.set()
+        await finish.wait()
+        return loads
+    
+    monkeypatch.setattr(OperatorRepository, "get_active_loads", paused)
+    return snapshot_taken, finish
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_increments_made_during_query(test_db: AsyncSession, monkeypatch):
+    """Тест: приращения во время запроса сверки не теряются, уменьшения не занижают нагрузку."""
+    first_id, second_id = await _seed(test_db)
+    
+    registry = LoadRegistry()
+    await registry.ensure_loaded(test_db)
+    snapshot_taken, finish = _pause_reload(monkeypatch)
+    
+    reload = asyncio.create_task(registry.reload(test_db))
+    await snapshot_taken.wait()
+    registry.apply_change(None, "active", first_id, "active")
+    registry.apply_status_change(second_id, "active", "closed")
+    finish.set()
+    await reload
+    
+    # Снимок сделан до изменений: приращение применено поверх него,
+    # а освобождение слота не применено (снимок мог его уже учесть)
+    assert registry.get(first_id) == 3
+    assert registry.get(second_id) == 1
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_confirm_made_during_query(test_db: AsyncSession, monkeypatch):
+    """Тест: назначение, подтверждённое во время запроса сверки, остаётся в нагрузке."""
+    first_id, second_id = await _seed(test_db)
+    
+    registry = LoadRegistry()
+    await registry.ensure_loaded(test_db)
+    registry.reserve(first_id)
+    registry.reserve(second_id)
+    snapshot_taken, finish = _pause_reload(monkeypatch)
+    
+    reload = asyncio.create_task(registry.reload(test_db))
+    await snapshot_taken.wait()
+    # Коммит назначения после снимка: резерв переходит в нагрузку
+    registry.confirm(first_id)
+    registry.cancel(second_id)
+    finish.set()
+    await reload
+    
+    assert registry.get(first_id) == 3
+    assert registry.get(second_id) == 1
+    
+    # Следующая сверка без параллельных изменений берёт значения БД
+    monkeypatch.undo()
+    await registry.reload(test_db)
+    assert registry.get(first_id) == 2
+
+
+def test_released_since_lists_released_operators():
+    """Тест журнала освобождений: операторы после отметки или None после сверки."""
+    registry = LoadRegistry()
+    registry.increment(1, 3)
+    seen = registry.releases
+    registry.decrement(1)
+    registry.reserve(2)
+    registry.cancel(2)
+    assert sorted(registry.released_since(seen)) == [1, 2]
+    assert registry.released_since(registry.releases) == []
+    
+    registry.reset()
+    assert registry.released_since(seen) is None
@@ -0,0 +1,65 @@
+import pytest
+from httpx import AsyncClient
+
+
+def _parse(text: str) -> dict:
+    """Образцы текстового формата Prometheus: {'имя{метки}': значение}."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient):
+    """Метрики HTTP-запросов, запросов к БД, выбора оператора и нагрузки операторов."""
+    op_response = await client.post(
+        "/api/v1/operators",
+        json={"name": "Оператор", "is_active": True, "max_load": 1}
+    )
+    op_id = op_response.json()["id"]
+    source_response = await client.post("/api/v1/sources", json={"name": "Источник"})
+    source_id = source_response.json()["id"]
+    await client.post(
+        f"/api/v1/sources/{source_id}/distribution",
+        json={
+            "operator_weights": [
+                {"operator_id": op_id, "source_id": source_id, "weight": 1}
+            ]
+        }
+    )
+    for index in range(2):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_id, "lead_phone": f"+7900000000{index}"}
+        )
+        assert response.status_code == 201
+    contact_id = response.json()["id"]
+    assert (await client.get(f"/api/v1/contacts/{contact_id}")).status_code == 200
+    
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = _parse(response.text)
+    
+    contacts_route = 'method="POST",route="/api/v1/contacts"'
+    assert samples[f'http_requests_total{{{contacts_route},status="201"}}'] == 2
+    assert samples[f'http_request_duration_seconds_count{{{contacts_route}}}'] == 2
+    assert samples[f'http_request_duration_seconds_bucket{{{contacts_route},le="+Inf"}}'] == 2
+    # Запросы к БД учитываются на каждый HTTP-запрос
+    assert samples[f'http_request_db_queries_sum{{{contacts_route}}}'] >= 2
+    assert samples[f'http_request_db_queries_bucket{{{contacts_route},le="0"}}'] == 0
+    # Маршрут - шаблон пути, а не сам путь
+    assert 'http_requests_total{method="GET",route="/api/v1/contacts/{contact_id}",status="200"}' in samples
+    assert samples["db_queries_total"] > 0
+    # Запрос /metrics ещё в обработке
+    assert samples["http_requests_in_flight"] == 1
+    
+    assert samples["operator_selection_duration_seconds_count"] == 2
+    assert samples[f'operator_load{{operator_id="{op_id}"}}'] == 1
+    assert samples[f'operator_max_load{{operator_id="{op_id}"}}'] == 1
+    # Второе обращение осталось без оператора
+    assert samples[f'unassigned_contacts{{source_id="{source_id}"}}'] == 1
+    assert samples["backlog_queue_size"] == 0
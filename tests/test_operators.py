@@ -83,3 +83,34 @@ async def test_get_nonexistent_operator(client: AsyncClient):
     response = await client.get("/api/v1/operators/99999")
     assert response.status_code == 404
 
+
+
+@pytest.mark.asyncio
+async def test_operators_keyset_pagination(client: AsyncClient):
+    """Тест постраничного получения операторов по курсору."""
+    for index in range(5):
+        await client.post(
+            "/api/v1/operators",
+            json={"name": f"Оператор {index}", "is_active": index % 2 == 0, "max_load": 5}
+        )
+    
+    first_page = await client.get("/api/v1/operators", params={"limit": 2})
+    assert first_page.status_code == 200
+    assert [op["name"] for op in first_page.json()] == ["Оператор 0", "Оператор 1"]
+    cursor = first_page.headers["X-Next-Cursor"]
+    
+    second_page = await client.get("/api/v1/operators", params={"limit": 2, "cursor": cursor})
+    assert [op["name"] for op in second_page.json()] == ["Оператор 2", "Оператор 3"]
+    
+    last_page = await client.get(
+        "/api/v1/operators",
+        params={"limit": 2, "cursor": second_page.headers["X-Next-Cursor"]}
+    )
+    assert [op["name"] for op in last_page.json()] == ["Оператор 4"]
+    assert "X-Next-Cursor" not in last_page.headers
+    
+    active = await client.get("/api/v1/operators", params={"is_active": True})
+    assert len(active.json()) == 3
+    
+    invalid = await client.get("/api/v1/operators", params={"cursor": "???"})
+    assert invalid.status_code == 400
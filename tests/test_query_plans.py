@@ -0,0 +1,214 @@
+"""
+Регрессионные тесты планов запросов репозиториев.
+
+Каждый запрос выполняется на схеме с данными и собранной статистикой
+(ANALYZE), для выполненных SELECT снимается EXPLAIN QUERY PLAN; тест
+падает, если SQLite читает таблицу полным проходом («SCAN <таблица>» без
+индекса). Таблицы, которые допустимо читать проходом (страница без
+фильтра с LIMIT, сводка по парам источник-оператор), перечислены явно
+для каждого запроса.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.domain.models import (
+    Contact, DistributionStatDaily, DistributionStatHourly, Lead, Operator,
+    OperatorSourceWeight, Source
+)
+from app.infrastructure.repositories import (
+    OperatorRepository, SourceRepository, OperatorSourceWeightRepository,
+    LeadRepository, ContactRepository, DistributionRollupRepository
+)
+
+pytestmark = pytest.mark.sqlite_only
+
+PERIOD_START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+PERIOD_END = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+QUERIES = [
+    ("operator_by_id", lambda s: OperatorRepository(s).get_by_id(1), ()),
+    ("operator_page", lambda s: OperatorRepository(s).get_page(10, after_id=5), ()),
+    # Операторов единицы-десятки, проход с LIMIT по порядку id допустим
+    ("operator_page_unfiltered", lambda s: OperatorRepository(s).get_page(10), ("operators",)),
+    ("operator_page_active", lambda s: OperatorRepository(s).get_page(10, is_active=True), ("operators",)),
+    ("operators_for_source", lambda s: OperatorRepository(s).get_active_operators_for_source(1), ()),
+    ("operator_load", lambda s: OperatorRepository(s).get_operator_load(1), ()),
+    ("candidates_for_source", lambda s: OperatorRepository(s).get_candidates_for_source(1), ()),
+    ("routing_table", lambda s: OperatorRepository(s).get_routing_table(1), ()),
+    ("active_loads", lambda s: OperatorRepository(s).get_active_loads(), ()),
+    ("source_by_id", lambda s: SourceRepository(s).get_by_id(1), ()),
+    ("source_by_name", lambda s: SourceRepository(s).get_by_name("bot"), ()),
+    ("existing_sources", lambda s: SourceRepository(s).get_existing_ids([1, 2, 3]), ()),
+    ("source_page", lambda s: SourceRepository(s).get_page(10, after_id=5), ()),
+    ("weights_for_source", lambda s: OperatorSourceWeightRepository(s).get_weights_for_source(1), ()),
+    ("find_or_create_leads", lambda s: LeadRepository(s).find_or_create_many([
+        {"external_id": "ext-1", "phone": "+79000000001", "email": None, "name": None},
+        {"external_id": None, "phone": None, "email": "lead@example.com", "name": None},
+    ]), ()),
+    ("lead_by_id", lambda s: LeadRepository(s).get_by_id(1), ()),
+    ("lead_page", lambda s: LeadRepository(s).get_page(10, after_id=5), ()),
+    ("lead_page_created", lambda s: LeadRepository(s).get_page(
+        10, created_from=PERIOD_START, created_to=PERIOD_END
+    ), ()),
+    ("contact_by_id", lambda s: ContactRepository(s).get_by_id(1), ()),
+    ("contact_page", lambda s: ContactRepository(s).get_page(10, after_id=5), ()),
+    ("contact_page_status", lambda s: ContactRepository(s).get_page(10, status="active"), ()),
+    ("contact_page_source", lambda s: ContactRepository(s).get_page(10, source_id=1), ()),
+    ("contact_page_operator", lambda s: ContactRepository(s).get_page(10, operator_id=1), ()),
+    ("contact_page_created", lambda s: ContactRepository(s).get_page(
+        10, created_from=PERIOD_START, created_to=PERIOD_END
+    ), ()),
+    ("contact_row", lambda s: ContactRepository(s).get_row(1), ()),
+    ("contact_page_rows", lambda s: ContactRepository(s).get_page_rows(10, after_id=5), ()),
+    ("contact_page_rows_source", lambda s: ContactRepository(s).get_page_rows(10, source_id=1), ()),
+    ("contact_page_rows_lean", lambda s: ContactRepository(s).get_page_rows(
+        10, status="active", fields=("id", "status"), include=()
+    ), ()),
+    ("lead_row", lambda s: LeadRepository(s).get_row(1), ()),
+    ("lead_page_rows", lambda s: LeadRepository(s).get_page_rows(10, after_id=5), ()),
+    ("lead_page_rows_lean", lambda s: LeadRepository(s).get_page_rows(
+        10, after_id=5, fields=("id", "phone"), include=()
+    ), ()),
+    ("unassigned_contacts", lambda s: ContactRepository(s).get_unassigned(), ()),
+    # Сводка содержит по строке на пару источник-оператор
+    ("distribution_stats", lambda s: ContactRepository(s).get_distribution_stats(), ("distribution_stats",)),
+    ("rollup_next_contact", lambda s: DistributionRollupRepository(s).get_next_contact_time(
+        PERIOD_START
+    ), ()),
+    ("rollup_hour_counts", lambda s: DistributionRollupRepository(s).count_contacts(
+        PERIOD_START, PERIOD_END
+    ), ()),
+    ("rollup_replace_hour", lambda s: DistributionRollupRepository(s).replace_hour(
+        PERIOD_START, PERIOD_START, {}
+    ), ()),
+    ("rollup_buckets", lambda s: DistributionRollupRepository(s).get_buckets(
+        "hour", PERIOD_START, PERIOD_END
+    ), ()),
+]
+
+
+@pytest.fixture
+async def seeded_db(test_db):
+    """
+    Схема с данными и статистикой планировщика.
+    
+    На пустых таблицах без статистики SQLite выбирает планы иначе, чем
+    на рабочих данных: обращений много, большая часть закрыта, операторов
+    и источников столько, что страница списка ссылается на малую их часть.
+    """
+    operators, sources, leads, contacts_per_lead = 200, 50, 500, 3
+    await test_db.execute(insert(Operator), [
+        {"name": f"Оператор {index}", "max_load": 50} for index in range(operators)
+    ])
+    await test_db.execute(insert(Source), [
+        {"name": f"Источник {index}"} for index in range(sources)
+    ])
+    # Оператор работает с несколькими источниками
+    await test_db.execute(insert(OperatorSourceWeight), [
+        {"operator_id": operator_id, "source_id": (operator_id + shift) % sources + 1, "weight": 1}
+        for operator_id in range(1, operators + 1)
+        for shift in range(3)
+    ])
+    await test_db.execute(insert(Lead), [
+        {"phone": f"+7900{index:07d}", "email": f"lead{index}@example.com", "external_id": f"ext-{index}"}
+        for index in range(leads)
+    ])
+    await test_db.execute(insert(Contact), [
+        {
+            "lead_id": index // contacts_per_lead + 1,
+            "source_id": index % sources + 1,
+            "operator_id": index % operators + 1 if index % 10 else None,
+            # Активна последняя четверть обращений, по нескольку у каждого оператора
+            "status": "active" if index >= leads * contacts_per_lead * 3 // 4 else "closed",
+            "created_at": PERIOD_START + timedelta(minutes=17 * index),
+        }
+        for index in range(leads * contacts_per_lead)
+    ])
+    for model in (DistributionStatHourly, DistributionStatDaily):
+        await test_db.execute(insert(model), [
+            {
+                "bucket_start": PERIOD_START + timedelta(hours=hour),
+                "source_id": source_id,
+                "operator_id": 1,
+                "contacts_count": 1,
+            }
+            for hour in range(0, 24 * 14, 24 if model is DistributionStatDaily else 1)
+            for source_id in range(1, 11)
+        ])
+    await test_db.commit()
+    await test_db.execute(text("ANALYZE"))
+    return test_db
+
+
+async def _explain_selects(session, call) -> List[Tuple[str, List[str]]]:
+    """Выполнить запросы репозитория и вернуть планы выполненных SELECT."""
+    sync_engine = session.bind.sync_engine
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+    
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await call(session)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+    
+    connection = await session.connection()
+    plans = []
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+        plans.append((statement, [row[-1] for row in result.all()]))
+    return plans
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "call, allowed_scans",
+    [(call, allowed) for _, call, allowed in QUERIES],
+    ids=[name for name, _, _ in QUERIES]
+)
+async def test_repository_query_uses_indexes(seeded_db, call, allowed_scans):
+    """Запросы репозиториев не читают таблицы полным проходом."""
+    plans = await _explain_selects(seeded_db, call)
+    assert plans, "Запрос не выполнил ни одного SELECT"
+    
+    for statement, details in plans:
+        full_scans = [
+            detail for detail in details
+            if detail.startswith("SCAN ")
+            and " USING " not in detail
+            and detail.split()[1] not in allowed_scans
+        ]
+        assert not full_scans, f"Полный проход {full_scans} в запросе:\n{statement}\n{details}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda s: OperatorRepository(s).get_operator_load(1),
+        lambda s: OperatorRepository(s).get_active_loads(),
+        lambda s: OperatorRepository(s).get_candidates_for_source(1),
+    ],
+    ids=["operator_load", "active_loads", "candidates_for_source"]
+)
+async def test_load_queries_use_partial_index(seeded_db, call):
+    """Нагрузка оператора считается по частичному индексу активных обращений."""
+    plans = await _explain_selects(seeded_db, call)
+    details = [detail for _, plan in plans for detail in plan]
+    assert any("ix_contacts_active_operator" in detail for detail in details), details
+
+
+@pytest.mark.asyncio
+async def test_routing_table_does_not_read_contacts(seeded_db):
+    """Таблица маршрутизации строится по весам и операторам, без обращений."""
+    plans = await _explain_selects(seeded_db, lambda s: OperatorRepository(s).get_routing_table(1))
+    details = [detail for _, plan in plans for detail in plan]
+    assert details and not any("contacts" in detail for detail in details), details
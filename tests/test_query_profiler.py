@@ -0,0 +1,160 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.query_profiler import repeated_shapes, statement_shape
+
+
+async def _setup(client: AsyncClient) -> dict:
+    """Два источника, три оператора и по нескольку обращений на лида."""
+    operator_ids = []
+    for index in range(3):
+        response = await client.post(
+            "/api/v1/operators",
+            json={"name": f"Оператор {index}", "is_active": True, "max_load": 100}
+        )
+        operator_ids.append(response.json()["id"])
+    source_ids = []
+    for index in range(2):
+        response = await client.post("/api/v1/sources", json={"name": f"Источник {index}"})
+        source_id = response.json()["id"]
+        source_ids.append(source_id)
+        await client.post(
+            f"/api/v1/sources/{source_id}/distribution",
+            json={
+                "operator_weights": [
+                    {"operator_id": operator_id, "source_id": source_id, "weight": 1}
+                    for operator_id in operator_ids
+                ]
+            }
+        )
+    contact_ids = []
+    for index in range(10):
+        response = await client.post(
+            "/api/v1/contacts",
+            json={"source_id": source_ids[index % 2], "lead_phone": f"+790000000{index % 4}"}
+        )
+        contact_ids.append(response.json()["id"])
+    lead_id = (await client.get(f"/api/v1/contacts/{contact_ids[0]}")).json()["lead_id"]
+    return {
+        "source_id": source_ids[0],
+        "operator_id": operator_ids[0],
+        "contact_id": contact_ids[0],
+        "lead_id": lead_id,
+    }
+
+
+# Бюджет запросов к БД на эндпоинт при прогретых кешах. Данных в _setup
+# больше, чем запросов: N+1 по обращениям или лидам превысит бюджет
+QUERY_BUDGETS = [
+    # Слот оператора занимается одним UPDATE его строки, без подсчёта обращений
+    ("POST", "/api/v1/contacts", {"source_id": "{source_id}", "lead_phone": "+79000000009"}, 6),
+    ("GET", "/api/v1/contacts", None, 4),
+    ("GET", "/api/v1/contacts/{contact_id}", None, 4),
+    ("PATCH", "/api/v1/contacts/{contact_id}", {"status": "closed"}, 9),
+    ("GET", "/api/v1/contacts/stats/distribution", None, 1),
+    ("GET", "/api/v1/leads", None, 2),
+    ("GET", "/api/v1/leads/{lead_id}", None, 2),
+    ("GET", "/api/v1/operators", None, 1),
+    ("GET", "/api/v1/operators/{operator_id}", None, 1),
+    ("GET", "/api/v1/sources", None, 1),
+    ("GET", "/api/v1/sources/{source_id}/distribution", None, 4),
+]
+
+
+@pytest.mark.parametrize(("method", "url", "payload", "budget"), QUERY_BUDGETS)
+@pytest.mark.asyncio
+async def test_endpoint_query_budget(
+    client: AsyncClient, query_budget, method, url, payload, budget
+):
+    """Эндпоинты укладываются в бюджет запросов к БД."""
+    ids = await _setup(client)
+    if payload is not None:
+        payload = {
+            key: int(value.format(**ids)) if value.startswith("{") else value
+            for key, value in payload.items()
+        }
+    with query_budget(budget):
+        response = await client.request(method, url.format(**ids), json=payload)
+    assert response.status_code < 300
+
+
+@pytest.mark.parametrize("url", ["/api/v1/contacts", "/api/v1/contacts/{contact_id}"])
+@pytest.mark.asyncio
+async def test_fast_serialization_query_budget(client: AsyncClient, query_budget, monkeypatch, url):
+    """Быстрый путь: лид, оператор и источник присоединяются в том же SELECT."""
+    ids = await _setup(client)
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION", True)
+    with query_budget(1):
+        response = await client.get(url.format(**ids))
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_register_contact_commits_once_without_reload(client: AsyncClient, query_budget):
+    """Регистрация: один коммит, оператор и обращение не перечитываются после записи."""
+    ids = await _setup(client)
+    commits = []
+    
+    def count_commit(conn):
+        commits.append(conn)
+    
+    event.listen(Engine, "commit", count_commit)
+    try:
+        with query_budget(6) as statements:
+            response = await client.post(
+                "/api/v1/contacts",
+                json={"source_id": ids["source_id"], "lead_phone": "+79000000009"}
+            )
+    finally:
+        event.remove(Engine, "commit", count_commit)
+    
+    assert response.status_code == 201
+    assert response.json()["operator"] is not None
+    assert len(commits) == 1
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+    assert not [statement for statement in selects if "FROM operators" in statement]
+    assert not [statement for statement in selects if "FROM contacts" in statement]
+
+
+def test_statement_shape():
+    """Форма запроса не зависит от пробелов и длины списков параметров."""
+    assert statement_shape("SELECT *\nFROM leads\nWHERE leads.phone IN (?, ?, ?)") == (
+        "SELECT * FROM leads WHERE leads.phone IN (...)"
+    )
+    assert statement_shape("SELECT * FROM leads WHERE leads.id IN ($1::INTEGER, $2::INTEGER)") == (
+        statement_shape("SELECT * FROM leads WHERE leads.id IN ($1::INTEGER)")
+    )
+    assert repeated_shapes(
+        {"SELECT 1 WHERE id IN (?)": 2, "SELECT 1 WHERE id IN (?, ?)": 1, "SELECT 2": 3}, 2
+    ) == {"SELECT 1 WHERE id IN (...)": 3, "SELECT 2": 3}
+
+
+@pytest.mark.asyncio
+async def test_query_profiler_headers_and_repeats(
+    client: AsyncClient, monkeypatch, caplog
+):
+    """Заголовки X-DB-Queries/X-DB-Time и предупреждение о повторах запроса."""
+    ids = await _setup(client)
+    response = await client.get("/api/v1/contacts")
+    assert "X-DB-Queries" not in response.headers
+    
+    monkeypatch.setattr(settings, "DB_QUERY_PROFILING", True)
+    response = await client.get("/api/v1/contacts")
+    assert response.status_code == 200
+    assert response.headers["X-DB-Queries"] == "4"
+    assert float(response.headers["X-DB-Time"]) > 0
+    assert not [record for record in caplog.records if record.levelno == logging.WARNING]
+    
+    # Порог 0: каждый запрос считается повторённым
+    monkeypatch.setattr(settings, "DB_QUERY_REPEAT_THRESHOLD", 0)
+    with caplog.at_level(logging.WARNING, logger="app.core.query_profiler"):
+        response = await client.get(f"/api/v1/operators/{ids['operator_id']}")
+    assert response.headers["X-DB-Queries"] == "1"
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "возможен N+1" in warnings[0] and "FROM operators" in warnings[0]
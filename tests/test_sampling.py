@@ -0,0 +1,32 @@
+import random
+
+from app.services.sampling import WeightedSampler
+
+
+def test_sampler_follows_weights():
+    """Тест соответствия частот выбора весам."""
+    sampler = WeightedSampler([10, 30, 0, 60], rng=random.Random(42))
+    counts = [0, 0, 0, 0]
+    for _ in range(20000):
+        counts[sampler.sample()] += 1
+    
+    assert counts[2] == 0  # Нулевой вес никогда не выбирается
+    assert abs(counts[0] / 20000 - 0.1) < 0.02
+    assert abs(counts[1] / 20000 - 0.3) < 0.02
+    assert abs(counts[3] / 20000 - 0.6) < 0.02
+
+
+def test_sampler_incremental_update():
+    """Тест выбывания и возврата элемента без перестроения."""
+    sampler = WeightedSampler([1, 1, 1], rng=random.Random(7))
+    sampler.update(0, 0)
+    sampler.update(2, 0)
+    assert sampler.total == 1
+    assert {sampler.sample() for _ in range(100)} == {1}
+    
+    sampler.update(1, 0)
+    assert sampler.sample() is None
+    
+    sampler.update(2, 5)
+    assert sampler.total == 5
+    assert sampler.sample() == 2